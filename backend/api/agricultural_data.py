@@ -3,8 +3,9 @@ Agricultural Data API - Centralized data source for all agricultural reference d
 Replaces hardcoded dropdowns and ensures consistency across the application
 """
 
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request, Response
 from typing import Dict, List, Any
+import os
 from database.agricultural_data import (
     get_agricultural_options,
     get_states_districts, 
@@ -16,30 +17,28 @@ from database.agricultural_data import (
     get_farm_size_units,
     agricultural_data_manager
 )
+from utils.response_utils import conditional_response
+
+# Reference data only changes through update_data/initialize
+AGRICULTURAL_DATA_MAX_AGE = int(os.getenv("AGRICULTURAL_DATA_MAX_AGE", "3600"))
 
 router = APIRouter(prefix="/api/agricultural-data", tags=["Agricultural Data"])
 
 @router.get("/all")
 async def get_all_agricultural_data(
+    request: Request,
     language: str = Query("en", description="Language code (en, hi, ml)")
-) -> Dict[str, Any]:
+) -> Response:
     """
     Get all agricultural reference data for frontend dropdowns
     This replaces all hardcoded arrays across the application
+
+    Served from an in-memory snapshot with an ETag, so repeat requests cost
+    no database round trips and unchanged data is answered with 304.
     """
     try:
-        raw_data = await get_agricultural_options(language)
-        
-        # Convert to JSON-serializable format (remove MongoDB ObjectId and datetime)
-        clean_data = {}
-        for key, value in raw_data.items():
-            if isinstance(value, dict):
-                # Extract only the data part, skip MongoDB metadata
-                clean_data[key] = value.get("data", value)
-            else:
-                clean_data[key] = value
-                
-        return clean_data
+        snapshot = await agricultural_data_manager.get_snapshot(language)
+        return conditional_response(request, snapshot.body, snapshot.etag, AGRICULTURAL_DATA_MAX_AGE)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching agricultural data: {str(e)}")
 
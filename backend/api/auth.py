@@ -3,7 +3,7 @@ Simple Authentication System for Agricultural Platform
 This implementation works without database initially and can be upgraded later
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, validator
 from datetime import datetime, timedelta
@@ -25,22 +25,38 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-agricultural-jwt-key-2025")
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "60"))
 OTP_EXPIRE_MINUTES = 5
+CHALLENGE_EXPIRE_MINUTES = 5
+FARMER_CACHE_TTL_SECONDS = int(os.getenv("FARMER_CACHE_TTL_SECONDS", "60"))
+FARMER_CACHE_SIZE = int(os.getenv("FARMER_CACHE_SIZE", "10000"))
 
 # Database imports
-from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.errors import DuplicateKeyError
+from database import mongodb_setup
 
-# MongoDB Configuration
-MONGODB_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-DATABASE_NAME = os.getenv("DB_NAME", "agriadvisor")
+# Seconds to wait before retrying MongoDB after a failed connection
+MONGO_RETRY_SECONDS = int(os.getenv("MONGO_RETRY_SECONDS", "30"))
 
-# Global database connection
+# Shared database handle (None while falling back to in-memory storage)
 database = None
-client = None
+_last_connect_failure = None
 
 # Enhanced storage system
-from enhanced_storage import farmer_storage
+from enhanced_storage import farmer_storage, passkey_storage, refresh_token_storage
+from cachetools import TTLCache
+from services.rate_limiter import rate_limit, otp_ip_limiter, otp_phone_limiter
+from services.sms_service import SMSQueueFull, sms_dispatcher
+
+# Verified farmer documents keyed by farmer_id, so authenticated requests
+# don't hit the database just to confirm the farmer still exists
+farmer_identity_cache = TTLCache(maxsize=FARMER_CACHE_SIZE, ttl=FARMER_CACHE_TTL_SECONDS)
+
+# Revoked refresh-token families mirrored from the database, so access and
+# refresh tokens are checked against revocations without a round trip
+revoked_token_families = set()
+_revocations_synced_at = None
 
 # Fallback: In-memory storage (for development without DB)
 otp_storage = {}  # phone -> {otp_hash, expires_at, attempts}
@@ -50,21 +66,55 @@ security = HTTPBearer()
 
 # Database Functions
 async def get_database():
-    """Get MongoDB database connection"""
-    global client, database
+    """Get the shared MongoDB database, or None to use in-memory storage"""
+    global database, _last_connect_failure
     if database is None:
+        # Don't stall every request on an unreachable server
+        if _last_connect_failure and (datetime.now() - _last_connect_failure).total_seconds() < MONGO_RETRY_SECONDS:
+            return None
         try:
-            client = AsyncIOMotorClient(MONGODB_URL)
-            database = client[DATABASE_NAME]
+            db = await mongodb_setup.connect_to_mongo()
             # Test connection
-            await database.command("ping")
+            await db.command("ping")
             print("✅ Connected to MongoDB")
+            await ensure_auth_indexes(db)
+            database = db
+            _last_connect_failure = None
         except Exception as e:
             print(f"❌ MongoDB connection failed: {e}")
             print("🔄 Using in-memory storage as fallback")
-            database = None
+            _last_connect_failure = datetime.now()
     return database
 
+AUTH_INDEXES = [
+    ("farmers", "farmer_id", {"unique": True}),
+    ("farmers", "phone", {}),
+    ("farmers", "email", {"sparse": True}),
+    ("refresh_tokens", "jti", {"unique": True}),
+    ("refresh_tokens", [("revoked", 1), ("family_id", 1)], {}),
+    ("refresh_tokens", "family_id", {}),
+    # TTL index: expired refresh tokens are removed by MongoDB
+    ("refresh_tokens", "expires_at", {"expireAfterSeconds": 0}),
+    ("passkeys", "credential_id", {"unique": True}),
+    ("passkeys", "farmer_id", {}),
+    ("passkey_challenges", "challenge", {"unique": True}),
+    # TTL index: MongoDB removes challenges once expires_at has passed
+    ("passkey_challenges", "expires_at", {"expireAfterSeconds": 0}),
+]
+
+async def ensure_auth_indexes(db):
+    """Create indexes for farmer/passkey lookups and self-expiring tokens and challenges"""
+    # One by one: a failure (e.g. duplicate legacy farmer_ids) must not skip the rest
+    for collection, keys, options in AUTH_INDEXES:
+        try:
+            await db[collection].create_index(keys, **options)
+        except Exception as e:
+            print(f"⚠️  Could not create auth index {collection}.{keys}: {e}")
+
+def invalidate_farmer_identity(farmer_id: str):
+    """Drop a cached farmer after it is updated, disabled or deleted"""
+    farmer_identity_cache.pop(farmer_id, None)
+
 async def save_farmer_to_db(farmer_data):
     """Save farmer to MongoDB or enhanced storage"""
     try:
@@ -77,26 +127,33 @@ async def save_farmer_to_db(farmer_data):
                 upsert=True
             )
             print(f"✅ Farmer saved to MongoDB: {farmer_data['farmer_id']}")
-            return True
+            saved = True
         else:
             # Use enhanced storage with file backup
-            return farmer_storage.save_farmer(farmer_data)
+            saved = farmer_storage.save_farmer(farmer_data)
     except Exception as e:
         print(f"❌ Error saving to MongoDB: {e}")
         # Fallback to enhanced storage
-        return farmer_storage.save_farmer(farmer_data)
+        saved = farmer_storage.save_farmer(farmer_data)
+    # After the write, so a concurrent request cannot re-cache the old document
+    invalidate_farmer_identity(farmer_data["farmer_id"])
+    return saved
 
-async def get_farmer_from_db(farmer_id=None, phone=None):
+async def get_farmer_from_db(farmer_id=None, phone=None, email=None):
     """Get farmer from MongoDB or enhanced storage"""
     try:
         db = await get_database()
         if db is not None:
-            # Query MongoDB
+            # Query MongoDB (farmer_id, phone and email are indexed)
             query = {}
             if farmer_id:
                 query["farmer_id"] = farmer_id
             elif phone:
                 query["phone"] = phone
+            elif email:
+                query["email"] = email
+            else:
+                return None
             
             farmer = await db.farmers.find_one(query)
             if farmer:
@@ -104,19 +161,22 @@ async def get_farmer_from_db(farmer_id=None, phone=None):
                 return farmer
         else:
             # Use enhanced storage
-            if farmer_id:
-                return farmer_storage.get_farmer_by_id(farmer_id)
-            elif phone:
-                return farmer_storage.get_farmer_by_phone(phone)
+            return get_farmer_from_storage(farmer_id, phone, email)
         return None
     except Exception as e:
         print(f"❌ Error getting farmer from MongoDB: {e}")
         # Fallback to enhanced storage
-        if farmer_id:
-            return farmer_storage.get_farmer_by_id(farmer_id)
-        elif phone:
-            return farmer_storage.get_farmer_by_phone(phone)
-        return None
+        return get_farmer_from_storage(farmer_id, phone, email)
+
+def get_farmer_from_storage(farmer_id=None, phone=None, email=None):
+    """Indexed lookup in the enhanced storage fallback"""
+    if farmer_id:
+        return farmer_storage.get_farmer_by_id(farmer_id)
+    elif phone:
+        return farmer_storage.get_farmer_by_phone(phone)
+    elif email:
+        return farmer_storage.get_farmer_by_email(email)
+    return None
 
 async def get_all_farmers_from_db():
     """Get all farmers from database or enhanced storage"""
@@ -163,8 +223,13 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
     expires_in: int
+    refresh_token: Optional[str] = None
+    refresh_expires_in: Optional[int] = None
     farmer_data: Dict[str, Any]
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
 class FarmerProfile(BaseModel):
     farmer_id: str
     name: str
@@ -245,13 +310,46 @@ def create_farmer_id() -> str:
     """Create unique farmer ID"""
     return f"farmer_{secrets.token_hex(8)}"
 
-def generate_tokens(farmer_data: Dict[str, Any]) -> TokenResponse:
-    """Generate JWT access token"""
+async def issue_refresh_token(farmer_id: str, family_id: Optional[str] = None) -> tuple:
+    """Create and store a refresh token; rotations keep the same family"""
+    jti = secrets.token_hex(16)
+    family_id = family_id or secrets.token_hex(16)
+    # Whole seconds, so the stored expiry matches the JWT exp claim
+    expires_at = datetime.utcnow().replace(microsecond=0) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    record = {
+        "jti": jti,
+        "family_id": family_id,
+        "farmer_id": farmer_id,
+        "created_at": datetime.utcnow(),
+        "expires_at": expires_at,
+        "used_at": None,
+        "revoked": False
+    }
+    db = await get_database()
+    if db is not None:
+        await db.refresh_tokens.insert_one(record)
+    else:
+        refresh_token_storage.save_token(record)
+    
+    refresh_payload = {
+        "farmer_id": farmer_id,
+        "jti": jti,
+        "fid": family_id,
+        "exp": expires_at,
+        "type": "refresh"
+    }
+    return jwt.encode(refresh_payload, SECRET_KEY, algorithm=JWT_ALGORITHM), family_id
+
+async def generate_tokens(farmer_data: Dict[str, Any], family_id: Optional[str] = None) -> TokenResponse:
+    """Generate JWT access token and a rotating refresh token"""
     
-    # Access token payload
+    refresh_token, family_id = await issue_refresh_token(farmer_data["farmer_id"], family_id)
+    
+    # Access token payload (fid ties it to its refresh-token family for revocation)
     access_payload = {
         "farmer_id": farmer_data["farmer_id"],
         "phone": farmer_data["phone"],
+        "fid": family_id,
         "exp": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
         "type": "access"
     }
@@ -262,6 +360,8 @@ def generate_tokens(farmer_data: Dict[str, Any]) -> TokenResponse:
     return TokenResponse(
         access_token=access_token,
         expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        refresh_token=refresh_token,
+        refresh_expires_in=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600,
         farmer_data={
             "farmer_id": farmer_data["farmer_id"],
             "name": farmer_data["name"],
@@ -273,30 +373,113 @@ def generate_tokens(farmer_data: Dict[str, Any]) -> TokenResponse:
         }
     )
 
-async def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, str]:
-    """Verify JWT token and return farmer info"""
+async def sync_revoked_families(force: bool = False):
+    """Refresh the in-memory revocation set from the database periodically"""
+    global revoked_token_families, _revocations_synced_at
+    now = datetime.now()
+    if not force and _revocations_synced_at and (now - _revocations_synced_at).total_seconds() < REVOCATION_SYNC_SECONDS:
+        return
+    _revocations_synced_at = now
+    db = await get_database()
+    if db is None:
+        return
+    try:
+        families = await db.refresh_tokens.distinct("family_id", {"revoked": True})
+        # Expired families drop out with their tokens (TTL index), keeping the set small
+        revoked_token_families = set(families)
+    except Exception as e:
+        print(f"⚠️  Could not sync revoked tokens: {e}")
+
+async def revoke_token_family(family_id: str):
+    """Revoke every refresh token (and access token) issued in a session"""
+    revoked_token_families.add(family_id)
+    db = await get_database()
+    if db is not None:
+        await db.refresh_tokens.update_many({"family_id": family_id}, {"$set": {"revoked": True}})
+    else:
+        refresh_token_storage.revoke_family(family_id)
+
+async def is_token_family_revoked(family_id: Optional[str]) -> bool:
+    if not family_id:
+        return False
+    await sync_revoked_families()
+    return family_id in revoked_token_families
+
+async def rotate_refresh_token(refresh_token: str) -> Dict[str, str]:
+    """Consume a refresh token exactly once and return its claims
+
+    Presenting a token that was already rotated means it leaked, so the whole
+    family is revoked and the session has to sign in again.
+    """
+    try:
+        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired")
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    
+    if payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("fid"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    if await is_token_family_revoked(payload["fid"]):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session revoked")
+    
+    db = await get_database()
+    if db is not None:
+        record = await db.refresh_tokens.find_one_and_update(
+            {"jti": payload["jti"], "used_at": None, "revoked": False},
+            {"$set": {"used_at": datetime.utcnow()}}
+        )
+    else:
+        record = refresh_token_storage.mark_used(payload["jti"], datetime.utcnow())
+    
+    if record is None:
+        print(f"⚠️  Refresh token reuse detected for farmer: {payload.get('farmer_id')}")
+        await revoke_token_family(payload["fid"])
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token already used")
+    
+    return {"farmer_id": record["farmer_id"], "family_id": record["family_id"]}
+
+async def verify_jwt_token(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Dict[str, str]:
+    """Verify JWT token and return farmer info
+
+    The farmer document is cached for a short TTL and exposed to handlers as
+    request.state.farmer, so they don't need to load it again.
+    """
     try:
-        print(f"🔍 Debug - Received token: {credentials.credentials[:20]}...")
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[JWT_ALGORITHM])
         farmer_id = payload.get("farmer_id")
-        print(f"🔍 Debug - Decoded farmer_id: {farmer_id}")
         
         if farmer_id is None or payload.get("type") != "access":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
-        
-        # Check if farmer exists in database
-        farmer_exists = await get_farmer_from_db(farmer_id=farmer_id)
-        if not farmer_exists:
+        if await is_token_family_revoked(payload.get("fid")):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Farmer not found"
+                detail="Session revoked"
             )
         
+        # Check if farmer exists, skipping the database while the cache is warm
+        farmer = farmer_identity_cache.get(farmer_id)
+        if farmer is None:
+            farmer = await get_farmer_from_db(farmer_id=farmer_id)
+            if not farmer:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Farmer not found"
+                )
+            farmer_identity_cache[farmer_id] = farmer
+        
+        # Handlers get their own copy so edits never leak into the cache
+        request.state.farmer = dict(farmer)
         return {"farmer_id": farmer_id}
         
+    except HTTPException:
+        raise
     except jwt.ExpiredSignatureError:
         print("❌ Debug - Token expired")
         raise HTTPException(
@@ -316,126 +499,70 @@ def generate_challenge() -> str:
     challenge_bytes = secrets.token_bytes(32)
     return base64.urlsafe_b64encode(challenge_bytes).decode('utf-8').rstrip('=')
 
-async def store_passkey(credential_id: str, public_key: str, user_id: str) -> bool:
-    """Store passkey credentials (simplified for development)"""
-    try:
-        passkey_data = {
-            "credential_id": credential_id,
-            "public_key": public_key,
-            "user_id": user_id,
-            "created_at": datetime.now().isoformat()
-        }
-        
-        # In development, store in a simple JSON file
-        passkeys_file = "passkeys.json"
-        
-        if os.path.exists(passkeys_file):
-            with open(passkeys_file, 'r') as f:
-                passkeys = json.load(f)
-        else:
-            passkeys = {}
-        
-        passkeys[credential_id] = passkey_data
-        
-        with open(passkeys_file, 'w') as f:
-            json.dump(passkeys, f, indent=2)
-        
-        return True
-    except Exception as e:
-        print(f"Error storing passkey: {e}")
-        return False
-
-async def get_passkey(credential_id: str) -> Optional[Dict]:
-    """Retrieve stored passkey"""
-    try:
-        passkeys_file = "passkeys.json"
-        
-        if not os.path.exists(passkeys_file):
-            return None
-            
-        with open(passkeys_file, 'r') as f:
-            passkeys = json.load(f)
-            
-        return passkeys.get(credential_id)
-    except Exception as e:
-        print(f"Error retrieving passkey: {e}")
-        return None
-
 async def store_challenge(challenge: str) -> bool:
-    """Store challenge temporarily"""
+    """Store challenge temporarily (expires automatically)"""
     try:
-        challenges_file = "challenges.json"
-        
-        if os.path.exists(challenges_file):
-            with open(challenges_file, 'r') as f:
-                challenges = json.load(f)
+        expires_at = datetime.utcnow() + timedelta(minutes=CHALLENGE_EXPIRE_MINUTES)
+        db = await get_database()
+        if db is not None:
+            await db.passkey_challenges.insert_one({
+                "challenge": challenge,
+                "created_at": datetime.utcnow(),
+                "expires_at": expires_at
+            })
         else:
-            challenges = {}
-        
-        # Store challenge with timestamp for expiration
-        challenges[challenge] = {
-            "timestamp": datetime.now().isoformat(),
-            "expires_at": (datetime.now() + timedelta(minutes=5)).isoformat()
-        }
-        
-        # Clean up expired challenges
-        current_time = datetime.now()
-        challenges = {
-            k: v for k, v in challenges.items() 
-            if datetime.fromisoformat(v["expires_at"]) > current_time
-        }
-        
-        with open(challenges_file, 'w') as f:
-            json.dump(challenges, f, indent=2)
-        
+            passkey_storage.store_challenge(challenge, expires_at)
         return True
     except Exception as e:
         print(f"Error storing challenge: {e}")
         return False
 
 async def verify_challenge(challenge: str) -> bool:
-    """Verify challenge exists and is not expired"""
+    """Verify challenge exists and is not expired, consuming it (single use)"""
     try:
-        challenges_file = "challenges.json"
-        
-        if not os.path.exists(challenges_file):
-            return False
-            
-        with open(challenges_file, 'r') as f:
-            challenges = json.load(f)
-        
-        if challenge not in challenges:
-            return False
-        
-        # Check if challenge is expired
-        expires_at = datetime.fromisoformat(challenges[challenge]["expires_at"])
-        if datetime.now() > expires_at:
-            return False
-        
-        return True
+        db = await get_database()
+        if db is not None:
+            record = await db.passkey_challenges.find_one_and_delete({
+                "challenge": challenge,
+                "expires_at": {"$gt": datetime.utcnow()}
+            })
+            return record is not None
+        return passkey_storage.consume_challenge(challenge)
     except Exception as e:
         print(f"Error verifying challenge: {e}")
         return False
 
 # API Endpoints
-@auth_router.post("/send-otp")
+@auth_router.post("/send-otp", dependencies=[Depends(rate_limit(otp_ip_limiter))])
 async def send_otp(request: PhoneLoginRequest):
     """Send OTP to farmer's phone"""
     
+    # Throttle per phone as well as per IP so one number can't be flooded
+    await otp_phone_limiter.check(request.phone)
+    
     try:
         # Generate OTP
         otp = generate_otp()
         otp_hash = hash_otp(otp)
         
         # Store OTP (in production, use database)
-        otp_storage[request.phone] = {
+        otp_record = {
             "otp_hash": otp_hash,
             "expires_at": datetime.now() + timedelta(minutes=OTP_EXPIRE_MINUTES),
-            "attempts": 0
+            "attempts": 0,
+            "delivery_status": "queued"
         }
+        otp_storage[request.phone] = otp_record
+        
+        # Queue the SMS; the response doesn't wait for the provider
+        async def record_delivery(job):
+            otp_record["delivery_status"] = job["status"]
         
-        # In production, send SMS here
-        print(f"📱 SMS to {request.phone}: Your Krishi Saathi OTP is: {otp}")
+        await sms_dispatcher.enqueue(
+            request.phone,
+            f"Your Krishi Saathi OTP is: {otp}",
+            on_status=record_delivery
+        )
         
         # For development, include OTP in response (remove in production)
         return {
@@ -445,6 +572,12 @@ async def send_otp(request: PhoneLoginRequest):
             "dev_otp": otp  # Remove this in production!
         }
         
+    except SMSQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "30"}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -523,7 +656,7 @@ async def verify_otp(request: OTPVerifyRequest):
             await save_farmer_to_db(farmer_data)
         
         # Generate tokens
-        return generate_tokens(farmer_data)
+        return await generate_tokens(farmer_data)
         
     except HTTPException:
         raise
@@ -539,10 +672,10 @@ async def verify_otp(request: OTPVerifyRequest):
 
 
 @auth_router.get("/profile", response_model=FarmerProfile)
-async def get_profile(current_farmer: dict = Depends(verify_jwt_token)):
+async def get_profile(request: Request, current_farmer: dict = Depends(verify_jwt_token)):
     """Get current farmer profile"""
     
-    farmer_data = await get_farmer_from_db(farmer_id=current_farmer["farmer_id"])
+    farmer_data = request.state.farmer
     if not farmer_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -726,7 +859,7 @@ async def signup(request: SignupRequest):
             )
         
         # Generate tokens
-        return generate_tokens(farmer_data)
+        return await generate_tokens(farmer_data)
         
     except HTTPException:
         raise
@@ -806,7 +939,7 @@ async def login(request: LoginRequest):
         await save_farmer_to_db(farmer_data)
         
         # Generate tokens
-        return generate_tokens(farmer_data)
+        return await generate_tokens(farmer_data)
         
     except HTTPException:
         raise
@@ -819,6 +952,38 @@ async def login(request: LoginRequest):
             detail=f"Login failed: {str(e)}"
         )
 
+@auth_router.post("/refresh", response_model=TokenResponse)
+async def refresh_tokens(request: RefreshTokenRequest):
+    """Exchange a refresh token for a new access/refresh token pair"""
+    claims = await rotate_refresh_token(request.refresh_token)
+    
+    farmer_data = await get_farmer_from_db(farmer_id=claims["farmer_id"])
+    if not farmer_data:
+        await revoke_token_family(claims["family_id"])
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Farmer not found"
+        )
+    
+    return await generate_tokens(farmer_data, family_id=claims["family_id"])
+
+@auth_router.post("/logout")
+async def logout(request: RefreshTokenRequest):
+    """Revoke the session a refresh token belongs to"""
+    try:
+        payload = jwt.decode(
+            request.refresh_token, SECRET_KEY, algorithms=[JWT_ALGORITHM],
+            options={"verify_exp": False}
+        )
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    
+    if payload.get("type") != "refresh" or not payload.get("fid"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    
+    await revoke_token_family(payload["fid"])
+    return {"success": True, "message": "Logged out"}
+
 
 # Utility function to save data to file (backup)
 def save_farmers_data():
@@ -855,20 +1020,26 @@ def load_farmers_data():
     except Exception as e:
         print(f"❌ Error loading farmers data: {e}")
 
-# Passkey storage (in-memory for now, use database in production)
-passkey_storage = {}
-
 # Passkey utility functions
 async def store_passkey(credential_id: str, public_key: str, user_id: str, farmer_id: str):
     """Store passkey credentials"""
     try:
-        passkey_storage[credential_id] = {
+        passkey_data = {
             "credential_id": credential_id,
             "public_key": public_key,
             "user_id": user_id,
             "farmer_id": farmer_id,
             "created_at": datetime.now()
         }
+        db = await get_database()
+        if db is not None:
+            await db.passkeys.update_one(
+                {"credential_id": credential_id},
+                {"$set": passkey_data},
+                upsert=True
+            )
+        elif not passkey_storage.save_passkey(passkey_data):
+            return False
         print(f"✅ Passkey stored for farmer: {farmer_id}")
         return True
     except Exception as e:
@@ -877,15 +1048,26 @@ async def store_passkey(credential_id: str, public_key: str, user_id: str, farme
 
 async def get_passkey(credential_id: str):
     """Retrieve passkey credentials"""
-    return passkey_storage.get(credential_id)
+    db = await get_database()
+    if db is not None:
+        return await db.passkeys.find_one({"credential_id": credential_id}, {"_id": 0})
+    return passkey_storage.get_passkey(credential_id)
 
 async def get_passkeys_by_farmer(farmer_id: str):
     """Get all passkeys for a farmer"""
-    farmer_passkeys = []
-    for credential_id, passkey_data in passkey_storage.items():
-        if passkey_data.get("farmer_id") == farmer_id:
-            farmer_passkeys.append(passkey_data)
-    return farmer_passkeys
+    db = await get_database()
+    if db is not None:
+        cursor = db.passkeys.find({"farmer_id": farmer_id}, {"_id": 0})
+        return await cursor.to_list(length=None)
+    return passkey_storage.get_passkeys_by_farmer(farmer_id)
+
+async def remove_passkey(credential_id: str) -> bool:
+    """Delete stored passkey credentials"""
+    db = await get_database()
+    if db is not None:
+        result = await db.passkeys.delete_one({"credential_id": credential_id})
+        return result.deleted_count > 0
+    return passkey_storage.delete_passkey(credential_id)
 
 async def find_farmer_by_identifier(identifier: str):
     """Find farmer by phone or email"""
@@ -894,11 +1076,7 @@ async def find_farmer_by_identifier(identifier: str):
         return await get_farmer_from_db(phone=identifier)
     else:
         # Search by email
-        all_farmers = await get_all_farmers_from_db()
-        for farmer in all_farmers:
-            if farmer.get("email") == identifier:
-                return farmer
-    return None
+        return await get_farmer_from_db(email=identifier)
 
 async def verify_passkey_signature(credential_id: str, signature: str, challenge: str):
     """Verify passkey signature (simplified for demo)"""
@@ -1015,7 +1193,7 @@ async def verify_passkey(request: PasskeyAuthRequest):
             await save_farmer_to_db(farmer_data)
         
         # Generate and return JWT token
-        return generate_tokens(farmer_data)
+        return await generate_tokens(farmer_data)
         
     except HTTPException:
         raise
@@ -1034,13 +1212,12 @@ async def list_passkeys(current_farmer: dict = Depends(verify_jwt_token)):
         
         # Get all passkeys for this farmer
         user_passkeys = []
-        for credential_id, passkey_data in passkey_storage.items():
-            if passkey_data.get("farmer_id") == farmer_id:
-                user_passkeys.append({
-                    "credential_id": credential_id,
-                    "created_at": passkey_data.get("created_at").isoformat() if isinstance(passkey_data.get("created_at"), datetime) else passkey_data.get("created_at"),
-                    "device_name": "Biometric Device"  # Could be enhanced to track device info
-                })
+        for passkey_data in await get_passkeys_by_farmer(farmer_id):
+            user_passkeys.append({
+                "credential_id": passkey_data["credential_id"],
+                "created_at": passkey_data.get("created_at").isoformat() if isinstance(passkey_data.get("created_at"), datetime) else passkey_data.get("created_at"),
+                "device_name": "Biometric Device"  # Could be enhanced to track device info
+            })
         
         return {
             "passkeys": user_passkeys,
@@ -1060,7 +1237,7 @@ async def delete_passkey(credential_id: str, current_farmer: dict = Depends(veri
         farmer_id = current_farmer["farmer_id"]
         
         # Check if passkey exists and belongs to this farmer
-        passkey = passkey_storage.get(credential_id)
+        passkey = await get_passkey(credential_id)
         if not passkey:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -1074,7 +1251,7 @@ async def delete_passkey(credential_id: str, current_farmer: dict = Depends(veri
             )
         
         # Delete the passkey
-        del passkey_storage[credential_id]
+        await remove_passkey(credential_id)
         print(f"✅ Passkey deleted for farmer: {farmer_id}")
         
         return {"message": "Passkey deleted successfully"}
@@ -1,8 +1,11 @@
 """Chatbot API routes"""
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from models.chat_models import ChatMessage, ChatResponse
 from services.chatbot_service import ChatbotService
+from services.rate_limiter import rate_limit, chat_limiter
+from utils.response_utils import SSE_HEADERS, sse_event
 from datetime import datetime
 
 router = APIRouter(prefix="/api", tags=["chatbot"])
@@ -10,7 +13,7 @@ router = APIRouter(prefix="/api", tags=["chatbot"])
 # Initialize chatbot service
 chatbot_service = ChatbotService()
 
-@router.post("/chat", response_model=ChatResponse)
+@router.post("/chat", response_model=ChatResponse, dependencies=[Depends(rate_limit(chat_limiter))])
 async def chat_with_bot(message: ChatMessage):
     """Chat with the agricultural assistant"""
     try:
@@ -26,6 +29,18 @@ async def chat_with_bot(message: ChatMessage):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/chat/stream", dependencies=[Depends(rate_limit(chat_limiter))])
+async def stream_chat_with_bot(message: ChatMessage):
+    """
+    Chat with the assistant over Server-Sent Events: `token` events as the
+    answer is generated, `fallback` if the LLM fails part-way, then `done`.
+    """
+    async def events():
+        async for event in chatbot_service.stream_response(message.message, message.language):
+            yield sse_event(event["type"], event)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/chatbot/context")
 async def get_chatbot_context():
     """Get contextual information for the chatbot"""
@@ -34,4 +49,9 @@ async def get_chatbot_context():
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error"))
     
-    return result
\ No newline at end of file
+    return result
+
+@router.get("/chatbot/cache-stats")
+async def get_chatbot_cache_stats():
+    """Hit rate and size of the chatbot's semantic response cache"""
+    return {"success": True, "cache": chatbot_service.cache.metrics()}
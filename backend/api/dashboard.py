@@ -1,10 +1,10 @@
 """Dashboard API routes"""
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from services.dashboard_service import DashboardService
 from services.weather_service import WeatherService
 from utils.response_utils import create_success_response
-from api.auth import verify_jwt_token, get_farmer_from_db
+from api.auth import verify_jwt_token
 from datetime import datetime
 
 router = APIRouter(prefix="/api", tags=["dashboard"])
@@ -23,14 +23,15 @@ def get_current_season():
 
 @router.get("/dashboard")
 async def get_dashboard(
+    request: Request,
     lat: float = None, 
     lon: float = None, 
     farmer_data: dict = Depends(verify_jwt_token)
 ):
     """Get farmer dashboard data"""
     try:
-        # Get full farmer data from database
-        full_farmer_data = await get_farmer_from_db(farmer_id=farmer_data["farmer_id"])
+        # Full farmer data was already loaded (or cached) by verify_jwt_token
+        full_farmer_data = request.state.farmer
         
         if not full_farmer_data:
             raise HTTPException(status_code=404, detail="Farmer data not found")
@@ -1,16 +1,18 @@
 """Disease Detection API routes"""
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from typing import Optional
 from services.disease_detection_service import DiseaseDetectionService
+from services.disease_classifier import disease_classifier
+from services.rate_limiter import rate_limit, disease_analysis_limiter
 import io
 
 router = APIRouter(prefix="/api/disease-detection", tags=["disease-detection"])
 
-# Initialize disease detection service
-disease_service = DiseaseDetectionService()
+# Initialize disease detection service (the classifier is loaded at startup)
+disease_service = DiseaseDetectionService(disease_classifier)
 
-@router.post("/analyze")
+@router.post("/analyze", dependencies=[Depends(rate_limit(disease_analysis_limiter))])
 async def analyze_disease(
     image: UploadFile = File(...),
     crop_type: Optional[str] = Form(None),
@@ -36,6 +38,11 @@ async def analyze_disease(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/metrics")
+async def get_inference_metrics():
+    """Classifier status and micro-batching statistics (batch occupancy, queue wait)"""
+    return disease_classifier.metrics()
+
 @router.get("/diseases/{crop_type}")
 async def get_common_diseases(crop_type: str):
     """Get common diseases for a specific crop type"""
@@ -4,6 +4,7 @@ from fastapi import APIRouter, HTTPException
 from typing import Optional
 from services.kerala_market_service import KeralaMarketService
 from models.market_models import KeralaMarketAnalysisRequest
+from utils.json_response import AppJSONResponse
 
 router = APIRouter(prefix="/api/kerala-market", tags=["kerala-market"])
 
@@ -19,7 +20,8 @@ async def get_kerala_market_data(
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error"))
     
-    return result
+    # Month-long ranges are large; serialize directly instead of via jsonable_encoder
+    return AppJSONResponse(result)
 
 @router.post("/analyze")
 async def analyze_kerala_market_data(request_data: KeralaMarketAnalysisRequest):
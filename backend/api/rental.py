@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from services.rental_service import RentalService
 from models.rental_models import Equipment
-from typing import List
+from typing import List, Optional
+from datetime import datetime, timedelta
 
 router = APIRouter()
 
@@ -23,6 +24,39 @@ async def get_nearby_equipment(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/availability", response_model=dict)
+async def get_equipment_availability(
+    lat: float = Query(..., description="Latitude"),
+    lng: float = Query(..., description="Longitude"),
+    radius: float = Query(20.0, description="Radius in km"),
+    start_date: Optional[str] = Query(None, description="First day (YYYY-MM-DD), defaults to today"),
+    end_date: Optional[str] = Query(None, description="Last day (YYYY-MM-DD), defaults to a week from start"),
+    start_hour: int = Query(0, ge=0, le=23, description="Window start hour (0-23)"),
+    end_hour: int = Query(24, ge=1, le=24, description="Window end hour, exclusive (1-24)"),
+    category: str = Query(None, description="Equipment category filter"),
+    full_window: bool = Query(False, description="Require the whole window to be free"),
+    service: RentalService = Depends(get_rental_service)
+):
+    """Find nearby equipment with free slots in a date range and time window"""
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else datetime.now()
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else start + timedelta(days=6)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    if end < start or start_hour >= end_hour:
+        raise HTTPException(status_code=400, detail="Invalid date range or time window")
+
+    return await service.find_available_equipment(
+        lat, lng,
+        start_date=start.strftime("%Y-%m-%d"),
+        end_date=end.strftime("%Y-%m-%d"),
+        start_hour=start_hour,
+        end_hour=end_hour,
+        radius_km=radius,
+        category=category,
+        require_full_window=full_window
+    )
+
 @router.post("/equipment")
 async def add_equipment(
     equipment: Equipment,
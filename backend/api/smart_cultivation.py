@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict, Any, List
-from models.smart_cultivation_models import SmartCultivationRequest, SmartCultivationPlan
+from datetime import date, datetime
+from models.smart_cultivation_models import SmartCultivationRequest, SmartCultivationPlan, DailyTask, PlanSummary
 from services.smart_cultivation_service import SmartCultivationService
+from services.plan_jobs import PlanJobQueue, PlanQueueFull
+from services.cultivation_schedule import with_compact_schedule, with_full_schedule
+from utils.response_utils import SSE_HEADERS, sse_event
 
 router = APIRouter(prefix="/api/smart-cultivation", tags=["Smart Cultivation"])
 
@@ -18,9 +23,25 @@ async def get_smart_cultivation_service():
         raise HTTPException(status_code=503, detail="Service not initialized")
     return smart_cultivation_service
 
+plan_job_queue: Optional[PlanJobQueue] = None
+
+async def get_plan_job_queue():
+    if plan_job_queue is None:
+        raise HTTPException(status_code=503, detail="Plan job queue not initialized")
+    return plan_job_queue
+
+# "full" expands every day into `schedule`; "compact" returns template ranges plus sparse tasks
+ScheduleFormat = Query("full", pattern="^(full|compact)$")
+
+def shape_plan(plan: SmartCultivationPlan, schedule_format: str) -> SmartCultivationPlan:
+    if schedule_format == "compact":
+        return with_compact_schedule(plan)
+    return with_full_schedule(plan)
+
 @router.post("/generate", response_model=SmartCultivationPlan)
 async def generate_plan(
     request: SmartCultivationRequest,
+    format: str = ScheduleFormat,
     service: SmartCultivationService = Depends(get_smart_cultivation_service)
 ):
     """
@@ -29,10 +50,74 @@ async def generate_plan(
     """
     try:
         plan = await service.generate_plan(request)
-        return plan
+        return shape_plan(plan, format)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate/stream")
+async def stream_plan(
+    request: SmartCultivationRequest,
+    format: str = ScheduleFormat,
+    service: SmartCultivationService = Depends(get_smart_cultivation_service)
+):
+    """
+    Generate the preview over Server-Sent Events: `field` and `analysis`
+    events as each part of the plan completes, `tasks` one week at a time,
+    then `plan` with the complete preview (or `error`).
+    """
+    async def events():
+        async for event in service.stream_plan(request):
+            if event["type"] == "tasks":
+                event = {"type": "tasks", "tasks": [task.model_dump() for task in event["tasks"]]}
+            elif event["type"] == "plan":
+                event = {"type": "plan", "plan": shape_plan(event["plan"], format).model_dump(mode="json")}
+            yield sse_event(event["type"], event)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/jobs", response_model=Dict[str, Any], status_code=202)
+async def submit_plan_job(
+    request: SmartCultivationRequest,
+    jobs: PlanJobQueue = Depends(get_plan_job_queue)
+):
+    """
+    Queue plan generation in the background and return the job at once.
+    Poll GET /jobs/{job_id} (or subscribe over Socket.IO with
+    `subscribe_plan_job`), then fetch GET /jobs/{job_id}/result.
+    An identical request still in progress returns the same job.
+    """
+    try:
+        return await jobs.submit(request)
+    except PlanQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+@router.get("/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_plan_job(
+    job_id: str,
+    jobs: PlanJobQueue = Depends(get_plan_job_queue)
+):
+    job = await jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Plan job not found")
+    return job
+
+@router.get("/jobs/{job_id}/result", response_model=SmartCultivationPlan)
+async def get_plan_job_result(
+    job_id: str,
+    format: str = ScheduleFormat,
+    jobs: PlanJobQueue = Depends(get_plan_job_queue)
+):
+    """
+    The generated preview of a finished job (409 while it is still queued or running).
+    """
+    plan = await jobs.get_result(job_id)
+    if plan is None:
+        job = await jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Plan job not found")
+        raise HTTPException(status_code=409, detail=f"Plan job is {job['status']}")
+    return shape_plan(plan, format)
+
 @router.post("/save", response_model=Dict[str, Any])
 async def save_plan(
     plan: SmartCultivationPlan,
@@ -50,6 +135,7 @@ async def save_plan(
 @router.get("/active/{user_id}", response_model=Optional[SmartCultivationPlan])
 async def get_active_plan(
     user_id: str,
+    format: str = ScheduleFormat,
     service: SmartCultivationService = Depends(get_smart_cultivation_service)
 ):
     """
@@ -59,13 +145,14 @@ async def get_active_plan(
         plan = await service.get_active_plan(user_id)
         if not plan:
             return None # Return null if no active plan
-        return plan
+        return shape_plan(plan, format)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/saved/{user_id}", response_model=List[SmartCultivationPlan])
 async def get_saved_plans(
     user_id: str,
+    format: str = ScheduleFormat,
     service: SmartCultivationService = Depends(get_smart_cultivation_service)
 ):
     """
@@ -73,19 +160,61 @@ async def get_saved_plans(
     """
     try:
         plans = await service.get_all_plans(user_id)
-        return plans
+        return [shape_plan(plan, format) for plan in plans]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/saved/{user_id}/summary", response_model=List[PlanSummary])
+async def get_saved_plan_summaries(
+    user_id: str,
+    status: Optional[str] = Query(None, description="e.g. active or completed"),
+    before: Optional[datetime] = Query(None, description="created_at of the last plan on the previous page"),
+    before_id: Optional[str] = Query(None, description="plan_id of the last plan on the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    service: SmartCultivationService = Depends(get_smart_cultivation_service)
+):
+    """
+    List the user's plans, newest first, without analysis or schedules.
+    Fetch a plan's tasks with /plan/{plan_id}/schedule.
+    """
+    return await service.list_plan_summaries(user_id, status, before, limit, before_id)
+
 @router.get("/plan/{plan_id}", response_model=SmartCultivationPlan)
 async def get_plan_details(
     plan_id: str,
+    format: str = ScheduleFormat,
     service: SmartCultivationService = Depends(get_smart_cultivation_service)
 ):
     try:
         plan = await service.get_plan_by_id(plan_id)
         if not plan:
              raise HTTPException(status_code=404, detail="Plan not found")
-        return plan
+        return shape_plan(plan, format)
     except Exception as e:
          raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/plan/{plan_id}/schedule", response_model=List[DailyTask])
+async def get_plan_schedule(
+    plan_id: str,
+    from_date: Optional[date] = Query(None, description="First day of the window (defaults to today)"),
+    days: int = Query(7, ge=1, le=366),
+    service: SmartCultivationService = Depends(get_smart_cultivation_service)
+):
+    """
+    Tasks of a plan for a date window, e.g. the next 7 days.
+    """
+    tasks = await service.get_schedule_window(plan_id, from_date or date.today(), days)
+    if tasks is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return tasks
+
+@router.get("/active/{user_id}/upcoming", response_model=List[DailyTask])
+async def get_upcoming_tasks(
+    user_id: str,
+    days: int = Query(7, ge=1, le=366),
+    service: SmartCultivationService = Depends(get_smart_cultivation_service)
+):
+    """
+    Tasks of the user's active plan for the next `days` days.
+    """
+    return await service.get_upcoming_tasks(user_id, date.today(), days)
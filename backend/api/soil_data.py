@@ -7,6 +7,7 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from services.soil_data_service import soil_data_service
 from services.csv_soil_data_service import csv_soil_data_service
+from utils.json_response import AppJSONResponse
 
 router = APIRouter(prefix="/api/soil-data", tags=["Soil Data"])
 
@@ -94,7 +95,8 @@ async def get_csv_soil_data(
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result["error"])
         
-        return result
+        # Records come straight from pandas; orjson handles numpy scalars and NaN
+        return AppJSONResponse(result)
         
     except HTTPException:
         raise
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Booking contention benchmark for the Real-Time Rental Service
+
+Simulates many farmers racing for the same equipment slots through the
+Socket.IO `request_booking` handler and reports throughput, latency
+percentiles and double-booking violations.
+
+Usage:
+    python benchmark_rental_booking.py --clients 500 --hot-ratio 0.8
+    python benchmark_rental_booking.py --mongo-url mongodb://localhost:27017
+
+Without --mongo-url the benchmark runs against mongomock-motor, which is
+enough to catch correctness regressions. Point it at a local or embedded
+mongod to measure real contention on the booking hot path.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+try:
+    from mongomock_motor import AsyncMongoMockClient
+except ImportError:
+    AsyncMongoMockClient = None
+
+from services.rental_service import RentalService
+from services.socket_service import SocketService, sio
+
+BENCHMARK_DATE = "2030-01-01"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+async def get_benchmark_database(mongo_url: Optional[str] = None):
+    """Return (client, database) for a throwaway benchmark database"""
+    db_name = f"rental_benchmark_{uuid.uuid4().hex[:8]}"
+    if mongo_url:
+        client = AsyncIOMotorClient(mongo_url)
+    elif AsyncMongoMockClient is not None:
+        client = AsyncMongoMockClient()
+    else:
+        raise RuntimeError("Install mongomock-motor or pass --mongo-url to run the benchmark")
+    return client, client[db_name]
+
+
+async def seed_equipment(rental_service: RentalService, equipment_count: int, slots_per_day: int) -> List[Dict[str, str]]:
+    """Insert equipment with free slots and return every bookable target"""
+    targets = []
+    for e in range(equipment_count):
+        slots = [
+            {
+                "id": f"slot_{s}",
+                "start_time": f"{6 + s * 2:02d}:00",
+                "end_time": f"{8 + s * 2:02d}:00",
+                "is_booked": False,
+                "booked_by": None
+            }
+            for s in range(slots_per_day)
+        ]
+        equipment_id = await rental_service.add_equipment({
+            "owner_id": f"owner_{e}",
+            "owner_name": f"Owner {e}",
+            "owner_contact": f"+9190000000{e:02d}",
+            "name": f"Tractor {e}",
+            "description": "Benchmark equipment",
+            "category": "Tractor",
+            "price_per_hour": 500.0,
+            "location": {"type": "Point", "coordinates": [76.2673, 9.9312]},
+            "address": "Benchmark Farm",
+            "district": "Ernakulam",
+            "village": "Kochi",
+            "availability": [{"date": BENCHMARK_DATE, "slots": slots}]
+        })
+        targets.extend(
+            {"equipment_id": equipment_id, "date": BENCHMARK_DATE, "slot_id": slot["id"]}
+            for slot in slots
+        )
+    return targets
+
+
+class EmitRecorder:
+    """Records events emitted to individual sids while the benchmark runs"""
+
+    def __init__(self):
+        self.events = defaultdict(list)
+        self._original_emit = None
+
+    def __enter__(self):
+        self._original_emit = sio.emit
+
+        async def recording_emit(event, data=None, to=None, room=None, **kwargs):
+            if to is not None:
+                self.events[to].append((event, data))
+            return await self._original_emit(event, data, to=to, room=room, **kwargs)
+
+        sio.emit = recording_emit
+        return self
+
+    def __exit__(self, *exc):
+        sio.emit = self._original_emit
+
+
+async def run_benchmark(
+    db,
+    clients: int = 200,
+    equipment_count: int = 5,
+    slots_per_day: int = 4,
+    hot_ratio: float = 0.5,
+    concurrency: Optional[int] = None,
+    seed: int = 42
+) -> Dict[str, Any]:
+    """Race `clients` booking requests and return the measured report"""
+    rental_service = RentalService(db)
+    await rental_service.initialize_indexes()
+    SocketService(rental_service)
+    request_booking = sio.handlers["/"]["request_booking"]
+
+    targets = await seed_equipment(rental_service, equipment_count, slots_per_day)
+    rng = random.Random(seed)
+    hot_target = targets[0]
+    requests = []
+    for i in range(clients):
+        target = hot_target if rng.random() < hot_ratio else rng.choice(targets)
+        requests.append((f"bench_sid_{i}", {
+            **target,
+            "user_id": f"bench_user_{i}",
+            "user_name": f"Farmer {i}",
+            "user_contact": f"+9198{i:08d}"
+        }))
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency or clients)
+
+    async def client(sid: str, data: Dict[str, str]):
+        async with semaphore:
+            started = time.perf_counter()
+            await request_booking(sid, data)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    with EmitRecorder() as recorder:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(sid, data) for sid, data in requests))
+        duration = time.perf_counter() - started
+
+    # Tally outcomes and check every confirmation against the stored state
+    confirmations = defaultdict(list)
+    outcomes = defaultdict(int)
+    for sid, data in requests:
+        for event, _ in recorder.events.get(sid, []):
+            outcomes[event] += 1
+            if event == "booking_confirmed":
+                key = (data["equipment_id"], data["date"], data["slot_id"])
+                confirmations[key].append(data["user_id"])
+
+    double_bookings = sum(len(users) - 1 for users in confirmations.values() if len(users) > 1)
+    lost_confirmations = 0
+    for (equipment_id, date, slot_id), users in confirmations.items():
+        equipment = await rental_service.get_equipment_by_id(equipment_id)
+        booked_by = next(
+            slot.get("booked_by")
+            for day in equipment["availability"] if day["date"] == date
+            for slot in day["slots"] if slot["id"] == slot_id
+        )
+        lost_confirmations += sum(1 for user in users if user != booked_by)
+
+    return {
+        "clients": clients,
+        "distinct_slots": len(targets),
+        "targeted_slots": len({(d["equipment_id"], d["slot_id"]) for _, d in requests}),
+        "confirmed": outcomes["booking_confirmed"],
+        "failed": outcomes["booking_failed"],
+        "errors": outcomes["booking_error"],
+        "duration_s": duration,
+        "throughput_rps": clients / duration if duration else 0.0,
+        "latency_ms": {
+            "mean": statistics.mean(latencies) if latencies else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else 0.0
+        },
+        "double_bookings": double_bookings,
+        "lost_confirmations": lost_confirmations
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    latency = report["latency_ms"]
+    print("\n" + "=" * 50)
+    print("🚜 Rental Booking Benchmark")
+    print("=" * 50)
+    print(f"Clients:            {report['clients']}")
+    print(f"Slots targeted:     {report['targeted_slots']} / {report['distinct_slots']}")
+    print(f"Confirmed:          {report['confirmed']}")
+    print(f"Rejected:           {report['failed']}")
+    print(f"Errors:             {report['errors']}")
+    print(f"Duration:           {report['duration_s']:.3f} s")
+    print(f"Throughput:         {report['throughput_rps']:.1f} req/s")
+    print(f"Latency mean:       {latency['mean']:.2f} ms")
+    print(f"Latency p50/p95/p99: {latency['p50']:.2f} / {latency['p95']:.2f} / {latency['p99']:.2f} ms")
+    print(f"Latency max:        {latency['max']:.2f} ms")
+    print(f"Double bookings:    {report['double_bookings']}")
+    print(f"Lost confirmations: {report['lost_confirmations']}")
+    ok = report["double_bookings"] == 0 and report["lost_confirmations"] == 0
+    print("✅ No booking violations" if ok else "❌ Booking violations detected!")
+    print("=" * 50 + "\n")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent slot booking")
+    parser.add_argument("--clients", type=int, default=200, help="Number of concurrent booking requests")
+    parser.add_argument("--equipment", type=int, default=5, help="Number of equipment listings")
+    parser.add_argument("--slots", type=int, default=4, help="Slots per equipment for the benchmark day")
+    parser.add_argument("--hot-ratio", type=float, default=0.5, help="Fraction of clients racing for the same slot")
+    parser.add_argument("--concurrency", type=int, default=None, help="Max in-flight requests (default: all)")
+    parser.add_argument("--mongo-url", default=None, help="Use a real/embedded mongod instead of mongomock")
+    args = parser.parse_args()
+
+    client, db = await get_benchmark_database(args.mongo_url)
+    try:
+        report = await run_benchmark(
+            db,
+            clients=args.clients,
+            equipment_count=args.equipment,
+            slots_per_day=args.slots,
+            hot_ratio=args.hot_ratio,
+            concurrency=args.concurrency
+        )
+        print_report(report)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+    if report["double_bookings"] or report["lost_confirmations"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Response encoding benchmark for the largest JSON endpoints
+
+Compares the default FastAPI path (jsonable_encoder + stdlib json, no
+compression) with AppJSONResponse (orjson) and CompressionMiddleware for:
+
+  * POST /api/smart-cultivation/generate  - a 150-day SmartCultivationPlan
+  * GET  /api/kerala-market/data          - a 30-day Kerala market range
+  * GET  /api/soil-data/csv               - a page of the Kerala soil CSV
+
+Usage:
+    python benchmark_response_encoding.py --days 150 --vegetables 60 --soil-limit 500
+
+The plan and market payloads are synthesized (the real endpoints call Groq
+and the Kerala market API); the market payload is still produced by
+KeralaMarketService.get_market_data so its shape matches the endpoint.
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models.smart_cultivation_models import DailyTask, SmartCultivationPlan, SmartCultivationRequest
+from services.csv_soil_data_service import csv_soil_data_service
+from services.kerala_market_service import KeralaMarketService
+from utils import compression
+from utils.json_response import AppJSONResponse, orjson
+
+TASK_TYPES = ["irrigation", "fertilization", "protection", "harvesting", "general"]
+VEGETABLES = [
+    "Amaranthus", "Ash gourd", "Beans", "Beetroot", "Bitter gourd", "Brinjal", "Cabbage",
+    "Carrot", "Cauliflower", "Chilli", "Coccinia", "Cucumber", "Drumstick", "Ginger",
+    "Ladies finger", "Onion", "Potato", "Pumpkin", "Snake gourd", "Tapioca", "Tomato"
+]
+
+
+def build_plan(days: int) -> SmartCultivationPlan:
+    """A plan with one DailyTask per day, roughly as long as the LLM writes them"""
+    start = datetime(2025, 6, 1)
+    schedule = [
+        DailyTask(
+            day_number=day,
+            date=(start + timedelta(days=day - 1)).strftime("%Y-%m-%d"),
+            task_name=f"Day {day}: {random.choice(TASK_TYPES).title()} check",
+            description="Inspect the field for moisture stress, pest activity and weed growth "
+                        "between the rows before the afternoon heat.",
+            resources_needed=["Sprayer", "Neem oil", "Measuring tape"],
+            instructions="Walk the field diagonally, check ten plants per row, water the beds "
+                         "that are dry at 5 cm depth and record anything unusual in the log.",
+            task_type=random.choice(TASK_TYPES),
+            weather_condition=random.choice(["Sunny", "Light rain", "Cloudy", None]),
+            deep_link=random.choice(["rental", "market", "schemes", None])
+        )
+        for day in range(1, days + 1)
+    ]
+    return SmartCultivationPlan(
+        plan_id="665f1c2ab3e4d5f6a7b8c9d0",
+        user_id="farmer_benchmark",
+        crop_name="Rice + Black gram",
+        start_date=schedule[0].date,
+        end_date=schedule[-1].date,
+        input_details=SmartCultivationRequest(
+            land_area=2.5, soil_type="Laterite", sowing_date=schedule[0].date,
+            selected_crops=["Rice", "Black gram"], location="Thrissur, Kerala"
+        ),
+        intercropping_strategy="Black gram on the bunds after the first weeding",
+        analysis={"soil": "Acidic laterite, lime before sowing", "water": "Monsoon fed"},
+        best_practices=["Use certified seed", "Maintain 2-3 cm standing water", "Split nitrogen doses"],
+        schedule=schedule,
+        yield_estimate="4.5-5 t/ha"
+    )
+
+
+async def build_market_payload(days: int, vegetables: int) -> Dict[str, Any]:
+    """Run get_market_data over a synthetic price feed instead of the live API"""
+    names = [f"{VEGETABLES[i % len(VEGETABLES)]} {i // len(VEGETABLES) or ''}".strip() for i in range(vegetables)]
+
+    async def fetch_veg_price_for_date(date_str: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "vegetablename": name,
+                "price": f"{random.uniform(20, 120):.0f}",
+                "retailprice": f"{random.uniform(25, 150):.0f}",
+                "shopingmallprice": f"{random.uniform(30, 180):.0f}",
+                "units": "1kg",
+                "Date": date_str
+            }
+            for name in names
+        ]
+
+    original = KeralaMarketService.fetch_veg_price_for_date
+    KeralaMarketService.fetch_veg_price_for_date = staticmethod(fetch_veg_price_for_date)
+    try:
+        start = datetime(2025, 6, 1)
+        end = start + timedelta(days=days - 1)
+        return await KeralaMarketService.get_market_data(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+    finally:
+        KeralaMarketService.fetch_veg_price_for_date = original
+
+
+async def build_soil_payload(limit: int) -> Dict[str, Any]:
+    """The /csv page from the service, or read with the csv module when pandas is missing"""
+    result = await csv_soil_data_service.get_soil_data_from_csv(state="Kerala", limit=limit)
+    if result.get("success"):
+        return result
+
+    columns = {
+        "Date": "date",
+        "State Name": "state_name",
+        "DistrictName": "districtname",
+        "Average Soilmoisture Level (at 15cm)": "average_soilmoisture_level__at_15cm_",
+        "Average SoilMoisture Volume (at 15cm)": "_average_soilmoisture_volume__at_15cm_",
+        "Aggregate Soilmoisture Percentage (at 15cm)": "aggregate_soilmoisture_percentage__at_15cm_",
+        "Volume Soilmoisture percentage (at 15cm)": "volume_soilmoisture_percentage__at_15cm_"
+    }
+    with open(csv_soil_data_service.csv_file_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    records = []
+    for row in rows[:limit]:
+        record = {columns.get(key, key): value for key, value in row.items()}
+        for key in list(columns.values())[3:]:
+            record[key] = float(record[key])
+        records.append(record)
+    return {
+        "success": True,
+        "total_records": len(rows),
+        "count": len(records),
+        "data": records,
+        "api_info": {"source": "local_csv", "fetched_at": datetime.now().isoformat(), "data_year": "2020"}
+    }
+
+
+def time_ms(func: Callable[[], Any], repeat: int) -> float:
+    """Median wall time of func() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def measure(name: str, payload: Any, repeat: int) -> Dict[str, Any]:
+    """Serialization time and bytes on the wire, default path vs optimized path"""
+    if isinstance(payload, SmartCultivationPlan):
+        # response_model endpoints: pydantic produces the dict, the response class renders it
+        before = lambda: JSONResponse(payload.model_dump(mode="json")).body
+        after = lambda: AppJSONResponse(payload.model_dump(mode="json")).body
+    else:
+        before = lambda: JSONResponse(jsonable_encoder(payload)).body
+        after = lambda: AppJSONResponse(payload).body
+
+    body = after()
+    report = {
+        "name": name,
+        "before_ms": time_ms(before, repeat),
+        "after_ms": time_ms(after, repeat),
+        "identity_bytes": len(before()),
+        "orjson_bytes": len(body),
+        "gzip_bytes": len(compression.compress(body, "gzip")),
+        "gzip_ms": time_ms(lambda: compression.compress(body, "gzip"), repeat),
+        "br_bytes": None,
+        "br_ms": None
+    }
+    if compression.brotli is not None:
+        report["br_bytes"] = len(compression.compress(body, "br"))
+        report["br_ms"] = time_ms(lambda: compression.compress(body, "br"), repeat)
+    return report
+
+
+def print_report(reports: List[Dict[str, Any]]):
+    print("\n" + "=" * 60)
+    print("📦 Response Encoding Benchmark")
+    print("=" * 60)
+    print(f"JSON encoder:  {'orjson ' + orjson.__version__ if orjson else 'stdlib json (orjson not installed)'}")
+    print(f"Brotli:        {'available' if compression.brotli else 'not installed, gzip only'}")
+    for report in reports:
+        speedup = report["before_ms"] / report["after_ms"] if report["after_ms"] else 0
+        print(f"\n{report['name']}")
+        print(f"  Serialize before/after:  {report['before_ms']:.2f} ms / {report['after_ms']:.2f} ms ({speedup:.1f}x)")
+        print(f"  Bytes before:            {report['identity_bytes']:,}")
+        print(f"  Bytes orjson:            {report['orjson_bytes']:,}")
+        ratio = report["identity_bytes"] / report["gzip_bytes"]
+        print(f"  Bytes gzip:              {report['gzip_bytes']:,} ({ratio:.1f}x smaller, {report['gzip_ms']:.2f} ms)")
+        if report["br_bytes"] is not None:
+            ratio = report["identity_bytes"] / report["br_bytes"]
+            print(f"  Bytes br:                {report['br_bytes']:,} ({ratio:.1f}x smaller, {report['br_ms']:.2f} ms)")
+    print("=" * 60 + "\n")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialization and compression")
+    parser.add_argument("--days", type=int, default=150, help="Days in the cultivation plan")
+    parser.add_argument("--market-days", type=int, default=30, help="Days in the Kerala market range")
+    parser.add_argument("--vegetables", type=int, default=60, help="Vegetables per market day")
+    parser.add_argument("--soil-limit", type=int, default=500, help="Soil CSV page size")
+    parser.add_argument("--repeat", type=int, default=50, help="Timing repetitions (median is reported)")
+    args = parser.parse_args()
+
+    random.seed(os.getenv("BENCHMARK_SEED", "39"))
+    payloads = [
+        (f"Smart cultivation plan ({args.days} days)", build_plan(args.days)),
+        (f"Kerala market ({args.market_days} days x {args.vegetables} vegetables)",
+         await build_market_payload(args.market_days, args.vegetables)),
+        (f"Soil CSV page (limit={args.soil_limit})", await build_soil_payload(args.soil_limit)),
+    ]
+    print_report([measure(name, payload, args.repeat) for name, payload in payloads])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,12 +6,48 @@ Stores all agricultural reference data in database for consistency across the ap
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+from types import MappingProxyType
 import asyncio
+import json
+import os
+import time
 from database.mongodb_setup import get_database
+from utils.response_utils import compute_etag
+
+# How often a worker checks the shared data version for updates made by other workers
+AGRICULTURAL_DATA_VERSION_CHECK_SECONDS = float(os.getenv("AGRICULTURAL_DATA_VERSION_CHECK_SECONDS", "5"))
+
+DATA_TYPES = [
+    "states_districts", "soil_types", "irrigation_types",
+    "seasons", "farming_experience", "farm_sizes", "farm_size_units"
+]
+
+class AgriculturalDataSnapshot:
+    """Read-only view of all reference data for one language, pre-serialized"""
+    __slots__ = ("language", "version", "options", "body", "etag")
+
+    def __init__(self, language: str, version: int, options: Dict[str, Any]):
+        self.language = language
+        self.version = version
+        self.options = MappingProxyType(options)
+        # The /all payload: only the "data" part of each document
+        payload = {key: value.get("data", value) for key, value in options.items()}
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+        self.etag = compute_etag(self.body)
 
 class AgriculturalDataManager:
-    def __init__(self):
+    def __init__(self, version_check_seconds: float = AGRICULTURAL_DATA_VERSION_CHECK_SECONDS):
         self.db: Optional[AsyncIOMotorDatabase] = None
+        # Reference data rarely changes: load it once and serve it from memory
+        self.version = 0
+        self._documents: Optional[Dict[str, Dict[str, Any]]] = None
+        self._snapshots: Dict[str, AgriculturalDataSnapshot] = {}
+        self._load_lock = asyncio.Lock()
+        # Every update bumps a version in the database; a worker whose loaded
+        # version differs (another worker updated the data) drops its snapshot
+        self.version_check_seconds = version_check_seconds
+        self._db_version: Optional[int] = None
+        self._version_checked_at = 0.0
         
     async def initialize(self):
         """Initialize database connection and setup collections"""
@@ -20,6 +56,47 @@ class AgriculturalDataManager:
         # Check if data already exists, if not populate it
         if await self.db.agricultural_data.count_documents({}) == 0:
             await self.populate_initial_data()
+        self.invalidate()
+    
+    def invalidate(self):
+        """Drop the in-memory snapshot (version bump); the next read reloads it"""
+        self.version += 1
+        self._documents = None
+        self._snapshots = {}
+    
+    async def _read_db_version(self) -> int:
+        doc = await self.db.agricultural_data_meta.find_one({"_id": "version"})
+        return doc["version"] if doc else 0
+
+    async def _check_db_version(self):
+        """Invalidate if another worker updated the data since it was loaded"""
+        if self._documents is None or time.monotonic() - self._version_checked_at < self.version_check_seconds:
+            return
+        self._version_checked_at = time.monotonic()
+        try:
+            db_version = await self._read_db_version()
+        except Exception as e:
+            print(f"⚠️  Could not check agricultural data version: {e}")
+            return
+        if db_version != self._db_version:
+            self.invalidate()
+
+    async def _load_documents(self) -> Dict[str, Dict[str, Any]]:
+        """All reference documents keyed by type, fetched in one query"""
+        await self._check_db_version()
+        if self._documents is not None:
+            return self._documents
+        async with self._load_lock:
+            if self._documents is None:
+                if self.db is None:
+                    await self.initialize()
+                # Read the version first: an update racing this load is caught by the next check
+                db_version = await self._read_db_version()
+                cursor = self.db.agricultural_data.find({"type": {"$in": DATA_TYPES}}, {"_id": 0})
+                self._documents = {doc["type"]: doc async for doc in cursor}
+                self._db_version = db_version
+                self._version_checked_at = time.monotonic()
+        return self._documents
             
     async def populate_initial_data(self):
         """Populate database with initial agricultural reference data"""
@@ -485,10 +562,8 @@ class AgriculturalDataManager:
         
     async def get_data_by_type(self, data_type: str, language: str = "en") -> Dict[str, Any]:
         """Get agricultural data by type with language support"""
-        if self.db is None:
-            await self.initialize()
-            
-        data = await self.db.agricultural_data.find_one({"type": data_type})
+        documents = await self._load_documents()
+        data = documents.get(data_type)
         if not data:
             return {}
             
@@ -498,25 +573,27 @@ class AgriculturalDataManager:
             result["translations_applied"] = data["translations"][language]
             
         return result
+    
+    async def get_snapshot(self, language: str = "en") -> AgriculturalDataSnapshot:
+        """Immutable, pre-serialized snapshot of all options for a language"""
+        await self._check_db_version()
+        snapshot = self._snapshots.get(language)
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
         
-    async def get_all_options(self, language: str = "en") -> Dict[str, Any]:
-        """Get all agricultural options for dropdowns"""
-        if self.db is None:
-            await self.initialize()
-            
+        version = self.version
         all_data = {}
+        for data_type in DATA_TYPES:
+            all_data[data_type] = await self.get_data_by_type(data_type, language)
         
-        # Get all data types
-        data_types = [
-            "states_districts", "soil_types", "irrigation_types", 
-            "seasons", "farming_experience", "farm_sizes", "farm_size_units"
-        ]
+        snapshot = AgriculturalDataSnapshot(language, version, all_data)
+        if version == self.version:
+            self._snapshots[language] = snapshot
+        return snapshot
         
-        for data_type in data_types:
-            data = await self.get_data_by_type(data_type, language)
-            all_data[data_type] = data
-            
-        return all_data
+    async def get_all_options(self, language: str = "en") -> Dict[str, Any]:
+        """Get all agricultural options for dropdowns (read-only mapping)"""
+        return (await self.get_snapshot(language)).options
         
     async def update_data(self, data_type: str, new_data: Dict[str, Any]) -> bool:
         """Update agricultural data"""
@@ -528,7 +605,9 @@ class AgriculturalDataManager:
             {"type": data_type},
             {"$set": new_data}
         )
+        await self.db.agricultural_data_meta.update_one({"_id": "version"}, {"$inc": {"version": 1}}, upsert=True)
         
+        self.invalidate()
         return result.modified_count > 0
 
 # Global instance
@@ -13,23 +13,46 @@ import asyncio
 MONGODB_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DB_NAME", "agriadvisor")
 
-# Global database connection
+# Connection pool configuration (shared by every module)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+# Global database connection: the one client (and pool) for the whole application
 database = None
 client = None
 
 async def connect_to_mongo():
-    """Create database connection"""
+    """Create the shared database connection (reused if it already exists)"""
     global client, database
-    client = AsyncIOMotorClient(MONGODB_URL)
-    database = client[DATABASE_NAME]
-    print(f"Connected to MongoDB: {DATABASE_NAME}")
+    if client is None:
+        client = AsyncIOMotorClient(
+            MONGODB_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS
+        )
+        database = client[DATABASE_NAME]
+        print(f"Connected to MongoDB: {DATABASE_NAME} (pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE})")
     return database
 
+async def warm_up_mongo():
+    """Open the minimum pool of connections before the first request arrives"""
+    db = await connect_to_mongo()
+    # Concurrent pings each check out a connection, so the pool is filled now
+    # instead of on the first requests
+    await asyncio.gather(*(db.command("ping") for _ in range(max(1, MONGO_MIN_POOL_SIZE))))
+    return db
+
 async def close_mongo_connection():
     """Close database connection"""
-    global client
+    global client, database
     if client:
         client.close()
+        client = None
+        database = None
         print("Disconnected from MongoDB")
 
 async def create_indexes():
@@ -3,75 +3,234 @@ Enhanced In-Memory Storage with File Backup for Agricultural Platform
 Ensures data persistence even without MongoDB
 """
 
+import atexit
+import heapq
 import json
 import os
+import threading
+import time
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+def _json_default(value):
+    """Serialize datetimes as ISO strings in storage files"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+FARMER_JOURNAL_FSYNC_EVERY = int(os.getenv("FARMER_JOURNAL_FSYNC_EVERY", "32"))
+FARMER_JOURNAL_FSYNC_INTERVAL = float(os.getenv("FARMER_JOURNAL_FSYNC_INTERVAL", "1.0"))
+FARMER_JOURNAL_COMPACT_ENTRIES = int(os.getenv("FARMER_JOURNAL_COMPACT_ENTRIES", "1000"))
+
+def _parse_farmer_dates(farmer_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert string dates back to datetime objects"""
+    for field in ("registration_date", "last_active"):
+        if isinstance(farmer_data.get(field), str):
+            farmer_data[field] = datetime.fromisoformat(farmer_data[field])
+    return farmer_data
 
 class FarmerStorage:
-    def __init__(self, backup_file="farmers_data.json"):
+    """
+    In-memory farmers persisted as a JSON snapshot plus an append-only journal.
+    Each change appends one line to the journal (fsynced in batches) and the
+    journal is folded into the snapshot once it grows long. On startup the
+    snapshot is loaded and the journal replayed on top of it.
+    """
+
+    def __init__(
+        self,
+        backup_file="farmers_data.json",
+        journal_file=None,
+        fsync_every: int = FARMER_JOURNAL_FSYNC_EVERY,
+        fsync_interval: float = FARMER_JOURNAL_FSYNC_INTERVAL,
+        compact_entries: int = FARMER_JOURNAL_COMPACT_ENTRIES
+    ):
         self.backup_file = backup_file
+        self.journal_file = journal_file or f"{os.path.splitext(backup_file)[0]}.journal"
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_entries = compact_entries
         self.farmers = {}
+        # Secondary indexes so logins don't scan every farmer
+        self.phone_index = {}  # phone -> farmer_id
+        self.email_index = {}  # email -> farmer_id
+        self._index_keys = {}  # farmer_id -> (phone, email) currently indexed
+        self._journal = None
+        self._journal_entries = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer = None  # flushes a batch left unsynced when writes stop
+        self._lock = threading.RLock()
         self.load_from_backup()
+        atexit.register(self.close)
+    
+    def _index_farmer(self, farmer_id: str, farmer_data: Dict[str, Any]):
+        """Point the phone/email indexes at this farmer, replacing stale keys"""
+        self._unindex_farmer(farmer_id)
+        phone = farmer_data.get("phone")
+        email = farmer_data.get("email")
+        if phone:
+            self.phone_index[phone] = farmer_id
+        if email:
+            self.email_index[email] = farmer_id
+        self._index_keys[farmer_id] = (phone, email)
+
+    def _unindex_farmer(self, farmer_id: str):
+        phone, email = self._index_keys.pop(farmer_id, (None, None))
+        if phone and self.phone_index.get(phone) == farmer_id:
+            del self.phone_index[phone]
+        if email and self.email_index.get(email) == farmer_id:
+            del self.email_index[email]
     
     def load_from_backup(self):
-        """Load farmers data from backup file"""
+        """Load the snapshot, then replay journaled changes made after it"""
         try:
             if os.path.exists(self.backup_file):
                 with open(self.backup_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    # Convert string dates back to datetime objects
                     for farmer_id, farmer_data in data.items():
-                        if isinstance(farmer_data.get('registration_date'), str):
-                            farmer_data['registration_date'] = datetime.fromisoformat(farmer_data['registration_date'])
-                        if isinstance(farmer_data.get('last_active'), str):
-                            farmer_data['last_active'] = datetime.fromisoformat(farmer_data['last_active'])
-                        self.farmers[farmer_id] = farmer_data
+                        self._put(_parse_farmer_dates(farmer_data))
                     print(f"✅ Loaded {len(self.farmers)} farmers from backup")
         except Exception as e:
             print(f"⚠️  Could not load backup: {e}")
-    
+
+        replayed = self.replay_journal()
+        if replayed:
+            print(f"✅ Replayed {replayed} journaled farmer changes")
+            # Fold the recovered changes into a fresh snapshot
+            self.compact()
+
+    def replay_journal(self) -> int:
+        """
+        Apply journal entries in order, stopping at a torn trailing write. The
+        torn fragment is cut off so later appends start on a fresh line.
+        """
+        if not os.path.exists(self.journal_file):
+            return 0
+        replayed = 0
+        complete_bytes = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                # A write cut short by a crash has no newline (or no valid JSON)
+                try:
+                    entry = json.loads(line) if line.endswith(b"\n") and line.strip() else None
+                except json.JSONDecodeError:
+                    entry = None
+                if entry is None:
+                    if line.strip():
+                        print("⚠️  Ignoring incomplete farmer journal entry")
+                        break
+                else:
+                    self._apply(entry)
+                    replayed += 1
+                complete_bytes += len(line)
+        if complete_bytes < os.path.getsize(self.journal_file):
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(complete_bytes)
+                f.flush()
+                os.fsync(f.fileno())
+        return replayed
+
+    def _apply(self, entry: Dict[str, Any]):
+        if entry["op"] == "put":
+            self._put(_parse_farmer_dates(entry["data"]))
+        elif entry["op"] == "touch" and entry["farmer_id"] in self.farmers:
+            self.farmers[entry["farmer_id"]]["last_active"] = datetime.fromisoformat(entry["last_active"])
+
+    def _put(self, farmer_data: Dict[str, Any]):
+        farmer_id = farmer_data["farmer_id"]
+        self.farmers[farmer_id] = farmer_data
+        self._index_farmer(farmer_id, farmer_data)
+
+    def _append(self, entry: Dict[str, Any]):
+        """Append a change to the journal; fsync once per batch or interval"""
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+        self._journal.write(json.dumps(entry, default=_json_default, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        self._journal_entries += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+        elif self._sync_timer is None:
+            self._sync_timer = threading.Timer(self.fsync_interval, self.sync)
+            self._sync_timer.daemon = True
+            self._sync_timer.start()
+        if self._journal_entries >= self.compact_entries:
+            self.compact()
+
+    def sync(self):
+        """Force journaled changes to disk"""
+        with self._lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+            if self._journal is not None and self._unsynced:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
     def save_to_backup(self):
-        """Save farmers data to backup file"""
-        try:
-            # Convert datetime objects to strings for JSON serialization
-            backup_data = {}
-            for farmer_id, farmer_data in self.farmers.items():
-                serializable_data = farmer_data.copy()
-                if isinstance(farmer_data.get('registration_date'), datetime):
-                    serializable_data['registration_date'] = farmer_data['registration_date'].isoformat()
-                if isinstance(farmer_data.get('last_active'), datetime):
-                    serializable_data['last_active'] = farmer_data['last_active'].isoformat()
-                backup_data[farmer_id] = serializable_data
-            
-            with open(self.backup_file, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, indent=2, ensure_ascii=False)
-            print(f"💾 Saved {len(self.farmers)} farmers to backup")
-        except Exception as e:
-            print(f"❌ Could not save backup: {e}")
+        """Write every farmer to the snapshot file atomically"""
+        tmp_file = f"{self.backup_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.farmers, f, default=_json_default, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.backup_file)
+
+    def compact(self):
+        """Fold the journal into a new snapshot and start an empty journal"""
+        with self._lock:
+            try:
+                self.save_to_backup()
+                if self._journal is not None:
+                    self._journal.close()
+                # Replaying a journal already in the snapshot is harmless, so
+                # a crash between these two steps loses nothing
+                self._journal = open(self.journal_file, 'w', encoding='utf-8')
+                self._journal_entries = 0
+                self._unsynced = 0
+                print(f"💾 Saved {len(self.farmers)} farmers to backup")
+            except Exception as e:
+                print(f"❌ Could not save backup: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self.sync()
+                self._journal.close()
+                self._journal = None
     
     def save_farmer(self, farmer_data: Dict[str, Any]) -> bool:
         """Save or update farmer data"""
         try:
-            farmer_id = farmer_data["farmer_id"]
-            self.farmers[farmer_id] = farmer_data
-            self.save_to_backup()
+            with self._lock:
+                # Apply before journaling so a compaction triggered by this
+                # append already includes the change in the snapshot
+                self._put(farmer_data)
+                self._append({"op": "put", "data": farmer_data})
             print(f"✅ Farmer saved: {farmer_data['name']} ({farmer_data['phone']})")
             return True
         except Exception as e:
             print(f"❌ Error saving farmer: {e}")
             return False
-    
+
     def get_farmer_by_id(self, farmer_id: str) -> Optional[Dict[str, Any]]:
         """Get farmer by ID"""
         return self.farmers.get(farmer_id)
     
     def get_farmer_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
         """Get farmer by phone number"""
-        for farmer_data in self.farmers.values():
-            if farmer_data.get("phone") == phone:
-                return farmer_data
-        return None
+        farmer_id = self.phone_index.get(phone)
+        return self.farmers.get(farmer_id) if farmer_id else None
+
+    def get_farmer_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Get farmer by email address"""
+        farmer_id = self.email_index.get(email)
+        return self.farmers.get(farmer_id) if farmer_id else None
     
     def get_all_farmers(self) -> list:
         """Get all farmers"""
@@ -80,8 +239,179 @@ class FarmerStorage:
     def update_last_active(self, farmer_id: str):
         """Update farmer's last active timestamp"""
         if farmer_id in self.farmers:
-            self.farmers[farmer_id]["last_active"] = datetime.now()
-            self.save_to_backup()
+            with self._lock:
+                last_active = datetime.now()
+                self.farmers[farmer_id]["last_active"] = last_active
+                self._append({"op": "touch", "farmer_id": farmer_id, "last_active": last_active})
+
+class PasskeyStorage:
+    """
+    In-memory passkeys and challenges used when MongoDB is unavailable.
+    Passkeys are made durable with an append-only log (one JSON line per
+    change) that is replayed on startup, so a write costs one small append
+    instead of rewriting every stored credential.
+    """
+
+    def __init__(self, log_file="passkeys.log"):
+        self.log_file = log_file
+        self.passkeys = {}  # credential_id -> passkey data
+        self.farmer_index = defaultdict(set)  # farmer_id -> credential_ids
+        self.challenges = {}  # challenge -> expires_at
+        self._challenge_expiry = []  # heap of (expires_at, challenge)
+        self._lock = threading.Lock()
+        self.replay_log()
+
+    def replay_log(self):
+        """
+        Rebuild passkeys from the append-only log, stopping at a torn trailing
+        write. The torn fragment is cut off so later appends start on a fresh line.
+        """
+        if not os.path.exists(self.log_file):
+            return
+        entries = 0
+        complete_bytes = 0
+        try:
+            with open(self.log_file, 'rb') as f:
+                for line in f:
+                    # A write cut short by a crash has no newline (or no valid JSON)
+                    try:
+                        entry = json.loads(line) if line.endswith(b"\n") and line.strip() else None
+                    except json.JSONDecodeError:
+                        entry = None
+                    if entry is None:
+                        if line.strip():
+                            print("⚠️  Ignoring incomplete passkey log entry")
+                            break
+                    else:
+                        entries += 1
+                        if entry["op"] == "put":
+                            self._put(entry["data"])
+                        elif entry["op"] == "delete":
+                            self._delete(entry["credential_id"])
+                    complete_bytes += len(line)
+            if complete_bytes < os.path.getsize(self.log_file):
+                with open(self.log_file, 'r+b') as f:
+                    f.truncate(complete_bytes)
+                    f.flush()
+                    os.fsync(f.fileno())
+            print(f"✅ Loaded {len(self.passkeys)} passkeys from log")
+            # Drop superseded entries once the log is mostly history
+            if entries > 2 * len(self.passkeys) + 100:
+                self.compact_log()
+        except Exception as e:
+            print(f"⚠️  Could not replay passkey log: {e}")
+
+    def compact_log(self):
+        """Rewrite the log with only the live passkeys"""
+        with self._lock:
+            tmp_file = f"{self.log_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for data in self.passkeys.values():
+                    f.write(json.dumps({"op": "put", "data": data}, default=_json_default, ensure_ascii=False) + "\n")
+            os.replace(tmp_file, self.log_file)
+
+    def _append(self, entry: Dict[str, Any]):
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, default=_json_default, ensure_ascii=False) + "\n")
+
+    def _put(self, data: Dict[str, Any]):
+        self._delete(data["credential_id"])
+        self.passkeys[data["credential_id"]] = data
+        if data.get("farmer_id"):
+            self.farmer_index[data["farmer_id"]].add(data["credential_id"])
+
+    def _delete(self, credential_id: str):
+        data = self.passkeys.pop(credential_id, None)
+        if data and data.get("farmer_id"):
+            self.farmer_index[data["farmer_id"]].discard(credential_id)
+
+    def save_passkey(self, data: Dict[str, Any]) -> bool:
+        try:
+            with self._lock:
+                self._append({"op": "put", "data": data})
+                self._put(data)
+            return True
+        except Exception as e:
+            print(f"❌ Error saving passkey: {e}")
+            return False
+
+    def get_passkey(self, credential_id: str) -> Optional[Dict[str, Any]]:
+        return self.passkeys.get(credential_id)
+
+    def get_passkeys_by_farmer(self, farmer_id: str) -> List[Dict[str, Any]]:
+        return [self.passkeys[c] for c in self.farmer_index.get(farmer_id, ()) if c in self.passkeys]
+
+    def delete_passkey(self, credential_id: str) -> bool:
+        with self._lock:
+            if credential_id not in self.passkeys:
+                return False
+            self._append({"op": "delete", "credential_id": credential_id})
+            self._delete(credential_id)
+            return True
+
+    def store_challenge(self, challenge: str, expires_at: datetime):
+        with self._lock:
+            self._purge_expired_challenges()
+            self.challenges[challenge] = expires_at
+            heapq.heappush(self._challenge_expiry, (expires_at, challenge))
+
+    def consume_challenge(self, challenge: str) -> bool:
+        """Remove a challenge and report whether it was still valid (single use)"""
+        with self._lock:
+            expires_at = self.challenges.pop(challenge, None)
+        return expires_at is not None and expires_at > datetime.utcnow()
+
+    def _purge_expired_challenges(self):
+        now = datetime.utcnow()
+        while self._challenge_expiry and self._challenge_expiry[0][0] <= now:
+            expires_at, challenge = heapq.heappop(self._challenge_expiry)
+            if self.challenges.get(challenge) == expires_at:
+                del self.challenges[challenge]
+
+class RefreshTokenStorage:
+    """
+    In-memory refresh tokens used when MongoDB is unavailable. Tokens are not
+    persisted: after a restart clients simply sign in again.
+    """
+
+    def __init__(self):
+        self.tokens = {}  # jti -> refresh token record
+        self._expiry = []  # heap of (expires_at, jti)
+        self._lock = threading.Lock()
+
+    def save_token(self, record: Dict[str, Any]):
+        with self._lock:
+            self._purge_expired()
+            self.tokens[record["jti"]] = record
+            heapq.heappush(self._expiry, (record["expires_at"], record["jti"]))
+
+    def get_token(self, jti: str) -> Optional[Dict[str, Any]]:
+        return self.tokens.get(jti)
+
+    def mark_used(self, jti: str, used_at: datetime) -> Optional[Dict[str, Any]]:
+        """Atomically claim an unused, unrevoked token (None if it was not)"""
+        with self._lock:
+            record = self.tokens.get(jti)
+            if record is None or record["used_at"] is not None or record["revoked"]:
+                return None
+            record["used_at"] = used_at
+            return record
+
+    def revoke_family(self, family_id: str):
+        with self._lock:
+            for record in self.tokens.values():
+                if record["family_id"] == family_id:
+                    record["revoked"] = True
+
+    def _purge_expired(self):
+        now = datetime.utcnow()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, jti = heapq.heappop(self._expiry)
+            record = self.tokens.get(jti)
+            if record is not None and record["expires_at"] == expires_at:
+                del self.tokens[jti]
 
-# Global storage instance
-farmer_storage = FarmerStorage()
\ No newline at end of file
+# Global storage instances
+farmer_storage = FarmerStorage()
+passkey_storage = PasskeyStorage()
+refresh_token_storage = RefreshTokenStorage()
\ No newline at end of file
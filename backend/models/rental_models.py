@@ -8,10 +8,13 @@ class TimeSlot(BaseModel):
     end_time: str = Field(..., description="End time (e.g., '13:00')")
     is_booked: bool = Field(False, description="Booking status")
     booked_by: Optional[str] = Field(None, description="User ID of booker")
+    held_by: Optional[str] = Field(None, description="User ID holding the slot pending confirmation")
+    hold_expires_at: Optional[datetime] = Field(None, description="When the pending hold lapses")
 
 class Availability(BaseModel):
     date: str = Field(..., description="Date (YYYY-MM-DD)")
     slots: List[TimeSlot]
+    free_mask: Optional[int] = Field(None, description="Bitmap of free hours (bit h = hour h), maintained by the server")
 
 class Equipment(BaseModel):
     id: Optional[str] = Field(None, alias="_id")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -14,6 +14,17 @@ class DailyTask(BaseModel):
     weather_condition: Optional[str] = None # forecasted weather for this day
     deep_link: Optional[str] = None # rental, market, schemes, etc.
 
+class ScheduleRange(BaseModel):
+    """Consecutive days (inclusive) that all follow one shared filler template"""
+    start_day: int
+    end_day: int
+    template_id: str
+
+class CompactSchedule(BaseModel):
+    total_days: int
+    tasks: List[DailyTask] = []  # LLM tasks and any day that differs from its template
+    ranges: List[ScheduleRange] = []
+
 class SmartCultivationRequest(BaseModel):
     user_id: Optional[str] = None
     land_area: float
@@ -50,10 +61,25 @@ class SmartCultivationPlan(BaseModel):
     intercropping_strategy: Optional[str] = None
     analysis: Optional[Dict[str, str]] = None
     best_practices: Optional[List[str]] = None
-    schedule: List[DailyTask]
+    schedule: List[DailyTask] = []  # Full day-by-day view, expanded from compact_schedule on read
+    compact_schedule: Optional[CompactSchedule] = None
+    yield_estimate: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+class PlanSummary(BaseModel):
+    """A saved plan without its analysis or schedule, for listing"""
+    plan_id: str
+    crop_name: str
+    start_date: str
+    end_date: Optional[str] = None
+    status: str
+    location: Optional[str] = None
+    land_area: Optional[float] = None
+    land_unit: Optional[str] = None
+    total_days: Optional[int] = None
     yield_estimate: Optional[str] = None
-    created_at: datetime = datetime.now()
-    updated_at: datetime = datetime.now()
+    created_at: datetime
 
 class GeneratePlanRequest(BaseModel):
     soil_type: str
@@ -46,6 +46,8 @@ except ImportError:
     UserVerificationRequirement = None
     PublicKeyCredentialDescriptor = None
 import os
+from services.rate_limiter import otp_phone_limiter
+from services.sms_service import SMSDispatcher, SMSQueueFull, sms_dispatcher
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-jwt-key-change-in-production")
@@ -54,9 +56,7 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 OTP_EXPIRE_MINUTES = 5
 
-# SMS Configuration (using multiple providers for reliability)
-TWILIO_SID = os.getenv("TWILIO_ACCOUNT_SID")
-TWILIO_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+# SMS delivery (providers, retries) is configured in services.sms_service
 FIREBASE_API_KEY = os.getenv("FIREBASE_API_KEY")
 
 # WebAuthn Configuration
@@ -109,25 +109,29 @@ class TokenResponse(BaseModel):
     farmer_data: Dict[str, Any]
 
 class AuthenticationService:
-    def __init__(self, database: AsyncIOMotorDatabase):
+    def __init__(self, database: AsyncIOMotorDatabase, sms: Optional[SMSDispatcher] = None):
         self.db = database
+        self.sms = sms or sms_dispatcher
         
     # Phone + OTP Authentication
     async def send_otp(self, phone: str) -> Dict[str, Any]:
         """Send OTP via SMS to farmer's phone"""
+        await otp_phone_limiter.check(phone)
         try:
             # Generate 6-digit OTP
             otp = secrets.randbelow(900000) + 100000
             otp_str = str(otp)
+            otp_hash = hashlib.sha256(otp_str.encode()).hexdigest()
             
             # Store OTP in database with expiry
             otp_data = {
                 "phone": phone,
-                "otp": hashlib.sha256(otp_str.encode()).hexdigest(),
+                "otp": otp_hash,
                 "created_at": datetime.now(),
                 "expires_at": datetime.now() + timedelta(minutes=OTP_EXPIRE_MINUTES),
                 "attempts": 0,
-                "verified": False
+                "verified": False,
+                "delivery_status": "queued"
             }
             
             # Upsert OTP record
@@ -137,21 +141,25 @@ class AuthenticationService:
                 upsert=True
             )
             
-            # Send SMS via multiple providers for reliability
-            sms_sent = await self._send_sms_multi_provider(phone, otp_str)
+            # Hand the SMS to the dispatch queue; delivery is recorded on the OTP
+            await self.sms.enqueue(
+                phone,
+                self._otp_message(otp_str),
+                on_status=lambda job: self._record_delivery(otp_hash, job)
+            )
             
-            if sms_sent:
-                return {
-                    "success": True,
-                    "message": "OTP sent successfully",
-                    "expires_in_minutes": OTP_EXPIRE_MINUTES
-                }
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to send OTP. Please try again."
-                )
+            return {
+                "success": True,
+                "message": "OTP sent successfully",
+                "expires_in_minutes": OTP_EXPIRE_MINUTES
+            }
                 
+        except SMSQueueFull as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": "30"}
+            )
         except Exception as e:
             print(f"Error sending OTP: {e}")
             raise HTTPException(
@@ -159,45 +167,27 @@ class AuthenticationService:
                 detail="Error sending OTP"
             )
     
-    async def _send_sms_multi_provider(self, phone: str, otp: str) -> bool:
-        """Send SMS using multiple providers for reliability"""
-        
-        # SMS message in multiple languages
+    def _otp_message(self, otp: str, language: str = "en") -> str:
+        """OTP SMS text in multiple languages"""
         messages = {
             "en": f"Your Krishi Saathi OTP is: {otp}. Valid for {OTP_EXPIRE_MINUTES} minutes. Do not share with anyone.",
             "hi": f"आपका कृषि साथी OTP है: {otp}। {OTP_EXPIRE_MINUTES} मिनट के लिए वैध। किसी के साथ साझा न करें।",
             "ml": f"നിങ്ങളുടെ കൃഷി സാഥി OTP: {otp}। {OTP_EXPIRE_MINUTES} മിനിറ്റ് വരെ വാലിഡ്। ആരുമായും പങ്കിടരുത്।"
         }
-        
-        # Try Twilio first
-        if TWILIO_SID and TWILIO_TOKEN:
-            try:
-                from twilio.rest import Client
-                client = Client(TWILIO_SID, TWILIO_TOKEN)
-                
-                message = client.messages.create(
-                    body=messages["en"],  # Default to English
-                    from_="+1234567890",  # Your Twilio number
-                    to=phone
-                )
-                return True
-            except Exception as e:
-                print(f"Twilio SMS failed: {e}")
-        
-        # Fallback to Firebase SMS (or any other provider)
-        try:
-            # Implement Firebase SMS or other provider
-            return await self._send_firebase_sms(phone, messages["en"])
-        except Exception as e:
-            print(f"Firebase SMS failed: {e}")
-            return False
+        return messages.get(language, messages["en"])
     
-    async def _send_firebase_sms(self, phone: str, message: str) -> bool:
-        """Send SMS via Firebase or other provider"""
-        # Implement your preferred SMS provider here
-        # For now, return True for development
-        print(f"SMS to {phone}: {message}")
-        return True
+    async def _record_delivery(self, otp_hash: str, job: Dict[str, Any]):
+        """Store SMS delivery status on the OTP it belongs to"""
+        # Matching the hash keeps a late status from touching a newer OTP
+        await self.db.otp_verifications.update_one(
+            {"phone": job["phone"], "otp": otp_hash},
+            {"$set": {
+                "delivery_status": job["status"],
+                "delivery_provider": job["provider"],
+                "delivery_attempts": job["attempts"],
+                "delivery_error": job["error"]
+            }}
+        )
     
     async def verify_otp(self, phone: str, otp: str, device_info: Optional[Dict] = None) -> TokenResponse:
         """Verify OTP and create/login farmer"""
@@ -2,70 +2,118 @@
 
 import logging
 import os
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional
 from datetime import datetime
-from groq import Groq
+from services.llm_client import LLMClient, llm_client
+from services.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+CHAT_TIMEOUT_SECONDS = float(os.getenv("CHAT_LLM_TIMEOUT_SECONDS", "20"))
+# Longest wait for the next streamed chunk (the first token included)
+CHAT_STREAM_IDLE_TIMEOUT_SECONDS = float(os.getenv("CHAT_STREAM_IDLE_TIMEOUT_SECONDS", "10"))
+
 
 class ChatbotService:
     """Service for handling chatbot interactions using Groq LLM"""
 
-    def __init__(self):
+    def __init__(self, llm: Optional[LLMClient] = None, cache: Optional[SemanticCache] = None):
         self.context_data = {
             "topics": ["crop_management", "weather", "market_prices", "diseases", "schemes"],
             "languages": ["english", "hindi", "malayalam"],
             "last_updated": datetime.now().isoformat()
         }
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise RuntimeError("GROQ_API_KEY is not set in environment variables.")
-        self.client = Groq(api_key=api_key)
-        self.model = "llama-3.3-70b-versatile"
+        self.llm = llm or llm_client
+        self.model = self.llm.model
+        # Near-duplicate questions are answered without calling the LLM
+        self.cache = cache if cache is not None else SemanticCache()
+
+    def _messages(self, message: str, language: str) -> List[Dict[str, str]]:
+        system_prompt = (
+            "You are Krishi Saathi, an intelligent agricultural assistant for Indian farmers. "
+            "Provide accurate, helpful, and practical advice on farming, crops, weather, "
+            "government schemes, and market prices.\n\n"
+            f"Context:\n"
+            f"- User Language: {language}\n"
+            "- Role: Agricultural Expert & Assistant\n"
+            "- Tone: Friendly, respectful, encouraging, and authoritative on farming matters.\n\n"
+            "Instructions:\n"
+            "1. Answer the farmer's question simply and clearly.\n"
+            "2. If the user asks about live data (today's weather, exact market prices) that you "
+            "   don't have, politely explain and guide them to the relevant app section "
+            "   (Weather or Market Prices tab).\n"
+            "3. Do not invent false data.\n"
+            "4. Keep answers concise (under 150 words) unless detailed explanation is requested.\n"
+            f"5. Respond in {language} if possible, otherwise use English.\n"
+            "6. Use simple language that farmers can understand easily."
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": message}
+        ]
 
     async def get_response(self, message: str, language: str = "english") -> str:
         """Generate chatbot response using Groq LLM"""
         if not message or not message.strip():
             return self._get_general_response(language)
 
-        try:
-            system_prompt = (
-                "You are Krishi Saathi, an intelligent agricultural assistant for Indian farmers. "
-                "Provide accurate, helpful, and practical advice on farming, crops, weather, "
-                "government schemes, and market prices.\n\n"
-                f"Context:\n"
-                f"- User Language: {language}\n"
-                "- Role: Agricultural Expert & Assistant\n"
-                "- Tone: Friendly, respectful, encouraging, and authoritative on farming matters.\n\n"
-                "Instructions:\n"
-                "1. Answer the farmer's question simply and clearly.\n"
-                "2. If the user asks about live data (today's weather, exact market prices) that you "
-                "   don't have, politely explain and guide them to the relevant app section "
-                "   (Weather or Market Prices tab).\n"
-                "3. Do not invent false data.\n"
-                "4. Keep answers concise (under 150 words) unless detailed explanation is requested.\n"
-                f"5. Respond in {language} if possible, otherwise use English.\n"
-                "6. Use simple language that farmers can understand easily."
-            )
+        cached = self.cache.get(message, language)
+        if cached is not None:
+            return cached
 
-            chat_completion = self.client.chat.completions.create(
+        try:
+            reply = await self.llm.complete(
+                self._messages(message, language),
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message}
-                ],
+                timeout=CHAT_TIMEOUT_SECONDS,
                 max_tokens=512,
                 temperature=0.7,
             )
 
-            return chat_completion.choices[0].message.content.strip()
+            reply = reply.strip()
+            self.cache.set(message, language, reply)
+            return reply
 
         except Exception as e:
             logger.error(f"Groq API Error: {e}")
             # Fallback to rule-based responses if Groq fails
             return self._rule_based_response(message, language)
 
+    async def stream_response(self, message: str, language: str = "english") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the reply as events: "token" chunks while the LLM generates,
+        a "fallback" carrying the rule-based answer if it fails part-way
+        (it replaces any partial text), then "done" with the final response.
+        """
+        cached = self.cache.get(message, language) if message and message.strip() else None
+
+        if not message or not message.strip():
+            response = self._get_general_response(language)
+            yield {"type": "token", "text": response}
+        elif cached is not None:
+            response = cached
+            yield {"type": "token", "text": response, "cached": True}
+        else:
+            parts = []
+            try:
+                async for chunk in self.llm.stream(
+                    self._messages(message, language),
+                    model=self.model,
+                    timeout=CHAT_STREAM_IDLE_TIMEOUT_SECONDS,
+                    max_tokens=512,
+                    temperature=0.7,
+                ):
+                    parts.append(chunk)
+                    yield {"type": "token", "text": chunk}
+                response = "".join(parts).strip()
+                self.cache.set(message, language, response)
+            except Exception as e:
+                logger.error(f"Groq streaming error: {e}")
+                response = self._rule_based_response(message, language)
+                yield {"type": "fallback", "text": response}
+
+        yield {"type": "done", "response": response, "timestamp": datetime.now().isoformat()}
+
     def _rule_based_response(self, message: str, language: str) -> str:
         """Fallback rule-based response if Groq API fails"""
         message_lower = message.lower()
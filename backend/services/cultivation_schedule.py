@@ -0,0 +1,176 @@
+"""
+Compact cultivation schedules
+
+A plan stores only the tasks the LLM wrote (plus any day that was changed
+afterwards) and describes the remaining filler days as ranges pointing at
+the shared FILLER_TEMPLATES below. Day-by-day DailyTask objects are only
+built on read, and only for the requested window.
+"""
+
+import bisect
+import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from models.smart_cultivation_models import CompactSchedule, DailyTask, ScheduleRange, SmartCultivationPlan
+
+# Filler tasks per lifecycle stage, shared by every plan. Ids are persisted
+# in plan documents, so change a template's text in place but never reuse an id.
+FILLER_TEMPLATES = {
+    "seedling_check": {
+        "task_name": "Seedling Health Check",
+        "description": "Monitor germination and early growth.",
+        "instructions": "Check for damping off disease. Ensure soil moisture is adequate for young roots.",
+        "task_type": "monitoring",
+        "deep_link": None
+    },
+    "weed_pest_patrol": {
+        "task_name": "Weed & Pest Patrol",
+        "description": "Critical growth phase monitoring.",
+        "instructions": "Look for early signs of pests under leaves. Remove competitive weeds manually if possible.",
+        "task_type": "protection",
+        "deep_link": "disease_detection"
+    },
+    "water_nutrient_check": {
+        "task_name": "Water & Nutrient Check",
+        "description": "Mid-season growth maintenance.",
+        "instructions": "Check soil moisture depth. Look for yellowing leaves indicating nutrient deficiency.",
+        "task_type": "irrigation",
+        "deep_link": None
+    },
+    "pre_harvest_inspection": {
+        "task_name": "Pre-Harvest Inspection",
+        "description": "Maturation and readiness check.",
+        "instructions": "Check grain/fruit maturity. Plan specifically for labor and equipment needs.",
+        "task_type": "harvesting",
+        "deep_link": "market"
+    }
+}
+
+# (upper bound of lifecycle progress, template id)
+STAGE_TEMPLATES = [
+    (0.2, "seedling_check"),
+    (0.5, "weed_pest_patrol"),
+    (0.8, "water_nutrient_check"),
+    (float("inf"), "pre_harvest_inspection")
+]
+
+
+def parse_date(value: str) -> datetime.date:
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def task_date(start: datetime.date, day_number: int) -> str:
+    return (start + datetime.timedelta(days=day_number - 1)).strftime("%Y-%m-%d")
+
+
+def filler_template_id(day_number: int, total_days: int) -> str:
+    """Template for a filler day, by how far into the lifecycle it falls"""
+    progress = day_number / total_days
+    for upper, template_id in STAGE_TEMPLATES:
+        if progress < upper:
+            return template_id
+    return STAGE_TEMPLATES[-1][1]
+
+
+def render_filler(template_id: str, day_number: int, start: datetime.date) -> DailyTask:
+    return DailyTask(
+        day_number=day_number,
+        date=task_date(start, day_number),
+        resources_needed=["Visual Inspection"],
+        status="pending",
+        **FILLER_TEMPLATES[template_id]
+    )
+
+
+def add_filler_day(ranges: List[ScheduleRange], day_number: int, template_id: str):
+    """Extend the last range when the day continues it, otherwise open a new one"""
+    if ranges and ranges[-1].end_day == day_number - 1 and ranges[-1].template_id == template_id:
+        ranges[-1].end_day = day_number
+    else:
+        ranges.append(ScheduleRange(start_day=day_number, end_day=day_number, template_id=template_id))
+
+
+def compact_schedule(schedule: List[DailyTask], start_date: str) -> CompactSchedule:
+    """Fold a full schedule back into template ranges plus sparse tasks"""
+    if not schedule:
+        return CompactSchedule(total_days=0)
+    start = parse_date(start_date)
+    total_days = max(task.day_number for task in schedule)
+    tasks: List[DailyTask] = []
+    ranges: List[ScheduleRange] = []
+    for task in sorted(schedule, key=lambda t: t.day_number):
+        template_id = filler_template_id(task.day_number, total_days)
+        if task == render_filler(template_id, task.day_number, start):
+            add_filler_day(ranges, task.day_number, template_id)
+        else:
+            tasks.append(task)
+    return CompactSchedule(total_days=total_days, tasks=tasks, ranges=ranges)
+
+
+def iter_schedule(
+    compact: CompactSchedule,
+    start_date: str,
+    first_day: int = 1,
+    last_day: Optional[int] = None
+) -> Iterator[DailyTask]:
+    """Yield the DailyTasks for days first_day..last_day in order"""
+    start = parse_date(start_date)
+    last_day = compact.total_days if last_day is None else min(last_day, compact.total_days)
+    sparse = {task.day_number: task for task in compact.tasks if first_day <= task.day_number <= last_day}
+    range_starts = [r.start_day for r in compact.ranges]
+
+    for day_number in range(max(first_day, 1), last_day + 1):
+        if day_number in sparse:
+            yield sparse[day_number]
+            continue
+        i = bisect.bisect_right(range_starts, day_number) - 1
+        if i >= 0 and compact.ranges[i].end_day >= day_number:
+            yield render_filler(compact.ranges[i].template_id, day_number, start)
+
+
+def day_window(start_date: str, from_date: datetime.date, days: int) -> Tuple[int, int]:
+    """Plan day numbers covering `days` calendar days starting at from_date"""
+    first_day = (from_date - parse_date(start_date)).days + 1
+    return first_day, first_day + days - 1
+
+
+def schedule_window(plan: SmartCultivationPlan, from_date: datetime.date, days: int) -> List[DailyTask]:
+    """Tasks of a stored plan falling in [from_date, from_date + days)"""
+    first_day, last_day = day_window(plan.start_date, from_date, days)
+    if plan.compact_schedule is not None:
+        return list(iter_schedule(plan.compact_schedule, plan.start_date, first_day, last_day))
+    # Plans saved before compaction keep their full schedule
+    return [task for task in plan.schedule if first_day <= task.day_number <= last_day]
+
+
+def schedule_window_from_doc(doc: Dict[str, Any], from_date: datetime.date, days: int) -> List[DailyTask]:
+    """
+    schedule_window for a raw plan document holding just start_date and
+    compact_schedule (or schedule); only the tasks in the window are parsed.
+    """
+    first_day, last_day = day_window(doc["start_date"], from_date, days)
+    if doc.get("compact_schedule"):
+        compact = doc["compact_schedule"]
+        window = CompactSchedule(
+            total_days=compact["total_days"],
+            tasks=[t for t in compact.get("tasks", []) if first_day <= t["day_number"] <= last_day],
+            ranges=compact.get("ranges", [])
+        )
+        return list(iter_schedule(window, doc["start_date"], first_day, last_day))
+    return [DailyTask(**t) for t in doc.get("schedule") or [] if first_day <= t["day_number"] <= last_day]
+
+
+def with_full_schedule(plan: SmartCultivationPlan) -> SmartCultivationPlan:
+    """The plan with `schedule` expanded (legacy full plans are returned as-is)"""
+    if plan.compact_schedule is None:
+        return plan
+    return plan.model_copy(update={
+        "schedule": list(iter_schedule(plan.compact_schedule, plan.start_date)),
+        "compact_schedule": None
+    })
+
+
+def with_compact_schedule(plan: SmartCultivationPlan) -> SmartCultivationPlan:
+    """The plan with only `compact_schedule` set"""
+    compact = plan.compact_schedule or compact_schedule(plan.schedule, plan.start_date)
+    return plan.model_copy(update={"schedule": [], "compact_schedule": compact})
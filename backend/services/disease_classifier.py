@@ -0,0 +1,201 @@
+"""
+CPU plant disease classifier
+
+Runs a small image CNN exported to ONNX (e.g. an int8-quantized
+MobileNetV3 fine-tuned on leaf images) with ONNX Runtime. The model takes
+NCHW float32 input normalized with ImageNet mean/std and returns one logit
+per label. Labels come from a JSON list next to the model, each
+"<crop>/<disease id>" where the disease id is a `disease_database` id or
+"healthy".
+
+JPEG decoding and resizing are CPU-bound and hold the GIL, so they run in
+a process pool; the forward pass runs in a thread (ONNX Runtime releases
+the GIL) so the event loop keeps serving requests. Concurrent requests
+are micro-batched into one forward pass (the model's batch dimension must
+be dynamic). The session and pool are created once, by load() at startup.
+
+numpy, Pillow and onnxruntime are optional: without them (or without a
+model file) `available` stays False and DiseaseDetectionService keeps its
+rule-based analysis.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from utils.micro_batcher import MicroBatcher
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+logger = logging.getLogger(__name__)
+
+DISEASE_MODEL_PATH = os.getenv("DISEASE_MODEL_PATH", os.path.join(os.path.dirname(__file__), "..", "ml_models", "plant_disease.onnx"))
+DISEASE_LABELS_PATH = os.getenv("DISEASE_LABELS_PATH")  # defaults to <model>.labels.json
+DISEASE_INPUT_SIZE = int(os.getenv("DISEASE_INPUT_SIZE", "224"))
+DISEASE_TOP_K = int(os.getenv("DISEASE_TOP_K", "3"))
+DISEASE_PREPROCESS_WORKERS = int(os.getenv("DISEASE_PREPROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+DISEASE_INFERENCE_THREADS = int(os.getenv("DISEASE_INFERENCE_THREADS", "0"))  # 0 lets ONNX Runtime decide
+DISEASE_BATCH_MAX_SIZE = int(os.getenv("DISEASE_BATCH_MAX_SIZE", "8"))
+DISEASE_BATCH_MAX_WAIT_MS = float(os.getenv("DISEASE_BATCH_MAX_WAIT_MS", "5"))
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def decode_image(image_bytes: bytes, size: int):
+    """
+    Decode, center-crop and resize an upload to a size x size RGB uint8
+    array. Runs in the preprocessing processes, so it must stay importable
+    at module level.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    # JPEG can decode straight to a reduced scale, far cheaper than a full decode
+    image.draft("RGB", (size * 2, size * 2))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image = ImageOps.fit(image, (size, size), Image.BILINEAR)
+    return np.asarray(image, dtype=np.uint8)
+
+
+def parse_label(label: str) -> Dict[str, Optional[str]]:
+    """Split a "crop/disease_id" label; a bare disease id has no crop"""
+    crop, sep, disease_id = label.partition("/")
+    if not sep:
+        return {"label": label, "crop": None, "disease_id": label}
+    return {"label": label, "crop": crop.lower() or None, "disease_id": disease_id}
+
+
+class DiseaseClassifier:
+    def __init__(
+        self,
+        model_path: str = DISEASE_MODEL_PATH,
+        labels_path: Optional[str] = DISEASE_LABELS_PATH,
+        input_size: int = DISEASE_INPUT_SIZE,
+        top_k: int = DISEASE_TOP_K,
+        preprocess_workers: int = DISEASE_PREPROCESS_WORKERS,
+        inference_threads: int = DISEASE_INFERENCE_THREADS,
+        batch_max_size: int = DISEASE_BATCH_MAX_SIZE,
+        batch_max_wait_ms: float = DISEASE_BATCH_MAX_WAIT_MS
+    ):
+        self.model_path = model_path
+        self.labels_path = labels_path or os.path.splitext(model_path)[0] + ".labels.json"
+        self.input_size = input_size
+        self.top_k = top_k
+        self.preprocess_workers = preprocess_workers
+        self.inference_threads = inference_threads
+        self.session = None
+        self.input_name: Optional[str] = None
+        self.labels: List[Dict[str, Optional[str]]] = []
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.batcher = MicroBatcher(self._forward_batch, batch_max_size, batch_max_wait_ms)
+
+    @property
+    def available(self) -> bool:
+        return self.session is not None
+
+    def load(self) -> bool:
+        """Create the inference session and preprocessing pool; False if unavailable"""
+        if self.available:
+            return True
+        if np is None or Image is None or ort is None:
+            logger.warning("numpy, Pillow and onnxruntime are needed for the disease classifier")
+            return False
+        if not os.path.exists(self.model_path):
+            logger.warning(f"Disease model not found at {self.model_path}")
+            return False
+
+        with open(self.labels_path, encoding="utf-8") as f:
+            self.labels = [parse_label(label) for label in json.load(f)]
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.inference_threads:
+            options.intra_op_num_threads = self.inference_threads
+        session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        model_input = session.get_inputs()[0]
+        self.input_name = model_input.name
+        if isinstance(model_input.shape[0], int):
+            logger.warning(f"Disease model has a fixed batch size of {model_input.shape[0]}; running images one by one")
+            self.batcher.max_batch_size = 1
+        outputs = session.get_outputs()[0].shape[-1]
+        if isinstance(outputs, int) and outputs != len(self.labels):
+            raise ValueError(f"Model has {outputs} outputs but {len(self.labels)} labels")
+        self.session = session
+
+        # spawn: forking a process that already runs ONNX Runtime threads is unsafe
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.preprocess_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        # The first run allocates buffers and picks kernels; do it before real traffic
+        self.forward(np.zeros((1, self.input_size, self.input_size, 3), dtype=np.uint8))
+        logger.info(f"Disease classifier loaded: {len(self.labels)} labels, {self.preprocess_workers} preprocessing workers")
+        return True
+
+    async def preprocess(self, image_bytes: bytes):
+        """Decoded image (H, W, 3 uint8) produced in the process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, decode_image, image_bytes, self.input_size)
+
+    def forward(self, images):
+        """Class probabilities (N, labels) for a uint8 NHWC batch"""
+        batch = images.astype(np.float32) / 255.0
+        batch = (batch - np.array(IMAGENET_MEAN, dtype=np.float32)) / np.array(IMAGENET_STD, dtype=np.float32)
+        batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+        logits = self.session.run(None, {self.input_name: batch})[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def top_predictions(self, probabilities, crop: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        The top_k labels of one image. With a known crop only that crop's
+        labels are ranked (renormalized), unless the model has none for it.
+        """
+        candidates = [i for i, label in enumerate(self.labels) if crop and label["crop"] == crop.lower()]
+        if candidates:
+            scores = probabilities[candidates]
+            scores = scores / max(float(scores.sum()), 1e-12)
+        else:
+            candidates = list(range(len(self.labels)))
+            scores = probabilities
+        order = np.argsort(-scores)[:self.top_k]
+        return [{**self.labels[candidates[i]], "score": round(float(scores[i]), 4)} for i in order]
+
+    async def _forward_batch(self, images: List[Any]) -> List[Any]:
+        probabilities = await asyncio.to_thread(self.forward, np.stack(images))
+        return list(probabilities)
+
+    async def classify(self, image_bytes: bytes, crop: Optional[str] = None) -> List[Dict[str, Any]]:
+        image = await self.preprocess(image_bytes)
+        probabilities = await self.batcher.submit(image)
+        return self.top_predictions(probabilities, crop)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"available": self.available, "batching": self.batcher.metrics()}
+
+    async def close(self):
+        await self.batcher.stop()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+        self.session = None
+
+
+disease_classifier = DiseaseClassifier()
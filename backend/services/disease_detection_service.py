@@ -3,18 +3,32 @@
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+import os
 import uuid
 import base64
 
+from services.disease_classifier import DiseaseClassifier
+
 logger = logging.getLogger(__name__)
 
+# Below this top-1 probability the farmer is asked to confirm with a better photo
+DISEASE_MIN_CONFIDENCE = float(os.getenv("DISEASE_MIN_CONFIDENCE", "0.5"))
+TREATMENT_URGENCY = {"High": "Immediate", "Medium": "Moderate", "Low": "Low"}
+
 class DiseaseDetectionService:
     """Service for plant disease detection and analysis"""
     
-    def __init__(self):
+    def __init__(self, classifier: Optional[DiseaseClassifier] = None):
         # In-memory storage for analysis history (replace with database in production)
         self.analysis_history = []
         self.disease_database = self._load_disease_database()
+        # Image model; analysis falls back to the crop's common diseases while it isn't loaded
+        self.classifier = classifier
+        self.diseases_by_id = {
+            disease["id"]: disease
+            for crop_data in self.disease_database.values()
+            for disease in crop_data["common_diseases"]
+        }
     
     def _load_disease_database(self) -> Dict[str, Any]:
         """Load disease database with common crop diseases"""
@@ -112,8 +126,8 @@ class DiseaseDetectionService:
             # Generate analysis ID
             analysis_id = str(uuid.uuid4())
             
-            # In a real implementation, this would use ML models for image analysis
-            # For now, we'll simulate analysis based on crop type and symptoms
+            # The image model when it is loaded; otherwise simulate from crop type and symptoms
+            use_model = self.classifier is not None and self.classifier.available
             
             analysis_result = {
                 "analysis_id": analysis_id,
@@ -123,11 +137,15 @@ class DiseaseDetectionService:
                 "detected_diseases": [],
                 "recommendations": [],
                 "severity": "Medium",
-                "treatment_urgency": "Moderate"
+                "treatment_urgency": "Moderate",
+                "method": "model" if use_model else "simulated"
             }
             
+            if use_model:
+                predictions = await self.classifier.classify(image_data, crop_type)
+                self._apply_predictions(analysis_result, predictions, crop_type)
             # Simulate disease detection based on crop type
-            if crop_type and crop_type.lower() in self.disease_database:
+            elif crop_type and crop_type.lower() in self.disease_database:
                 crop_diseases = self.disease_database[crop_type.lower()]["common_diseases"]
                 if crop_diseases:
                     # Select most likely disease (in real implementation, this would be ML-based)
@@ -191,6 +209,50 @@ class DiseaseDetectionService:
                 "error": str(e)
             }
     
+    def _apply_predictions(self, analysis_result: Dict[str, Any], predictions: List[Dict[str, Any]], crop_type: Optional[str]):
+        """Fill an analysis from the classifier's top-k predictions"""
+        top = predictions[0]
+        crop = top["crop"] or crop_type or "unknown"
+        analysis_result["predictions"] = predictions
+        analysis_result["confidence"] = top["score"]
+        analysis_result["crop_type"] = crop_type or crop
+        analysis_result["crop"] = crop
+
+        analysis_result["detected_diseases"] = [
+            {**self.diseases_by_id[p["disease_id"]], "confidence": p["score"]}
+            for p in predictions if p["disease_id"] in self.diseases_by_id
+        ]
+
+        disease = self.diseases_by_id.get(top["disease_id"])
+        if top["disease_id"] == "healthy":
+            analysis_result["disease"] = "Healthy"
+            analysis_result["severity"] = "None"
+            analysis_result["treatment_urgency"] = "None"
+            analysis_result["treatment"] = "No treatment needed."
+            tips = [tip for d in self.disease_database.get(crop, {}).get("common_diseases", []) for tip in d.get("prevention", [])]
+            analysis_result["prevention"] = ". ".join(dict.fromkeys(tips)) + "." if tips else "Monitor plant closely."
+            analysis_result["recommendations"] = ["No disease detected. Keep monitoring the crop regularly"]
+        elif disease is not None:
+            analysis_result["disease"] = disease["name"]
+            analysis_result["severity"] = disease["severity"]
+            analysis_result["treatment_urgency"] = TREATMENT_URGENCY.get(disease["severity"], "Moderate")
+            treatment = disease.get("treatment", {})
+            treatment_items = treatment.get("chemical", []) + treatment.get("organic", []) + treatment.get("cultural", [])
+            analysis_result["treatment"] = ". ".join(treatment_items) + "."
+            analysis_result["prevention"] = ". ".join(disease.get("prevention", [])) + "."
+            analysis_result["recommendations"] = self._generate_recommendations(disease)
+        else:
+            # The model knows a disease the database has no entry for yet
+            analysis_result["disease"] = top["disease_id"].replace("_", " ").title()
+            analysis_result["treatment"] = "Remove affected parts. Improve air circulation. Apply fungicide if necessary."
+            analysis_result["prevention"] = "Consult local agricultural expert. Monitor plant closely."
+            analysis_result["recommendations"] = ["Consult local agricultural expert for treatment options"]
+
+        if top["score"] < DISEASE_MIN_CONFIDENCE:
+            analysis_result["recommendations"].insert(
+                0, "Low confidence: retake the photo of a single affected leaf in daylight, or consult a local expert"
+            )
+
     def _generate_recommendations(self, disease_info: Dict[str, Any]) -> List[str]:
         """Generate treatment recommendations based on disease info"""
         recommendations = []
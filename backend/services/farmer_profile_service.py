@@ -14,6 +14,7 @@ from bson import ObjectId
 import json
 
 from services.auth_service import verify_token
+from api.auth import invalidate_farmer_identity
 from database.mongodb_setup import get_database
 
 router = APIRouter(prefix="/api/farmer", tags=["Farmer Profile"])
@@ -126,6 +127,7 @@ class FarmerProfileService:
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Farmer not found"
                 )
+            invalidate_farmer_identity(farmer_id)
             
             # Return updated profile
             return await self.get_farmer_profile(farmer_id)
@@ -177,6 +179,7 @@ class FarmerProfileService:
                     "$set": {"last_active": datetime.now()}
                 }
             )
+            invalidate_farmer_identity(farmer_id)
             
             # Log activity
             await self._log_activity(farmer_id, "farm_created", {"farm_id": farm_id, "name": farm_data.name})
@@ -239,6 +242,7 @@ class FarmerProfileService:
                     {"farmer_id": farmer_id, "farms.farm_id": farm_id},
                     {"$set": farmer_update}
                 )
+                invalidate_farmer_identity(farmer_id)
             
             # Log activity
             await self._log_activity(farmer_id, "farm_updated", {"farm_id": farm_id})
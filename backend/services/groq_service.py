@@ -1,50 +1,51 @@
 import os
 import json
 import logging
-from typing import Dict, Any, List, Optional
-from groq import Groq
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+from services.llm_client import LLMClient, LLMError, llm_client
+from utils.json_stream import IncrementalObjectParser
 
 logger = logging.getLogger(__name__)
 
+PLAN_TIMEOUT_SECONDS = float(os.getenv("PLAN_LLM_TIMEOUT_SECONDS", "120"))
+# Streaming bounds the wait for each chunk rather than the whole plan
+PLAN_STREAM_IDLE_TIMEOUT_SECONDS = float(os.getenv("PLAN_STREAM_IDLE_TIMEOUT_SECONDS", "30"))
+
 class GroqService:
-    def __init__(self):
-        self.api_key = os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            logger.warning("GROQ_API_KEY not found in environment variables")
-        
-        self.client = Groq(api_key=self.api_key)
-        self.model = "llama-3.3-70b-versatile"
+    def __init__(self, llm: Optional[LLMClient] = None):
+        self.llm = llm or llm_client
+        self.model = self.llm.model
 
-    async def generate_cultivation_plan(self, crops: List[str], soil_type: str, soil_ph: Optional[float] = None, water_availability: str = "Moderate", location: str = "India", season: Optional[str] = None) -> Dict[str, Any]:
+    def build_cultivation_plan_messages(self, crops: List[str], soil_type: str, soil_ph: Optional[float] = None, water_availability: str = "Moderate", location: str = "India", season: Optional[str] = None) -> List[Dict[str, str]]:
         """
-        Generates a detailed cultivation plan using Groq LLM.
+        Chat messages for a cultivation plan. The plan is a pure function of these,
+        which is what the plan template cache keys on.
         """
-        try:
-            crops_str = ", ".join(crops)
-            is_multi_crop = len(crops) > 1
-
-            if not is_multi_crop:
-                intercropping_instruction = (
-                    f"Since the farmer chose ONLY {crops_str}, do NOT suggest other crops. "
-                    f"Instead describe optimal plant spacing, row arrangement, and field density for {crops_str} to maximize yield."
-                )
-            else:
-                intercropping_instruction = (
-                    f"Analyze compatibility of {crops_str}. Give the optimal planting row ratio "
-                    f"(e.g., '2 rows Wheat : 1 row Chickpea') and explain why this combination works."
-                )
+        crops_str = ", ".join(crops)
+        is_multi_crop = len(crops) > 1
 
+        if not is_multi_crop:
+            intercropping_instruction = (
+                f"Since the farmer chose ONLY {crops_str}, do NOT suggest other crops. "
+                f"Instead describe optimal plant spacing, row arrangement, and field density for {crops_str} to maximize yield."
+            )
+        else:
+            intercropping_instruction = (
+                f"Analyze compatibility of {crops_str}. Give the optimal planting row ratio "
+                f"(e.g., '2 rows Wheat : 1 row Chickpea') and explain why this combination works."
+            )
+
+        lifecycle_days = 120
+        if any(c.lower() in ["wheat", "barley", "mustard", "gram", "chickpea"] for c in crops):
             lifecycle_days = 120
-            if any(c.lower() in ["wheat", "barley", "mustard", "gram", "chickpea"] for c in crops):
-                lifecycle_days = 120
-            elif any(c.lower() in ["rice", "paddy", "cotton"] for c in crops):
-                lifecycle_days = 150
-            elif any(c.lower() in ["maize", "corn", "soybean"] for c in crops):
-                lifecycle_days = 110
-            elif any(c.lower() in ["vegetable", "tomato", "brinjal", "onion"] for c in crops):
-                lifecycle_days = 90
-
-            prompt = f"""You are a world-class Agronomist creating a PRECISION FARMING PLAN.
+        elif any(c.lower() in ["rice", "paddy", "cotton"] for c in crops):
+            lifecycle_days = 150
+        elif any(c.lower() in ["maize", "corn", "soybean"] for c in crops):
+            lifecycle_days = 110
+        elif any(c.lower() in ["vegetable", "tomato", "brinjal", "onion"] for c in crops):
+            lifecycle_days = 90
+
+        prompt = f"""You are a world-class Agronomist creating a PRECISION FARMING PLAN.
 IMPORTANT: The farmer has chosen ONLY: {crops_str}. DO NOT mention any other crop at all.
 
 Farm Details:
@@ -97,18 +98,28 @@ STRICT RULES FOR tasks ARRAY:
 - Output ALL tasks in correct chronological order.
 """
 
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are an expert agronomist. Create a complete farming plan ONLY for {crops_str}. Never mention other crops. Output only JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
+        return [
+            {
+                "role": "system",
+                "content": f"You are an expert agronomist. Create a complete farming plan ONLY for {crops_str}. Never mention other crops. Output only JSON."
+            },
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ]
+
+    async def generate_cultivation_plan(self, crops: List[str], soil_type: str, soil_ph: Optional[float] = None, water_availability: str = "Moderate", location: str = "India", season: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generates a detailed cultivation plan using Groq LLM.
+        """
+        try:
+            messages = self.build_cultivation_plan_messages(crops, soil_type, soil_ph, water_availability, location, season)
+
+            response_content = await self.llm.complete(
+                messages,
                 model=self.model,
+                timeout=PLAN_TIMEOUT_SECONDS,
                 temperature=0.2,
                 max_tokens=8000,
                 top_p=1,
@@ -116,8 +127,6 @@ STRICT RULES FOR tasks ARRAY:
                 stream=False,
                 response_format={"type": "json_object"}
             )
-
-            response_content = chat_completion.choices[0].message.content
             parsed_content = json.loads(response_content)
             return parsed_content
 
@@ -130,5 +139,41 @@ STRICT RULES FOR tasks ARRAY:
                 "best_practices": []
             }
 
+    async def stream_cultivation_plan(self, crops: List[str], soil_type: str, soil_ph: Optional[float] = None, water_availability: str = "Moderate", location: str = "India", season: Optional[str] = None) -> AsyncIterator[Tuple]:
+        """
+        Streams the same plan as generate_cultivation_plan, yielding parser
+        events as soon as each part is complete: ("field", key, value) for
+        top-level members, ("item", "analysis", section, text) per analysis
+        section and ("item", "tasks", index, task) per task.
+        Raises LLMError if the completion fails or ends before the JSON does.
+        """
+        messages = self.build_cultivation_plan_messages(crops, soil_type, soil_ph, water_availability, location, season)
+        parser = IncrementalObjectParser(stream_keys=("analysis", "tasks"))
+
+        # JSON mode is not combined with streaming; the parser skips anything around the object
+        chunks = self.llm.stream(
+            messages,
+            model=self.model,
+            timeout=PLAN_STREAM_IDLE_TIMEOUT_SECONDS,
+            temperature=0.2,
+            max_tokens=8000,
+            top_p=1
+        )
+        try:
+            async for chunk in chunks:
+                try:
+                    events = parser.feed(chunk)
+                except json.JSONDecodeError as e:
+                    raise LLMError(f"Malformed plan JSON from the model: {e}") from e
+                for event in events:
+                    yield event
+                if parser.done:
+                    break
+        finally:
+            # Release the LLM slot as soon as the object is closed
+            await chunks.aclose()
+        if not parser.done:
+            raise LLMError("The model stopped before the plan JSON was complete")
+
 # Singleton instance
 groq_service = GroqService()
@@ -0,0 +1,231 @@
+"""
+Async LLM client shared by every Groq call site
+
+LLMClient puts a concurrency limit, a per-call timeout and retries with
+exponential backoff in front of a backend. GroqBackend reuses one
+AsyncGroq (and so one HTTP connection pool) for the whole process;
+StubBackend answers deterministically without network access and is what
+tests and LLM_BACKEND=stub use.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+try:
+    from groq import AsyncGroq, APIConnectionError, APITimeoutError
+except ImportError:
+    AsyncGroq = None
+    APIConnectionError = APITimeoutError = None
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+Messages = List[Dict[str, str]]
+
+
+class LLMError(Exception):
+    """The completion failed after all retries (or was not retryable)"""
+
+
+class LLMBackend:
+    """Base class: complete() returns the assistant message text, stream() yields it in chunks"""
+
+    name = "base"
+
+    async def complete(self, messages: Messages, model: str, **params) -> str:
+        raise NotImplementedError
+
+    async def stream(self, messages: Messages, model: str, **params) -> AsyncIterator[str]:
+        yield await self.complete(messages, model, **params)
+
+    async def close(self):
+        pass
+
+
+class GroqBackend(LLMBackend):
+    name = "groq"
+
+    def __init__(self, api_key: str):
+        # Retries and timeouts are handled by LLMClient so they apply to every backend
+        self.client = AsyncGroq(api_key=api_key, max_retries=0)
+
+    async def complete(self, messages: Messages, model: str, **params) -> str:
+        completion = await self.client.chat.completions.create(messages=messages, model=model, **params)
+        return completion.choices[0].message.content
+
+    async def stream(self, messages: Messages, model: str, **params) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(messages=messages, model=model, stream=True, **params)
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def close(self):
+        await self.client.close()
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic offline backend. `responder(messages, params)` produces the
+    reply; without one, JSON-mode calls get "{}" and text calls a stable
+    digest of the prompt. The first `fail_times` calls raise ConnectionError,
+    and streams break after `fail_after_chunks` chunks when that is set.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        responder: Optional[Callable[[Messages, Dict[str, Any]], str]] = None,
+        delay: float = 0.0,
+        fail_times: int = 0,
+        fail_after_chunks: Optional[int] = None
+    ):
+        self.responder = responder
+        self.delay = delay
+        self.fail_times = fail_times
+        self.fail_after_chunks = fail_after_chunks
+        self.calls: List[Dict[str, Any]] = []
+
+    async def _reply(self, messages: Messages, model: str, params: Dict[str, Any]) -> str:
+        self.calls.append({"messages": messages, "model": model, **params})
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if len(self.calls) <= self.fail_times:
+            raise ConnectionError("stub backend unavailable")
+        if self.responder is not None:
+            return self.responder(messages, params)
+        if params.get("response_format", {}).get("type") == "json_object":
+            return "{}"
+        digest = hashlib.sha256(messages[-1]["content"].encode("utf-8")).hexdigest()[:8]
+        return f"[stub {digest}] {messages[-1]['content'][:200]}"
+
+    async def complete(self, messages: Messages, model: str, **params) -> str:
+        return await self._reply(messages, model, params)
+
+    async def stream(self, messages: Messages, model: str, **params) -> AsyncIterator[str]:
+        reply = await self._reply(messages, model, params)
+        for i, word in enumerate(reply.split(" ")):
+            if self.fail_after_chunks is not None and i >= self.fail_after_chunks:
+                raise ConnectionError("stub stream interrupted")
+            if i and self.delay:
+                await asyncio.sleep(self.delay)
+            yield word if i == 0 else " " + word
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if APIConnectionError is not None and isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+class LLMClient:
+    """Concurrency-limited, timed, retrying front for an LLMBackend"""
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        model: str = LLM_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base_delay: float = LLM_RETRY_BASE_DELAY
+    ):
+        self.backend = backend
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def complete(
+        self,
+        messages: Messages,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **params
+    ) -> str:
+        """Run one chat completion and return its text, or raise LLMError"""
+        model = model or self.model
+        timeout = timeout or self.timeout
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Only the call itself holds a slot; backoff sleeps don't
+                async with self._semaphore:
+                    return await asyncio.wait_for(
+                        self.backend.complete(messages, model, **params), timeout
+                    )
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise LLMError(f"{self.backend.name} completion failed: {e!r}") from e
+                delay = self.retry_base_delay * 2 ** attempt
+                logger.warning(f"LLM call via {self.backend.name} failed ({e!r}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def stream(
+        self,
+        messages: Messages,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **params
+    ) -> AsyncIterator[str]:
+        """
+        Yield the completion as it is generated. `timeout` bounds the wait for
+        each chunk, the first token included. Failures before the first chunk
+        are retried like complete(); after it they raise LLMError, since the
+        caller has already used part of the answer.
+        """
+        model = model or self.model
+        timeout = timeout or self.timeout
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self._semaphore:
+                    chunks = self.backend.stream(messages, model, **params)
+                    try:
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                            except StopAsyncIteration:
+                                return
+                            started = True
+                            yield chunk
+                    finally:
+                        await chunks.aclose()
+            except Exception as e:
+                if started or not is_retryable(e) or attempt == self.max_retries:
+                    raise LLMError(f"{self.backend.name} stream failed: {e!r}") from e
+                delay = self.retry_base_delay * 2 ** attempt
+                logger.warning(f"LLM stream via {self.backend.name} failed ({e!r}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def close(self):
+        await self.backend.close()
+
+
+def create_default_backend() -> LLMBackend:
+    """Groq unless LLM_BACKEND=stub"""
+    if LLM_BACKEND == "stub":
+        logger.warning("Using the stub LLM backend; responses are not real")
+        return StubBackend()
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise RuntimeError("GROQ_API_KEY is not set in environment variables.")
+    if AsyncGroq is None:
+        raise RuntimeError("Install groq to use the Groq LLM backend")
+    return GroqBackend(api_key)
+
+
+llm_client = LLMClient(create_default_backend())
@@ -0,0 +1,300 @@
+"""
+Background generation of smart-cultivation plans
+
+Submitting a plan request stores a job in Mongo (`plan_jobs`) and returns
+its id at once; a fixed number of worker tasks generate the plans, so a
+burst of requests at sowing season queues up instead of holding HTTP
+workers and LLM slots. An identical request that is still queued or running
+gets the existing job back; a unique index on `in_flight_key` (set only
+while a job is queued or running) enforces that across processes.
+
+A running job is leased to the process generating it, which renews the
+lease while it works. Jobs whose lease has lapsed (the owner crashed or was
+restarted) are put back in the queued state. recover() at startup queues
+every such job, and a periodic sweep also takes over jobs that have waited
+longer than a lease, whose process may be gone; claiming a job is atomic,
+so one held by two queues still runs once. Jobs that a live worker in
+another process is generating are left alone.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from models.smart_cultivation_models import SmartCultivationPlan, SmartCultivationRequest
+from services.cultivation_schedule import with_compact_schedule
+
+logger = logging.getLogger(__name__)
+
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "4"))
+PLAN_JOB_QUEUE_SIZE = int(os.getenv("PLAN_JOB_QUEUE_SIZE", "1000"))
+PLAN_JOB_RETENTION_HOURS = int(os.getenv("PLAN_JOB_RETENTION_HOURS", "24"))
+PLAN_JOB_LEASE_SECONDS = float(os.getenv("PLAN_JOB_LEASE_SECONDS", "120"))
+
+IN_FLIGHT = ["queued", "running"]
+
+StatusCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class PlanQueueFull(Exception):
+    """Too many plans are waiting; the client should retry later"""
+
+
+def request_key(request: SmartCultivationRequest) -> str:
+    payload = json.dumps(request.model_dump(), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def public_job(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Status fields of a job document (without the request and result)"""
+    job = {"job_id": doc["_id"]}
+    for field in ("status", "error", "created_at", "started_at", "finished_at"):
+        value = doc.get(field)
+        job[field] = value.isoformat() if isinstance(value, datetime) else value
+    return job
+
+
+class PlanJobQueue:
+    """
+    Mongo-backed job queue drained by `workers` tasks. `generate` is the
+    coroutine producing a plan (SmartCultivationService.generate_plan);
+    `on_status` is awaited with the public job after every status change.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[SmartCultivationRequest], Awaitable[SmartCultivationPlan]],
+        collection,
+        workers: int = PLAN_JOB_WORKERS,
+        queue_size: int = PLAN_JOB_QUEUE_SIZE,
+        retention_hours: int = PLAN_JOB_RETENTION_HOURS,
+        on_status: Optional[StatusCallback] = None,
+        lease_seconds: float = PLAN_JOB_LEASE_SECONDS
+    ):
+        self.generate = generate
+        self.collection = collection
+        self.worker_count = workers
+        self.queue_size = queue_size
+        self.retention = timedelta(hours=retention_hours)
+        self.on_status = on_status
+        self.lease = timedelta(seconds=lease_seconds)
+        # Identifies this process's claims on running jobs
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self._pending = set()  # job ids waiting in this process's queue
+
+    async def ensure_indexes(self):
+        # At most one queued or running job per request, across processes
+        await self.collection.create_index(
+            "in_flight_key", unique=True, partialFilterExpression={"in_flight_key": {"$exists": True}}
+        )
+        await self.collection.create_index([("status", 1), ("lease_expires_at", 1)])
+        await self.collection.create_index([("status", 1), ("created_at", 1)])
+        # Finished jobs (and their results) are removed after the retention period
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def submit(self, request: SmartCultivationRequest) -> Dict[str, Any]:
+        """Queue a plan request, or return the identical one already in flight"""
+        self.start()
+        key = request_key(request)
+        while True:
+            existing = await self.collection.find_one({"in_flight_key": key})
+            if existing:
+                return {**public_job(existing), "deduplicated": True}
+            if self.queue.qsize() >= self.queue_size:
+                raise PlanQueueFull(f"{self.queue.qsize()} plans are already waiting")
+
+            doc = {
+                "_id": secrets.token_hex(8),
+                "request_key": key,
+                "in_flight_key": key,
+                "request": request.model_dump(),
+                "status": "queued",
+                "error": None,
+                "result": None,
+                "created_at": datetime.now(),
+                "started_at": None,
+                "finished_at": None
+            }
+            try:
+                await self.collection.insert_one(doc)
+            except DuplicateKeyError:
+                continue  # an identical request was queued concurrently; return that one
+            self._enqueue(doc["_id"])
+            return {**public_job(doc), "deduplicated": False}
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self.collection.find_one({"_id": job_id}, {"request": 0, "result": 0})
+        return public_job(doc) if doc else None
+
+    async def get_result(self, job_id: str) -> Optional[SmartCultivationPlan]:
+        """The generated plan, or None until the job is done"""
+        doc = await self.collection.find_one({"_id": job_id, "status": "done"}, {"result": 1})
+        return SmartCultivationPlan(**doc["result"]) if doc else None
+
+    async def _reclaim_expired(self) -> List[str]:
+        """Put running jobs whose owner stopped renewing the lease back in the queued state"""
+        reclaimed = []
+        lapsed = {"status": "running", "$or": [
+            {"lease_expires_at": {"$lt": datetime.utcnow()}},
+            {"lease_expires_at": None}  # claimed before leases existed
+        ]}
+        async for doc in self.collection.find(lapsed, {"lease_expires_at": 1}):
+            # Only if nobody renewed or reclaimed it since it was read
+            result = await self.collection.update_one(
+                {"_id": doc["_id"], "status": "running", "lease_expires_at": doc.get("lease_expires_at")},
+                {"$set": {"status": "queued", "started_at": None, "owner": None, "lease_expires_at": None}}
+            )
+            if result.modified_count:
+                reclaimed.append(doc["_id"])
+        return reclaimed
+
+    async def recover(self) -> int:
+        """Re-queue jobs that are queued or whose running owner's lease lapsed"""
+        self.start()
+        await self._reclaim_expired()
+        count = 0
+        async for doc in self.collection.find({"status": "queued"}, {"_id": 1}).sort("created_at", 1):
+            if self._enqueue(doc["_id"]):
+                count += 1
+        if count:
+            logger.info(f"Recovered {count} unfinished plan jobs")
+        return count
+
+    async def _set_status(
+        self, job_id: str, status: str, expected: Optional[str] = None, owned: bool = False, **fields
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Update the job (only if it is in `expected` status, and still leased
+        to this process when `owned`, if given) and notify
+        """
+        query = {"_id": job_id} if expected is None else {"_id": job_id, "status": expected}
+        if owned:
+            query["owner"] = self.owner
+        update = {"$set": {"status": status, **fields}}
+        if status not in IN_FLIGHT:
+            # Frees the request for new submissions
+            update["$unset"] = {"in_flight_key": ""}
+        doc = await self.collection.find_one_and_update(
+            query,
+            update,
+            projection={"result": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc and self.on_status:
+            try:
+                await self.on_status(public_job(doc))
+            except Exception as e:
+                logger.error(f"Plan job status callback failed for job {job_id}: {e}")
+        return doc
+
+    async def _heartbeat(self, job_id: str):
+        """Renew this process's lease on a running job until cancelled"""
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                await self.collection.update_one(
+                    {"_id": job_id, "status": "running", "owner": self.owner},
+                    {"$set": {"lease_expires_at": datetime.utcnow() + self.lease}}
+                )
+            except Exception as e:
+                logger.error(f"Could not renew lease of plan job {job_id}: {e}")
+
+    async def _run(self, job_id: str):
+        # Claiming atomically keeps a job queued twice (across a recovery) from running twice
+        doc = await self._set_status(
+            job_id, "running", expected="queued", started_at=datetime.now(),
+            owner=self.owner, lease_expires_at=datetime.utcnow() + self.lease
+        )
+        if doc is None:
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            plan = await self.generate(SmartCultivationRequest(**doc["request"]))
+            result = with_compact_schedule(plan).model_dump(exclude={"schedule"})
+            status, fields = "done", {"result": result}
+        except Exception as e:
+            logger.error(f"Plan job {job_id} failed: {e}")
+            status, fields = "failed", {"error": str(e)}
+        finally:
+            heartbeat.cancel()
+        # TTL index: expires_at is compared with the server's UTC clock
+        fields.update(finished_at=datetime.now(), expires_at=datetime.utcnow() + self.retention, lease_expires_at=None)
+        # A job reclaimed after our lease lapsed belongs to its new owner now
+        await self._set_status(job_id, status, expected="running", owned=True, **fields)
+
+    async def _stale_queued(self) -> List[str]:
+        """Jobs queued for longer than a lease, possibly by a process that is gone"""
+        # created_at is the submitting process's local time
+        stale = {"status": "queued", "created_at": {"$lt": datetime.now() - self.lease}}
+        return [doc["_id"] async for doc in self.collection.find(stale, {"_id": 1}).sort("created_at", 1)]
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(self.lease.total_seconds())
+            try:
+                for job_id in await self._reclaim_expired() + await self._stale_queued():
+                    self._enqueue(job_id)
+            except Exception as e:
+                logger.error(f"Plan job lease sweep failed: {e}")
+
+    def _enqueue(self, job_id: str) -> bool:
+        """Add a job to this process's queue unless it is already waiting there"""
+        if job_id in self._pending:
+            return False
+        self._pending.add(job_id)
+        self.queue.put_nowait(job_id)
+        return True
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            self._pending.discard(job_id)
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Plan job {job_id} crashed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        """Start the worker tasks (idempotent)"""
+        if self._workers:
+            return
+        if self.queue is None:
+            # Unbounded so recover() can always re-queue; submit() enforces queue_size
+            self.queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        self._reaper = asyncio.create_task(self._reap())
+        logger.info(f"Plan job queue started with {self.worker_count} workers")
+
+    async def drain(self):
+        """Wait until every queued job has finished"""
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def stop(self):
+        tasks = self._workers + ([self._reaper] if self._reaper else [])
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        self._reaper = None
+        # Queue is bound to the current event loop; start() makes a new one
+        self.queue = None
+        self._pending = set()
@@ -0,0 +1,108 @@
+"""
+Content-addressed cache of LLM cultivation plan templates
+
+A template is the raw Groq plan (tasks by day number, analysis, practices)
+before any date mapping or weather adjustment. It depends only on the
+normalized agronomic inputs, so it is keyed by a hash of the exact chat
+messages and model sent to Groq: editing the prompt changes every key, and
+old templates simply age out. Templates live in Mongo with an in-memory
+LRU in front of it.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from cachetools import TTLCache
+
+from models.smart_cultivation_models import SmartCultivationRequest
+
+logger = logging.getLogger(__name__)
+
+# Bump when the way templates are turned into plans changes incompatibly
+PLAN_TEMPLATE_VERSION = 1
+PLAN_TEMPLATE_CACHE_SIZE = int(os.getenv("PLAN_TEMPLATE_CACHE_SIZE", "256"))
+PLAN_TEMPLATE_TTL_DAYS = int(os.getenv("PLAN_TEMPLATE_TTL_DAYS", "30"))
+PH_BUCKET_WIDTH = 0.5
+
+
+def ph_bucket(soil_ph: Optional[float]) -> Optional[float]:
+    """Round pH to the nearest half unit; agronomic advice doesn't change within it"""
+    if soil_ph is None:
+        return None
+    return round(soil_ph / PH_BUCKET_WIDTH) * PH_BUCKET_WIDTH
+
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    value = " ".join((value or "").split())
+    return value.title() if value else None
+
+
+def normalize_plan_inputs(request: SmartCultivationRequest) -> Dict[str, Any]:
+    """Keyword arguments for GroqService.generate_cultivation_plan, canonicalized"""
+    return {
+        "crops": sorted({_clean(crop) for crop in request.selected_crops if _clean(crop)}),
+        "soil_type": _clean(request.soil_type),
+        "soil_ph": ph_bucket(request.soil_ph),
+        "water_availability": _clean(request.water_availability) or "Moderate",
+        "location": _clean(request.location) or "Kerala",
+        "season": _clean(request.season)
+    }
+
+
+def template_key(model: str, messages: List[Dict[str, str]]) -> str:
+    payload = json.dumps(
+        {"version": PLAN_TEMPLATE_VERSION, "model": model, "messages": messages},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PlanTemplateCache:
+    """Two-level (LRU, then Mongo) store of plan templates by template_key"""
+
+    def __init__(self, collection, maxsize: int = PLAN_TEMPLATE_CACHE_SIZE, ttl_days: int = PLAN_TEMPLATE_TTL_DAYS):
+        self.collection = collection
+        self.ttl = timedelta(days=ttl_days)
+        self.memory = TTLCache(maxsize=maxsize, ttl=self.ttl.total_seconds())
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A private copy of the template (callers adjust tasks in place)"""
+        template = self.memory.get(key)
+        if template is None:
+            try:
+                doc = await self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.now()}})
+            except Exception as e:
+                logger.error(f"Plan template lookup failed: {e}")
+                return None
+            if doc is None:
+                return None
+            template = doc["template"]
+            self.memory[key] = template
+        return copy.deepcopy(template)
+
+    async def set(self, key: str, template: Dict[str, Any], inputs: Dict[str, Any]):
+        template = copy.deepcopy(template)
+        self.memory[key] = template
+        now = datetime.now()
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "template": template,
+                    "inputs": inputs,
+                    "version": PLAN_TEMPLATE_VERSION,
+                    "created_at": now,
+                    "expires_at": now + self.ttl
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Plan template store failed: {e}")
@@ -0,0 +1,191 @@
+"""Token-bucket rate limiting for expensive endpoints (OTP, chat, disease analysis)"""
+
+import ipaddress
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request, status
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Comma-separated proxy addresses or CIDRs allowed to set X-Forwarded-For
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+
+
+def parse_networks(value: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+trusted_proxy_networks = parse_networks(TRUSTED_PROXIES)
+
+
+class MemoryBucketStore:
+    """
+    Token buckets kept in process memory. Idle buckets are evicted in LRU
+    order once max_keys is reached; an evicted bucket simply starts full.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated_at)
+
+    async def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> Tuple[bool, float]:
+        """Take `cost` tokens; return (allowed, seconds until enough tokens)"""
+        now = time.monotonic()
+        tokens, updated_at = self.buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+
+        if tokens >= cost:
+            tokens -= cost
+            retry_after = 0.0
+        else:
+            retry_after = (cost - tokens) / refill_per_second
+
+        self.buckets[key] = (tokens, now)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return retry_after == 0.0, retry_after
+
+
+class RedisBucketStore:
+    """Token buckets shared across workers through Redis (atomic Lua script)"""
+
+    TAKE_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local retry = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+    else
+        retry = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(retry)
+    """
+
+    def __init__(self, redis_client, prefix: str = "ratelimit:"):
+        self.redis = redis_client
+        self.prefix = prefix
+        self._script = redis_client.register_script(self.TAKE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBucketStore":
+        if aioredis is None:
+            raise RuntimeError("Install redis to use RATE_LIMIT_REDIS_URL")
+        return cls(aioredis.from_url(url))
+
+    async def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> Tuple[bool, float]:
+        retry_after = float(await self._script(
+            keys=[self.prefix + key],
+            args=[capacity, refill_per_second, time.time(), cost]
+        ))
+        return retry_after == 0.0, retry_after
+
+
+def create_default_store():
+    """Redis when RATE_LIMIT_REDIS_URL is set, otherwise process memory"""
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            return RedisBucketStore.from_url(RATE_LIMIT_REDIS_URL)
+        except Exception as e:
+            logger.error(f"Redis rate limit store unavailable, using memory: {e}")
+    return MemoryBucketStore()
+
+
+default_store = create_default_store()
+
+
+class RateLimiter:
+    """A named token bucket policy: `capacity` requests burst, refilled steadily"""
+
+    def __init__(self, name: str, capacity: int, per_seconds: float, store=None):
+        self.name = name
+        self.capacity = capacity
+        self.refill_per_second = capacity / per_seconds
+        self.store = store or default_store
+
+    async def check(self, key: str):
+        """Consume one request for `key` or raise 429 with Retry-After"""
+        try:
+            allowed, retry_after = await self.store.take(
+                f"{self.name}:{key}", self.capacity, self.refill_per_second
+            )
+        except Exception as e:
+            # A broken limiter store must not take the endpoint down with it
+            logger.error(f"Rate limit check failed for {self.name}: {e}")
+            return
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxy_networks)
+
+
+def resolve_client_ip(peer: Optional[str], forwarded_for: Optional[str]) -> str:
+    """
+    Client address behind trusted proxies. X-Forwarded-For is only honoured
+    when the direct peer is a trusted proxy, and then the right-most hop
+    not added by one of our proxies is used: anything left of it is
+    client-supplied and can be spoofed.
+    """
+    if not peer:
+        return "unknown"
+    if not forwarded_for or not is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+def client_ip(request: Request) -> str:
+    """Client address of an HTTP request (see resolve_client_ip)"""
+    return resolve_client_ip(request.client.host if request.client else None, request.headers.get("x-forwarded-for"))
+
+
+def client_ip_from_environ(environ: dict) -> str:
+    """Client address of a Socket.IO connection (see resolve_client_ip)"""
+    client = environ.get("asgi.scope", {}).get("client")
+    return resolve_client_ip(client[0] if client else environ.get("REMOTE_ADDR"), environ.get("HTTP_X_FORWARDED_FOR"))
+
+
+def rate_limit(limiter: RateLimiter, key_func: Callable[[Request], str] = client_ip):
+    """FastAPI dependency enforcing `limiter` per key (client IP by default)"""
+    async def dependency(request: Request):
+        await limiter.check(key_func(request))
+    return dependency
+
+
+# Shared policies
+otp_phone_limiter = RateLimiter("otp:phone", capacity=3, per_seconds=600)
+otp_ip_limiter = RateLimiter("otp:ip", capacity=10, per_seconds=600)
+chat_limiter = RateLimiter("chat:ip", capacity=20, per_seconds=60)
+disease_analysis_limiter = RateLimiter("disease:ip", capacity=10, per_seconds=60)
@@ -1,11 +1,26 @@
 import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from typing import List, Optional
 from models.rental_models import Equipment, BookingRequest
+from utils.availability_utils import (
+    day_free_mask,
+    is_slot_free,
+    with_free_masks,
+    hour_window_mask,
+    mask_to_windows,
+    format_window
+)
 
 logger = logging.getLogger(__name__)
 
+# Optimistic retries when the target slot itself changes between read and write
+BOOKING_CAS_RETRIES = 3
+# Retries of the day's free_mask refresh; each failure means another writer changed the day
+FREE_MASK_CAS_RETRIES = 20
+
 class RentalService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
@@ -19,8 +34,29 @@ class RentalService:
         except Exception as e:
             logger.error(f"Error creating index: {e}")
 
+    async def backfill_free_masks(self) -> int:
+        """Compute free-slot bitmaps for listings created before they existed"""
+        updated = 0
+        try:
+            cursor = self.collection.find(
+                {"availability": {"$elemMatch": {"free_mask": {"$exists": False}}}},
+                {"availability": 1}
+            )
+            async for doc in cursor:
+                await self.collection.update_one(
+                    {"_id": doc["_id"]},
+                    {"$set": {"availability": with_free_masks(doc.get("availability", []))}}
+                )
+                updated += 1
+            if updated:
+                logger.info(f"Backfilled free-slot bitmaps for {updated} equipments")
+        except Exception as e:
+            logger.error(f"Error backfilling free-slot bitmaps: {e}")
+        return updated
+
     async def add_equipment(self, equipment_data: dict) -> str:
         """Add new equipment to the database"""
+        equipment_data["availability"] = with_free_masks(equipment_data.get("availability", []))
         result = await self.collection.insert_one(equipment_data)
         return str(result.inserted_id)
 
@@ -55,6 +91,101 @@ class RentalService:
             logger.error(f"Error finding nearby equipment: {e}")
             return []
 
+    async def find_available_equipment(
+        self,
+        lat: float,
+        lng: float,
+        start_date: str,
+        end_date: str,
+        start_hour: int,
+        end_hour: int,
+        radius_km: float = 20.0,
+        category: str = None,
+        require_full_window: bool = False
+    ) -> dict:
+        """
+        Answer calendar queries such as "any tractor within 20 km free on any
+        day next week between 6-10 am" from the per-day free-slot bitmaps.
+        Only the bitmaps and summary fields are read, never the slot lists.
+        """
+        window_mask = hour_window_mask(start_hour, end_hour)
+        result = {
+            "window": format_window((start_hour, end_hour)),
+            "start_date": start_date,
+            "end_date": end_date,
+            "available_dates": [],
+            "days": [],
+            "equipment_count": 0
+        }
+        if not window_mask:
+            return result
+
+        bits_operator = "$bitsAllSet" if require_full_window else "$bitsAnySet"
+        query = {
+            "location": {
+                "$near": {
+                    "$geometry": {"type": "Point", "coordinates": [lng, lat]},
+                    "$maxDistance": radius_km * 1000
+                }
+            },
+            "availability": {
+                "$elemMatch": {
+                    "date": {"$gte": start_date, "$lte": end_date},
+                    "free_mask": {bits_operator: window_mask}
+                }
+            }
+        }
+        if category:
+            query["category"] = category
+
+        projection = {
+            "name": 1, "category": 1, "owner_name": 1, "price_per_hour": 1,
+            "district": 1, "village": 1, "location": 1,
+            "availability.date": 1, "availability.free_mask": 1
+        }
+
+        try:
+            days = defaultdict(list)
+            combined_masks = defaultdict(int)
+            equipment_ids = set()
+            async for doc in self.collection.find(query, projection):
+                for day in doc.get("availability", []):
+                    date = day.get("date")
+                    if not date or not (start_date <= date <= end_date):
+                        continue
+                    free = (day.get("free_mask") or 0) & window_mask
+                    if not free or (require_full_window and free != window_mask):
+                        continue
+                    equipment_id = str(doc["_id"])
+                    equipment_ids.add(equipment_id)
+                    combined_masks[date] |= free
+                    days[date].append({
+                        "equipment_id": equipment_id,
+                        "name": doc.get("name"),
+                        "category": doc.get("category"),
+                        "owner_name": doc.get("owner_name"),
+                        "price_per_hour": doc.get("price_per_hour"),
+                        "district": doc.get("district"),
+                        "village": doc.get("village"),
+                        "location": doc.get("location"),
+                        "free_windows": [format_window(w) for w in mask_to_windows(free)]
+                    })
+
+            result["available_dates"] = sorted(days)
+            result["days"] = [
+                {
+                    "date": date,
+                    "free_windows": [format_window(w) for w in mask_to_windows(combined_masks[date])],
+                    "equipments": days[date]
+                }
+                for date in result["available_dates"]
+            ]
+            result["equipment_count"] = len(equipment_ids)
+            return result
+        except Exception as e:
+            logger.error(f"Error querying equipment availability: {e}")
+            return result
+
     async def get_equipment_by_id(self, equipment_id: str) -> Optional[dict]:
         try:
             doc = await self.collection.find_one({"_id": ObjectId(equipment_id)})
@@ -74,53 +205,206 @@ class RentalService:
             - slot_details: dict
         """
         try:
-            equipment_id = ObjectId(booking_request.equipment_id)
-            date = booking_request.date
-            slot_id = booking_request.slot_id
+            user_id = booking_request.user_id
+            equipment = await self._transition_slot(
+                booking_request,
+                lambda slot, now: is_slot_free(slot, now) or self._is_held_by(slot, user_id, now),
+                {"is_booked": True, "booked_by": user_id, "held_by": None, "hold_expires_at": None}
+            )
+            if equipment:
+                return self._booking_confirmed(equipment)
+            return {
+                "success": False,
+                "message": "Slot already booked or unavailable."
+            }
+        except Exception as e:
+            logger.error(f"Booking error: {e}")
+            return {"success": False, "message": str(e)}
+
+    async def hold_slot(self, booking_request: BookingRequest, ttl_seconds: int) -> dict:
+        """Place (or extend) a short-lived hold on a free slot for the requester"""
+        try:
+            user_id = booking_request.user_id
+            # MongoDB stores milliseconds, keep the in-memory copy comparable
+            expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
+            expires_at = expires_at.replace(microsecond=expires_at.microsecond // 1000 * 1000)
+            equipment = await self._transition_slot(
+                booking_request,
+                lambda slot, now: is_slot_free(slot, now) or self._is_held_by(slot, user_id, now),
+                {"held_by": user_id, "hold_expires_at": expires_at}
+            )
+            if equipment:
+                return {
+                    "success": True,
+                    "message": "Slot held. Confirm before the hold expires.",
+                    "expires_at": expires_at,
+                    "equipment_name": equipment.get("name")
+                }
+            return {"success": False, "message": "Slot already booked or held by another farmer."}
+        except Exception as e:
+            logger.error(f"Hold error: {e}")
+            return {"success": False, "message": str(e)}
+
+    async def confirm_hold(self, booking_request: BookingRequest) -> dict:
+        """Turn the requester's live hold into a booking"""
+        try:
+            user_id = booking_request.user_id
+            equipment = await self._transition_slot(
+                booking_request,
+                lambda slot, now: self._is_held_by(slot, user_id, now),
+                {"is_booked": True, "booked_by": user_id, "held_by": None, "hold_expires_at": None}
+            )
+            if equipment:
+                return self._booking_confirmed(equipment)
+            return {"success": False, "message": "Hold expired or not found."}
+        except Exception as e:
+            logger.error(f"Hold confirm error: {e}")
+            return {"success": False, "message": str(e)}
+
+    async def release_hold(self, booking_request: BookingRequest, expires_at: Optional[datetime] = None) -> bool:
+        """
+        Drop the requester's hold. When expires_at is given only that exact
+        hold is released, so an expiry never clears a newer extended hold.
+        """
+        try:
+            user_id = booking_request.user_id
+            equipment = await self._transition_slot(
+                booking_request,
+                lambda slot, now: slot.get("held_by") == user_id and (
+                    expires_at is None or slot.get("hold_expires_at") == expires_at
+                ),
+                {"held_by": None, "hold_expires_at": None}
+            )
+            return equipment is not None
+        except Exception as e:
+            logger.error(f"Hold release error: {e}")
+            return False
+
+    async def find_lapsed_holds(self, now: Optional[datetime] = None) -> List[tuple]:
+        """
+        Holds whose expiry has passed but are still recorded on the slot, e.g.
+        placed by another worker or before a restart. Returned as
+        (request of the holder, hold_expires_at) pairs for `release_hold`.
+        """
+        now = now or datetime.now()
+        lapsed = []
+        cursor = self.collection.find(
+            {"availability.slots.hold_expires_at": {"$lt": now}},
+            {"availability.date": 1, "availability.slots.id": 1,
+             "availability.slots.held_by": 1, "availability.slots.hold_expires_at": 1}
+        )
+        async for doc in cursor:
+            for day in doc.get("availability", []):
+                for slot in day.get("slots", []):
+                    held_until = slot.get("hold_expires_at")
+                    if slot.get("held_by") and held_until is not None and held_until < now:
+                        lapsed.append((BookingRequest(
+                            equipment_id=str(doc["_id"]), date=day.get("date"), slot_id=slot.get("id"),
+                            user_id=slot["held_by"], user_name="", user_contact=""
+                        ), held_until))
+        return lapsed
 
-            # Atomic update: set is_booked=True ONLY IF it is currently False
+    @staticmethod
+    def _is_held_by(slot: dict, user_id: str, now: datetime) -> bool:
+        held_until = slot.get("hold_expires_at")
+        return (
+            not slot.get("is_booked")
+            and slot.get("held_by") == user_id
+            and held_until is not None
+            and held_until > now
+        )
+
+    @staticmethod
+    def _booking_confirmed(equipment: dict) -> dict:
+        return {
+            "success": True,
+            "message": "Booking confirmed!",
+            "owner_contact": equipment.get("owner_contact"),
+            "equipment_name": equipment.get("name"),
+            "owner_name": equipment.get("owner_name")
+        }
+
+    async def _transition_slot(self, booking_request: BookingRequest, is_eligible, changes: dict) -> Optional[dict]:
+        """
+        Apply `changes` to one unbooked slot if `is_eligible(slot, now)` holds.
+        Returns the equipment (summary fields) on success, None otherwise.
+        """
+        equipment_id = ObjectId(booking_request.equipment_id)
+        date = booking_request.date
+        slot_id = booking_request.slot_id
+
+        for _ in range(BOOKING_CAS_RETRIES):
+            # Read only what is needed to locate the slot (and to reply on success)
+            equipment = await self.collection.find_one(
+                {"_id": equipment_id},
+                {"availability": 1, "owner_contact": 1, "name": 1, "owner_name": 1}
+            )
+            slot_path = self._find_slot_path(equipment, date, slot_id) if equipment else None
+            if slot_path is None:
+                return None
+
+            day_index, slot_index = slot_path
+            day = equipment["availability"][day_index]
+            slot = day["slots"][slot_index]
+            now = datetime.now()
+            if slot.get("is_booked") or not is_eligible(slot, now):
+                return None
+
+            # Atomic compare-and-set on that exact slot only: the filter re-checks
+            # its id, booking and hold state, so concurrent requests for it cannot
+            # both win, while changes to other slots of the day don't interfere.
+            day_key = f"availability.{day_index}"
+            slot_key = f"{day_key}.slots.{slot_index}"
             result = await self.collection.update_one(
                 {
                     "_id": equipment_id,
-                    "availability": {
-                        "$elemMatch": {
-                            "date": date,
-                            "slots.id": slot_id,
-                            "slots.is_booked": False
-                        }
-                    }
+                    f"{day_key}.date": date,
+                    f"{slot_key}.id": slot_id,
+                    f"{slot_key}.is_booked": False,
+                    f"{slot_key}.held_by": slot.get("held_by"),
+                    f"{slot_key}.hold_expires_at": slot.get("hold_expires_at")
                 },
-                {
-                    "$set": {
-                        "availability.$[outer].slots.$[inner].is_booked": True,
-                        "availability.$[outer].slots.$[inner].booked_by": booking_request.user_id
-                    }
-                },
-                array_filters=[
-                    {"outer.date": date},
-                    {"inner.id": slot_id}
-                ]
+                {"$set": {f"{slot_key}.{field}": value for field, value in changes.items()}}
             )
-
             if result.modified_count == 1:
-                # Booking successful, retrieve owner contact
-                equipment = await self.collection.find_one({"_id": equipment_id})
-                return {
-                    "success": True, 
-                    "message": "Booking confirmed!",
-                    "owner_contact": equipment.get("owner_contact"),
-                    "equipment_name": equipment.get("name"),
-                    "owner_name": equipment.get("owner_name")
-                }
-            else:
-                return {
-                    "success": False, 
-                    "message": "Slot already booked or unavailable."
-                }
+                await self._refresh_free_mask(equipment_id, date)
+                return equipment
 
-        except Exception as e:
-            logger.error(f"Booking error: {e}")
-            return {"success": False, "message": str(e)}
+        return None
+
+    async def _refresh_free_mask(self, equipment_id: ObjectId, date: str):
+        """
+        Recompute a day's free_mask from its slots. The write is conditional on
+        the slots being unchanged since they were read, so the stored mask
+        always matches some version of the slot list; whoever changes a slot
+        last also writes the final mask.
+        """
+        for _ in range(FREE_MASK_CAS_RETRIES):
+            equipment = await self.collection.find_one({"_id": equipment_id}, {"availability": 1})
+            days = (equipment or {}).get("availability", [])
+            day_index = next((i for i, day in enumerate(days) if day.get("date") == date), None)
+            if day_index is None:
+                return
+            slots = days[day_index].get("slots", [])
+            day_key = f"availability.{day_index}"
+            result = await self.collection.update_one(
+                {"_id": equipment_id, f"{day_key}.date": date, f"{day_key}.slots": slots},
+                {"$set": {f"{day_key}.free_mask": day_free_mask(slots)}}
+            )
+            if result.matched_count == 1:
+                return
+        logger.warning(f"Could not refresh free_mask of {equipment_id} on {date}; the next slot change will")
+
+    @staticmethod
+    def _find_slot_path(equipment: dict, date: str, slot_id: str) -> Optional[tuple]:
+        """Return (day_index, slot_index) of a slot, or None if missing"""
+        for day_index, day in enumerate(equipment.get("availability", [])):
+            if day.get("date") != date:
+                continue
+            for slot_index, slot in enumerate(day.get("slots", [])):
+                if slot.get("id") == slot_id:
+                    return day_index, slot_index
+        return None
 
     async def get_equipment_by_owner(self, owner_id: str) -> List[dict]:
         """Get all equipment listed by a specific owner"""
@@ -0,0 +1,172 @@
+"""Hold-then-confirm booking reservations with TTL expiry"""
+
+import asyncio
+import logging
+import math
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from models.rental_models import BookingRequest
+from services.rental_service import RentalService
+
+logger = logging.getLogger(__name__)
+
+HOLD_TTL_SECONDS = int(os.getenv("BOOKING_HOLD_TTL_SECONDS", "120"))
+HOLD_WHEEL_TICK_SECONDS = 1.0
+# The wheel only knows this process's holds; the database is swept for the rest
+HOLD_DB_SWEEP_SECONDS = int(os.getenv("BOOKING_HOLD_DB_SWEEP_SECONDS", "30"))
+
+
+class HoldExpiryWheel:
+    """
+    Hashed timer wheel for slot holds. Each hold lives in the bucket of the
+    tick at (or just after) its expiry, so scheduling, cancelling and popping
+    the due holds are O(1) per hold regardless of how many are pending.
+    """
+
+    def __init__(self, tick_seconds: float = HOLD_WHEEL_TICK_SECONDS):
+        self.tick_seconds = tick_seconds
+        self.buckets: Dict[int, Dict[Tuple, Dict[str, Any]]] = {}
+        self.ticks: Dict[Tuple, int] = {}
+        self.cursor = self._tick_for(datetime.now())
+
+    def _tick_for(self, when: datetime) -> int:
+        return math.ceil(when.timestamp() / self.tick_seconds)
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    def schedule(self, key: Tuple, hold: Dict[str, Any], expires_at: datetime):
+        """Schedule (or reschedule) the hold identified by key"""
+        self.cancel(key)
+        tick = max(self._tick_for(expires_at), self.cursor)
+        self.buckets.setdefault(tick, {})[key] = hold
+        self.ticks[key] = tick
+
+    def cancel(self, key: Tuple):
+        tick = self.ticks.pop(key, None)
+        if tick is None:
+            return
+        bucket = self.buckets.get(tick)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self.buckets[tick]
+
+    def pop_due(self, now: datetime) -> List[Dict[str, Any]]:
+        """Remove and return every hold whose tick has passed"""
+        current = math.floor(now.timestamp() / self.tick_seconds)
+        due = []
+        while self.cursor <= current:
+            for key, hold in self.buckets.pop(self.cursor, {}).items():
+                self.ticks.pop(key, None)
+                due.append(hold)
+            self.cursor += 1
+        return due
+
+
+class ReservationService:
+    """Places short-lived slot holds and releases them when they lapse"""
+
+    def __init__(
+        self,
+        rental_service: RentalService,
+        hold_ttl_seconds: int = HOLD_TTL_SECONDS,
+        db_sweep_seconds: int = HOLD_DB_SWEEP_SECONDS
+    ):
+        self.rental_service = rental_service
+        self.hold_ttl_seconds = hold_ttl_seconds
+        self.db_sweep_seconds = db_sweep_seconds
+        self.wheel = HoldExpiryWheel()
+        # Called with the expired hold, set by SocketService to broadcast expiries
+        self.on_expire: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(request: BookingRequest) -> Tuple:
+        return (request.equipment_id, request.date, request.slot_id)
+
+    async def hold(self, request: BookingRequest, sid: Optional[str] = None) -> dict:
+        result = await self.rental_service.hold_slot(request, self.hold_ttl_seconds)
+        if result["success"]:
+            hold = {"request": request, "sid": sid, "expires_at": result["expires_at"]}
+            self.wheel.schedule(self._key(request), hold, result["expires_at"])
+        return result
+
+    async def confirm(self, request: BookingRequest) -> dict:
+        result = await self.rental_service.confirm_hold(request)
+        if result["success"]:
+            self.wheel.cancel(self._key(request))
+        return result
+
+    async def release(self, request: BookingRequest) -> bool:
+        released = await self.rental_service.release_hold(request)
+        if released:
+            self.wheel.cancel(self._key(request))
+        return released
+
+    async def expire_due(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Release holds that have lapsed and notify listeners"""
+        expired = []
+        for hold in self.wheel.pop_due(now or datetime.now()):
+            if await self._expire(hold):
+                expired.append(hold)
+        return expired
+
+    async def release_lapsed(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Release lapsed holds recorded in the database that no wheel in this
+        process tracks (placed by another worker, or before a restart), so
+        their slots show up as free again.
+        """
+        expired = []
+        for request, expires_at in await self.rental_service.find_lapsed_holds(now):
+            hold = {"request": request, "sid": None, "expires_at": expires_at}
+            if await self._expire(hold):
+                self.wheel.cancel(self._key(request))
+                expired.append(hold)
+        if expired:
+            logger.info(f"Released {len(expired)} lapsed booking holds")
+        return expired
+
+    async def _expire(self, hold: Dict[str, Any]) -> bool:
+        # Only the exact hold is released; a confirmed or extended hold is left alone
+        released = await self.rental_service.release_hold(hold["request"], expires_at=hold["expires_at"])
+        if released and self.on_expire:
+            try:
+                await self.on_expire(hold)
+            except Exception as e:
+                logger.error(f"Error broadcasting hold expiry: {e}")
+        return released
+
+    async def _run(self):
+        last_db_sweep = None
+        while True:
+            now = datetime.now()
+            if last_db_sweep is None or (now - last_db_sweep).total_seconds() >= self.db_sweep_seconds:
+                last_db_sweep = now
+                try:
+                    await self.release_lapsed(now)
+                except Exception as e:
+                    logger.error(f"Lapsed hold sweep failed: {e}")
+            try:
+                await self.expire_due()
+            except Exception as e:
+                logger.error(f"Hold expiry sweep failed: {e}")
+            await asyncio.sleep(self.wheel.tick_seconds)
+
+    def start(self):
+        """Start the background expiry sweeper (its first pass releases holds lapsed while down)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Booking hold sweeper started (ttl={self.hold_ttl_seconds}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,210 @@
+"""
+Semantic response cache for the chatbot
+
+Questions are normalized (case, punctuation, filler words) and turned into
+MinHash signatures over word and character-trigram shingles. Each language
+has its own LSH index (banded signatures), so a lookup only compares
+against the few cached questions sharing a band; a candidate is a hit when
+its estimated Jaccard similarity reaches the threshold, it mentions the
+same numbers, and every word on either side has a close spelling on the
+other (so "sow paddy" never answers "harvest paddy"). Works for any script, so Hindi and Malayalam questions are
+matched the same way as English ones.
+"""
+
+import logging
+import os
+import random
+import re
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.7"))
+CHAT_CACHE_TTL_SECONDS = int(os.getenv("CHAT_CACHE_TTL_SECONDS", "86400"))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "5000"))  # per language
+
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(44)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+# Words that change the phrasing but not the question
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "am", "was", "be", "to", "of", "for", "in", "on", "at", "my", "me",
+    "i", "we", "you", "your", "can", "could", "should", "would", "will", "do", "does", "please",
+    "tell", "about", "what", "which", "how", "and", "or", "it", "this", "that", "there", "any", "some",
+    "hi", "hello", "sir", "madam", "ji",
+    "क्या", "है", "हैं", "का", "की", "के", "में", "को", "से", "मुझे", "कृपया", "बताइए", "बताओ",
+}
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _clean_char(ch: str) -> str:
+    category = unicodedata.category(ch)
+    if category[0] in "PSZ" or category == "Cc":
+        return " "
+    # Zero-width joiners only change rendering
+    return "" if category == "Cf" else ch
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation/symbols (keeping combining vowel signs) and collapse spaces"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(_clean_char(ch) for ch in text)
+    return " ".join(word for word in text.split() if word not in STOPWORDS)
+
+
+def shingles(normalized: str) -> Set[str]:
+    words = normalized.split()
+    result = set(words)
+    for word in words:
+        result.update(_trigrams(word))
+    return result
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f"#{word}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _has_counterpart(word: str, others: List[str]) -> bool:
+    grams = _trigrams(word)
+    for other in others:
+        other_grams = _trigrams(other)
+        if word == other or len(grams & other_grams) / len(grams | other_grams) >= 0.5:
+            return True
+    return False
+
+
+def words_aligned(a: str, b: str) -> bool:
+    """Every word of each text has an exact or near (pest/pests) match in the other"""
+    a_words, b_words = a.split(), b.split()
+    return all(_has_counterpart(w, b_words) for w in a_words) and all(_has_counterpart(w, a_words) for w in b_words)
+
+
+def minhash(features: Set[str]) -> Tuple[int, ...]:
+    hashes = [zlib.crc32(feature.encode("utf-8")) for feature in features] or [0]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def estimated_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    rows = len(signature) // NUM_BANDS
+    return [(band, signature[band * rows:(band + 1) * rows]) for band in range(NUM_BANDS)]
+
+
+class SemanticCache:
+    """Per-language MinHash LSH cache of chatbot answers with TTL and LRU eviction"""
+
+    def __init__(
+        self,
+        threshold: float = CHAT_CACHE_SIMILARITY,
+        ttl_seconds: float = CHAT_CACHE_TTL_SECONDS,
+        max_entries: int = CHAT_CACHE_MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}  # language -> normalized text -> entry
+        self.buckets: Dict[str, Dict[Tuple, Set[str]]] = {}  # language -> band key -> normalized texts
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _remove(self, language: str, normalized: str):
+        entry = self.entries[language].pop(normalized)
+        buckets = self.buckets[language]
+        for band_key in _bands(entry["signature"]):
+            members = buckets.get(band_key)
+            if members is not None:
+                members.discard(normalized)
+                if not members:
+                    del buckets[band_key]
+
+    def _live(self, language: str, normalized: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self.entries[language].get(normalized)
+        if entry is not None and entry["expires_at"] <= now:
+            self._remove(language, normalized)
+            return None
+        return entry
+
+    def get(self, text: str, language: str) -> Optional[str]:
+        """Cached answer for this question or a near-duplicate of it"""
+        normalized = normalize_text(text)
+        if not normalized or language not in self.entries:
+            self.stats["misses"] += 1
+            return None
+        now = time.monotonic()
+        entries = self.entries[language]
+
+        entry = self._live(language, normalized, now)
+        if entry is not None:
+            entries.move_to_end(normalized)
+            self.stats["exact_hits"] += 1
+            return entry["response"]
+
+        signature = minhash(shingles(normalized))
+        numbers = _NUMBER.findall(normalized)
+        candidates = set()
+        for band_key in _bands(signature):
+            candidates.update(self.buckets[language].get(band_key, ()))
+
+        best, best_score = None, self.threshold
+        for candidate in candidates:
+            entry = self._live(language, candidate, now)
+            if entry is None or entry["numbers"] != numbers:
+                continue
+            score = estimated_similarity(signature, entry["signature"])
+            if score >= best_score and words_aligned(normalized, candidate):
+                best, best_score = candidate, score
+
+        if best is None:
+            self.stats["misses"] += 1
+            return None
+        entries.move_to_end(best)
+        self.stats["semantic_hits"] += 1
+        return entries[best]["response"]
+
+    def set(self, text: str, language: str, response: str):
+        normalized = normalize_text(text)
+        if not normalized or not response:
+            return
+        entries = self.entries.setdefault(language, OrderedDict())
+        buckets = self.buckets.setdefault(language, {})
+        if normalized in entries:
+            self._remove(language, normalized)
+
+        signature = minhash(shingles(normalized))
+        entries[normalized] = {
+            "response": response,
+            "signature": signature,
+            "numbers": _NUMBER.findall(normalized),
+            "expires_at": time.monotonic() + self.ttl_seconds
+        }
+        for band_key in _bands(signature):
+            buckets.setdefault(band_key, set()).add(normalized)
+        self.stats["stores"] += 1
+
+        while len(entries) > self.max_entries:
+            self._remove(language, next(iter(entries)))
+            self.stats["evictions"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": {language: len(entries) for language, entries in self.entries.items()}
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.buckets.clear()
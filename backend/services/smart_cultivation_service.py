@@ -1,34 +1,178 @@
+import asyncio
 import logging
 import datetime
-from typing import List, Dict, Any, Optional
+import os
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 
-from models.smart_cultivation_models import SmartCultivationPlan, DailyTask, SmartCultivationRequest
+from models.smart_cultivation_models import SmartCultivationPlan, DailyTask, SmartCultivationRequest, CompactSchedule, PlanSummary
+from services.cultivation_schedule import add_filler_day, filler_template_id, schedule_window_from_doc, with_compact_schedule
 from services.groq_service import groq_service
+from services.plan_template_cache import PlanTemplateCache, normalize_plan_inputs, template_key
+from services.weather_replanner import adjust_task, daily_forecast
 from services.weather_service import WeatherService
 
 logger = logging.getLogger(__name__)
 
+# Streamed plans send their tasks one lifecycle week at a time
+PLAN_STREAM_CHUNK_DAYS = int(os.getenv("PLAN_STREAM_CHUNK_DAYS", "7"))
+
+# Listing and schedule paging read only these fields, never the whole plan
+PLAN_SUMMARY_PROJECTION = {
+    "crop_name": 1, "start_date": 1, "end_date": 1, "status": 1, "yield_estimate": 1, "created_at": 1,
+    "input_details.location": 1, "input_details.land_area": 1, "input_details.land_unit": 1,
+    "compact_schedule.total_days": 1
+}
+SCHEDULE_PROJECTION = {"start_date": 1, "compact_schedule": 1, "schedule": 1}
+
+
+async def _template_events(template: Dict[str, Any]) -> AsyncIterator[Tuple]:
+    """A cached template replayed as the parser events of a streamed generation"""
+    for name, value in template.items():
+        if name not in ("analysis", "tasks"):
+            yield ("field", name, value)
+    for section, text in (template.get("analysis") or {}).items():
+        yield ("item", "analysis", section, text)
+    for i, task in enumerate(template.get("tasks") or []):
+        yield ("item", "tasks", i, task)
+
+
 class SmartCultivationService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.collection = db.smart_cultivations
         self.weather_service = WeatherService()
+        self.template_cache = PlanTemplateCache(db.plan_templates)
+
+    async def initialize_indexes(self):
+        # get_active_plan / get_all_plans / list_plan_summaries filter by user (and status), newest first
+        # _id breaks created_at ties so summary pages never skip plans saved together
+        await self.collection.create_index([("user_id", 1), ("status", 1), ("created_at", -1), ("_id", -1)])
+        await self.collection.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+        # The weather re-planner scans active plans that have not ended yet
+        await self.collection.create_index([("status", 1), ("end_date", 1)])
+        await self.template_cache.ensure_indexes()
+
+    async def get_plan_template(self, request: SmartCultivationRequest) -> Dict[str, Any]:
+        """
+        The LLM part of a plan for these agronomic inputs, from the template
+        cache when an equivalent request was generated before.
+        """
+        inputs = normalize_plan_inputs(request)
+        key = template_key(groq_service.model, groq_service.build_cultivation_plan_messages(**inputs))
+        template = await self.template_cache.get(key)
+        if template is not None:
+            logger.info(f"Plan template cache hit for {inputs['crops']}")
+            return template
+
+        template = await groq_service.generate_cultivation_plan(**inputs)
+        # Failed generations come back without tasks; don't pin them
+        if template.get("tasks"):
+            await self.template_cache.set(key, template, inputs)
+        return template
     
     async def generate_plan(self, request: SmartCultivationRequest) -> SmartCultivationPlan:
         """
         Generates a smart cultivation plan based on inputs.
         Does NOT save to DB yet (preview mode).
         """
-        # 1. Generate base plan from Groq
-        groq_response = await groq_service.generate_cultivation_plan(
-            crops=request.selected_crops,
-            soil_type=request.soil_type,
-            soil_ph=request.soil_ph,
-            water_availability=request.water_availability,
-            location=request.location or "Kerala",
-            season=request.season
+        # 1. Base plan from Groq (or the template cache); only dates and weather are per request
+        groq_response = await self.get_plan_template(request)
+        weather_forecast = await self._weather_forecast(request.location)
+        return self._build_plan(request, groq_response, weather_forecast)
+
+    async def stream_plan(self, request: SmartCultivationRequest) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Same plan as generate_plan, produced incrementally:
+          {"type": "field", "key", "value"}      strategy, yield estimate, best practices
+          {"type": "analysis", "section", "text"} each analysis section once complete
+          {"type": "tasks", "tasks"}              LLM tasks, one chunk per week of the lifecycle
+          {"type": "plan", "plan"}                the complete SmartCultivationPlan (fillers included)
+        or {"type": "error", "detail"} if generation fails part-way.
+        """
+        inputs = normalize_plan_inputs(request)
+        key = template_key(groq_service.model, groq_service.build_cultivation_plan_messages(**inputs))
+        # The forecast is fetched while the model starts generating
+        weather = asyncio.create_task(self._weather_forecast(request.location))
+        template = await self.template_cache.get(key)
+        cached = template is not None
+        if cached:
+            logger.info(f"Plan template cache hit for {inputs['crops']}")
+            parts = _template_events(template)
+        else:
+            template = {"analysis": {}, "tasks": []}
+            parts = groq_service.stream_cultivation_plan(**inputs)
+
+        start_date = datetime.datetime.strptime(request.sowing_date, "%Y-%m-%d")
+        weather_forecast = None
+        chunk, chunk_end = [], PLAN_STREAM_CHUNK_DAYS
+        try:
+            try:
+                async for part in parts:
+                    if part[0] == "field":
+                        _, name, value = part
+                        template[name] = value
+                        yield {"type": "field", "key": name, "value": value}
+                    elif part[1] == "analysis":
+                        _, _, section, text = part
+                        template["analysis"][section] = text
+                        yield {"type": "analysis", "section": section, "text": text}
+                    else:
+                        task_data = part[3]
+                        if not cached:
+                            template["tasks"].append(task_data)
+                        # Tasks arrive in chronological order; close the week once a later day shows up
+                        day_num = task_data.get("day_number") or 0
+                        if day_num > chunk_end and chunk:
+                            yield {"type": "tasks", "tasks": chunk}
+                            chunk = []
+                        while day_num > chunk_end:
+                            chunk_end += PLAN_STREAM_CHUNK_DAYS
+                        if weather_forecast is None:
+                            weather_forecast = await weather
+                        chunk.append(self._daily_task(task_data, start_date, weather_forecast))
+            except Exception as e:
+                logger.error(f"Error streaming plan from Groq: {e}")
+                yield {"type": "error", "detail": f"Error generating plan: {str(e)}"}
+                return
+            if chunk:
+                yield {"type": "tasks", "tasks": chunk}
+
+            if not cached and template["tasks"]:
+                await self.template_cache.set(key, template, inputs)
+            weather_forecast = await weather
+            yield {"type": "plan", "plan": self._build_plan(request, template, weather_forecast)}
+        finally:
+            # The client may disconnect part-way
+            weather.cancel()
+
+    async def _weather_forecast(self, location: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """Daily forecast keyed by YYYY-MM-DD (empty without a location)"""
+        if not location:
+            return {}
+        # WeatherService is synchronous; keep it off the event loop
+        weather_res = await asyncio.to_thread(self.weather_service.get_weather_forecast, city=location, days=5)
+        return daily_forecast(weather_res)
+
+    def _daily_task(self, task_data: Dict[str, Any], start_date: datetime.datetime, weather_forecast: Dict[str, Dict[str, Any]]) -> DailyTask:
+        """One LLM task mapped to its calendar date, with weather adjustments"""
+        task_date = start_date + datetime.timedelta(days=task_data.get("day_number") - 1)
+        date_str = task_date.strftime("%Y-%m-%d")
+
+        daily_task = DailyTask(
+            day_number=task_data.get("day_number"),
+            date=date_str,
+            task_name=task_data.get("task_name"),
+            description=task_data.get("description"),
+            resources_needed=task_data.get("resources_needed"),
+            instructions=task_data.get("instructions"),
+            task_type=task_data.get("task_type", "general"),
+            deep_link=task_data.get("deep_link")
         )
+        # Weather Integration: the same rules the re-planner applies to saved plans
+        return daily_task.model_copy(update=adjust_task(daily_task, weather_forecast.get(date_str)))
+
+    def _build_plan(self, request: SmartCultivationRequest, groq_response: Dict[str, Any], weather_forecast: Dict[str, Dict[str, Any]]) -> SmartCultivationPlan:
         groq_tasks = groq_response.get("tasks", [])
         intercropping_strategy = groq_response.get("intercropping_strategy")
         yield_estimate = groq_response.get("yield_estimate")
@@ -38,112 +182,31 @@ class SmartCultivationService:
         # 2. Process tasks and map to dates
         start_date = datetime.datetime.strptime(request.sowing_date, "%Y-%m-%d")
         processed_tasks = []
+        filler_ranges = []
         
         # Map existing Groq tasks to a dictionary by day number for easier checking
         task_map = {task.get("day_number"): task for task in groq_tasks}
         
         # Determine the full duration (e.g., 120 days or max day from Groq)
         max_day = max([task.get("day_number", 0) for task in groq_tasks] + [120]) # Default to at least 120 days
-        
-        # Weather Integration (Mock for now or use real)
-        weather_forecast = {}
-        if request.location:
-             weather_res = self.weather_service.get_weather_forecast(city=request.location, days=5)
-             if weather_res.get("success"):
-                 for day in weather_res.get("data", {}).get("forecast", []):
-                     w_date = day["date"].split(" ")[0]
-                     weather_forecast[w_date] = day
 
         # Iterate through every single day of the lifecycle
         for day_num in range(1, max_day + 1):
-            task_date = start_date + datetime.timedelta(days=day_num - 1)
-            date_str = task_date.strftime("%Y-%m-%d")
-            
             # Check if Groq provided a task for this day
             if day_num in task_map:
-                task_data = task_map[day_num]
-                
-                # Weather Integration check
-                weather_note = None
-                if date_str in weather_forecast:
-                    w_data = weather_forecast[date_str]
-                    desc = w_data.get("description", "")
-                    rain_prob = w_data.get("precipitation_chance", 0)
-                    weather_note = f"Forecast: {desc}"
-                    
-                    # Intelligent Adjustment Logic
-                    task_type = task_data.get("task_type", "").lower()
-                    if "irrigation" in task_type and ("rain" in desc.lower() or rain_prob > 50):
-                        task_data["status"] = "skipped"
-                        task_data["instructions"] += " [AUTO-UPDATE] Rain predicted. Irrigation may not be needed."
-                        weather_note += " (Rain expected)"
-                
-                daily_task = DailyTask(
-                    day_number=task_data.get("day_number"),
-                    date=date_str,
-                    task_name=task_data.get("task_name"),
-                    description=task_data.get("description"),
-                    resources_needed=task_data.get("resources_needed"),
-                    instructions=task_data.get("instructions"),
-                    task_type=task_data.get("task_type", "general"),
-                    weather_condition=weather_note,
-                    deep_link=task_data.get("deep_link")
-                )
-                processed_tasks.append(daily_task)
+                processed_tasks.append(self._daily_task(task_map[day_num], start_date, weather_forecast))
             else:
-
-                # FILLER TASK: Intelligent gap filling based on lifecycle stage
-                stage_progress = day_num / max_day
-                
-                filler_name = "Field Observation"
-                filler_desc = "Routine check of crop health."
-                filler_instr = "Walk through the fields looking for general health indicators."
-                filler_type = "monitoring"
-                filler_link = None
-                
-                if stage_progress < 0.2:
-                    filler_name = "Seedling Health Check"
-                    filler_desc = "Monitor germination and early growth."
-                    filler_instr = "Check for damping off disease. Ensure soil moisture is adequate for young roots."
-                    filler_type = "monitoring"
-                elif stage_progress < 0.5:
-                    filler_name = "Weed & Pest Patrol"
-                    filler_desc = "Critical growth phase monitoring."
-                    filler_instr = "Look for early signs of pests under leaves. Remove competitive weeds manually if possible."
-                    filler_type = "protection"
-                    filler_link = "disease_detection"
-                elif stage_progress < 0.8:
-                    filler_name = "Water & Nutrient Check"
-                    filler_desc = "Mid-season growth maintenance."
-                    filler_instr = "Check soil moisture depth. Look for yellowing leaves indicating nutrient deficiency."
-                    filler_type = "irrigation"
-                else:
-                    filler_name = "Pre-Harvest Inspection"
-                    filler_desc = "Maturation and readiness check."
-                    filler_instr = "Check grain/fruit maturity. Plan specifically for labor and equipment needs."
-                    filler_type = "harvesting"
-                    filler_link = "market"
-
-                processed_tasks.append(DailyTask(
-                    day_number=day_num,
-                    date=date_str,
-                    task_name=filler_name,
-                    description=filler_desc,
-                    instructions=filler_instr,
-                    task_type=filler_type,
-                    resources_needed=["Visual Inspection"],
-                    status="pending",
-                    deep_link=filler_link
-                ))
+                # FILLER TASK: stored as a range over the shared template for its lifecycle stage
+                add_filler_day(filler_ranges, day_num, filler_template_id(day_num, max_day))
             
-        # 3. Create Plan Object
+        # 3. Create Plan Object (schedule is expanded from compact_schedule on read)
         plan = SmartCultivationPlan(
             user_id=request.user_id if request.user_id else "temp_user",
             crop_name=", ".join(request.selected_crops),
             start_date=request.sowing_date,
-            end_date=processed_tasks[-1].date if processed_tasks else None,
+            end_date=(start_date + datetime.timedelta(days=max_day - 1)).strftime("%Y-%m-%d"),
             input_details=request,
-            schedule=processed_tasks,
+            compact_schedule=CompactSchedule(total_days=max_day, tasks=processed_tasks, ranges=filler_ranges),
             intercropping_strategy=intercropping_strategy,
             yield_estimate=yield_estimate,
             analysis=analysis,
@@ -153,11 +216,13 @@ class SmartCultivationService:
         return plan
 
     async def save_plan(self, plan: SmartCultivationPlan) -> str:
-        """Saves a confirmed plan to MongoDB"""
-        plan_dict = plan.dict()
+        """Saves a confirmed plan to MongoDB in compact form"""
+        plan_dict = with_compact_schedule(plan).model_dump(exclude={"schedule"})
         # Remove plan_id if None so Mongo generates it
         if plan_dict.get("plan_id") is None:
             del plan_dict["plan_id"]
+        # Plans are listed newest first; the preview's timestamps are from generation time
+        plan_dict["created_at"] = plan_dict["updated_at"] = datetime.datetime.now()
         
         result = await self.collection.insert_one(plan_dict)
         return str(result.inserted_id)
@@ -193,3 +258,66 @@ class SmartCultivationService:
             plans.append(SmartCultivationPlan(**doc))
         return plans
 
+    async def list_plan_summaries(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        before: Optional[datetime.datetime] = None,
+        limit: int = 20,
+        before_id: Optional[str] = None
+    ) -> List[PlanSummary]:
+        """
+        Newest-first page of a user's plans without analysis or schedules.
+        Pass the created_at and plan_id of the last summary as `before` and
+        `before_id` for the next page; plans sharing a created_at (e.g.
+        migrated together) are ordered by id so none are skipped.
+        """
+        query: Dict[str, Any] = {"user_id": user_id}
+        if status:
+            query["status"] = status
+        if before and before_id and ObjectId.is_valid(before_id):
+            query["$or"] = [
+                {"created_at": {"$lt": before}},
+                {"created_at": before, "_id": {"$lt": ObjectId(before_id)}}
+            ]
+        elif before:
+            query["created_at"] = {"$lt": before}
+        cursor = self.collection.find(query, PLAN_SUMMARY_PROJECTION).sort([("created_at", -1), ("_id", -1)]).limit(limit)
+        summaries = []
+        async for doc in cursor:
+            details = doc.get("input_details") or {}
+            summaries.append(PlanSummary(
+                plan_id=str(doc["_id"]),
+                crop_name=doc["crop_name"],
+                start_date=doc["start_date"],
+                end_date=doc.get("end_date"),
+                status=doc.get("status", "active"),
+                location=details.get("location"),
+                land_area=details.get("land_area"),
+                land_unit=details.get("land_unit"),
+                total_days=(doc.get("compact_schedule") or {}).get("total_days"),
+                yield_estimate=doc.get("yield_estimate"),
+                created_at=doc["created_at"]
+            ))
+        return summaries
+
+    async def get_schedule_window(self, plan_id: str, from_date: datetime.date, days: int) -> Optional[List[DailyTask]]:
+        """Tasks of one plan for a date window, expanding only those days"""
+        try:
+            doc = await self.collection.find_one({"_id": ObjectId(plan_id)}, SCHEDULE_PROJECTION)
+        except Exception:
+            return None
+        if doc is None:
+            return None
+        return schedule_window_from_doc(doc, from_date, days)
+
+    async def get_upcoming_tasks(self, user_id: str, from_date: datetime.date, days: int) -> List[DailyTask]:
+        """Tasks of the user's active plan for a date window (empty without one)"""
+        doc = await self.collection.find_one(
+            {"user_id": user_id, "status": "active"},
+            SCHEDULE_PROJECTION,
+            sort=[("created_at", -1)]
+        )
+        if doc is None:
+            return []
+        return schedule_window_from_doc(doc, from_date, days)
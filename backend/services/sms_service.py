@@ -0,0 +1,232 @@
+"""Asynchronous SMS dispatch with provider failover and retries"""
+
+import asyncio
+import logging
+import os
+import secrets
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TWILIO_SID = os.getenv("TWILIO_ACCOUNT_SID")
+TWILIO_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+TWILIO_FROM_NUMBER = os.getenv("TWILIO_FROM_NUMBER", "+1234567890")
+
+SMS_WORKERS = int(os.getenv("SMS_WORKERS", "2"))
+SMS_MAX_ATTEMPTS = int(os.getenv("SMS_MAX_ATTEMPTS", "3"))
+SMS_RETRY_BASE_DELAY = float(os.getenv("SMS_RETRY_BASE_DELAY", "2.0"))
+SMS_QUEUE_SIZE = int(os.getenv("SMS_QUEUE_SIZE", "1000"))
+# Print messages (OTPs included) to the log when no real provider is set up, or always when enabled
+SMS_CONSOLE_FALLBACK = os.getenv("SMS_CONSOLE_FALLBACK", "false").lower() == "true"
+
+StatusCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class SMSQueueFull(Exception):
+    """Too many messages are waiting; the client should retry later"""
+
+
+class SMSProvider:
+    """Base class: send() raises on failure so the dispatcher can fail over"""
+
+    name = "base"
+
+    async def send(self, phone: str, message: str):
+        raise NotImplementedError
+
+
+class TwilioSMSProvider(SMSProvider):
+    name = "twilio"
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str):
+        from twilio.rest import Client
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    async def send(self, phone: str, message: str):
+        # The Twilio SDK is blocking, keep it off the event loop
+        await asyncio.to_thread(
+            self.client.messages.create, body=message, from_=self.from_number, to=phone
+        )
+
+
+class ConsoleSMSProvider(SMSProvider):
+    """Development provider that prints the message instead of sending it"""
+
+    name = "console"
+
+    async def send(self, phone: str, message: str):
+        print(f"📱 SMS to {phone}: {message}")
+
+
+class FakeSMSProvider(SMSProvider):
+    """Records messages in memory; fails the first `fail_times` sends"""
+
+    def __init__(self, name: str = "fake", fail_times: int = 0):
+        self.name = name
+        self.fail_times = fail_times
+        self.sent: List[Dict[str, str]] = []
+        self.attempts = 0
+
+    async def send(self, phone: str, message: str):
+        self.attempts += 1
+        if self.attempts <= self.fail_times:
+            raise ConnectionError(f"{self.name} unavailable")
+        self.sent.append({"phone": phone, "message": message})
+
+
+class SMSDispatcher:
+    """
+    Queue of outgoing SMS drained by worker tasks. Each attempt tries the
+    providers in order; when all of them fail the job is put back on the
+    queue after an exponential backoff (a timer, so workers never sleep on a
+    failing message), and every status change is reported through the job's
+    callback.
+    """
+
+    def __init__(
+        self,
+        providers: List[SMSProvider],
+        workers: int = SMS_WORKERS,
+        max_attempts: int = SMS_MAX_ATTEMPTS,
+        retry_base_delay: float = SMS_RETRY_BASE_DELAY,
+        queue_size: int = SMS_QUEUE_SIZE
+    ):
+        self.providers = providers
+        self.worker_count = workers
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._retry_timers: Dict[str, asyncio.TimerHandle] = {}
+
+    async def enqueue(self, phone: str, message: str, on_status: Optional[StatusCallback] = None) -> Dict[str, Any]:
+        """Queue a message and return its job without waiting for delivery"""
+        self.start()
+        job = {
+            "job_id": secrets.token_hex(8),
+            "phone": phone,
+            "message": message,
+            "status": "queued",
+            "attempts": 0,
+            "provider": None,
+            "error": None,
+            "queued_at": datetime.now(),
+            "on_status": on_status
+        }
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise SMSQueueFull("SMS queue is full, please retry shortly")
+        return job
+
+    async def _set_status(self, job: Dict[str, Any], status: str, **fields):
+        job.update(status=status, **fields)
+        if job["on_status"]:
+            try:
+                await job["on_status"](job)
+            except Exception as e:
+                logger.error(f"SMS status callback failed for job {job['job_id']}: {e}")
+
+    async def _deliver(self, job: Dict[str, Any]) -> bool:
+        """Make one attempt; returns True when a retry has been scheduled"""
+        attempt = job["attempts"] + 1
+        job["attempts"] = attempt
+        errors = []
+        for provider in self.providers:
+            try:
+                await provider.send(job["phone"], job["message"])
+                await self._set_status(job, "delivered", provider=provider.name, delivered_at=datetime.now())
+                return False
+            except Exception as e:
+                logger.warning(f"SMS via {provider.name} failed: {e}")
+                errors.append(f"{provider.name}: {e}")
+
+        if attempt < self.max_attempts:
+            await self._set_status(job, "retrying", error="; ".join(errors))
+            self._schedule_retry(job, self.retry_base_delay * 2 ** (attempt - 1))
+            return True
+        await self._set_status(job, "failed", error="; ".join(errors))
+        return False
+
+    def _schedule_retry(self, job: Dict[str, Any], delay: float):
+        loop = asyncio.get_running_loop()
+        self._retry_timers[job["job_id"]] = loop.call_later(delay, self._requeue, job)
+
+    def _requeue(self, job: Dict[str, Any]):
+        # The job is still counted as unfinished while it waits, so drain()
+        # keeps waiting; its previous get() is only settled once it is back.
+        self._retry_timers.pop(job["job_id"], None)
+        if self.queue is None:
+            return
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._schedule_retry(job, max(self.retry_base_delay, 0.1))
+            return
+        self.queue.task_done()
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            retrying = False
+            try:
+                retrying = await self._deliver(job)
+            except Exception as e:
+                logger.error(f"SMS job {job['job_id']} crashed: {e}")
+            finally:
+                if not retrying:
+                    self.queue.task_done()
+
+    def start(self):
+        """Start the worker tasks (idempotent)"""
+        if self._workers:
+            return
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        logger.info(f"SMS dispatcher started with {self.worker_count} workers via {[p.name for p in self.providers]}")
+
+    async def drain(self):
+        """Wait until every queued message has been delivered or given up on"""
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def stop(self):
+        for timer in self._retry_timers.values():
+            timer.cancel()
+        self._retry_timers = {}
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        # Queue is bound to the current event loop; start() makes a new one
+        self.queue = None
+
+
+def create_default_providers(console_fallback: bool = SMS_CONSOLE_FALLBACK) -> List[SMSProvider]:
+    """
+    Twilio when configured. The console provider is only used when there is
+    no real provider (or SMS_CONSOLE_FALLBACK is set for development): as a
+    failover it would report undelivered OTPs as sent and log them.
+    """
+    providers: List[SMSProvider] = []
+    if TWILIO_SID and TWILIO_TOKEN:
+        try:
+            providers.append(TwilioSMSProvider(TWILIO_SID, TWILIO_TOKEN, TWILIO_FROM_NUMBER))
+        except Exception as e:
+            logger.error(f"Twilio provider unavailable: {e}")
+    if not providers or console_fallback:
+        if not providers:
+            logger.warning("No SMS provider configured; messages are printed to the console")
+        providers.append(ConsoleSMSProvider())
+    return providers
+
+
+sms_dispatcher = SMSDispatcher(create_default_providers())
@@ -1,6 +1,10 @@
 import socketio
 import logging
+from typing import Optional
+from fastapi import HTTPException
 from services.rental_service import RentalService
+from services.rate_limiter import chat_limiter, client_ip_from_environ
+from services.reservation_service import ReservationService
 from models.rental_models import BookingRequest
 
 logger = logging.getLogger(__name__)
@@ -9,10 +13,37 @@ logger = logging.getLogger(__name__)
 sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
 
 class SocketService:
-    def __init__(self, rental_service: RentalService):
+    def __init__(self, rental_service: RentalService, reservation_service: Optional[ReservationService] = None):
         self.rental_service = rental_service
+        self.reservation_service = reservation_service
+        if reservation_service:
+            reservation_service.on_expire = self.handle_hold_expired
         self.setup_handlers()
 
+    async def broadcast_slot_update(self, equipment_id: str, date: str, slot_id: str, status: str, skip_sid: str = None):
+        """Notify everyone in the equipment's district room about a slot change"""
+        equipment = await self.rental_service.get_equipment_by_id(equipment_id)
+        if equipment:
+            room_name = f"rental_{equipment.get('district')}"
+            await sio.emit('slot_updated', {
+                'equipment_id': equipment_id,
+                'date': date,
+                'slot_id': slot_id,
+                'status': status
+            }, room=room_name, skip_sid=skip_sid)
+
+    async def handle_hold_expired(self, hold: dict):
+        """Tell the holder their hold lapsed and free the slot for everyone else"""
+        request = hold["request"]
+        if hold.get("sid"):
+            await sio.emit('hold_expired', {
+                'equipment_id': request.equipment_id,
+                'date': request.date,
+                'slot_id': request.slot_id,
+                'message': 'Your hold expired. The slot is available again.'
+            }, to=hold["sid"])
+        await self.broadcast_slot_update(request.equipment_id, request.date, request.slot_id, 'available')
+
     def setup_handlers(self):
         @sio.event
         async def connect(sid, environ):
@@ -68,28 +99,142 @@ class SocketService:
                     }, to=sid)
 
                     # Broadcast update to everyone in the same area/room
-                    # We need to know which room to broadcast to. 
-                    # Ideally, the client sends context or we look it up.
-                    # For simplicity, we can broadcast to all rooms the equipment belongs to.
-                    # But simpler approach: client sends location context in request_booking too.
-                    # Or we fetch the equipment to know its location.
-                    
-                    equipment = await self.rental_service.get_equipment_by_id(data['equipment_id'])
-                    if equipment:
-                        district = equipment.get('district')
-                        room_name = f"rental_{district}"
-                        
-                        # Emit to room EXCLUDING the sender (or including, handled by frontend state)
-                        await sio.emit('slot_updated', {
-                            'equipment_id': data['equipment_id'],
-                            'date': data['date'],
-                            'slot_id': data['slot_id'],
-                            'status': 'booked'
-                        }, room=room_name, skip_sid=sid)
-                        
+                    # (the sender already knows, the frontend updates its own state)
+                    await self.broadcast_slot_update(
+                        data['equipment_id'], data['date'], data['slot_id'], 'booked', skip_sid=sid
+                    )
+
                 else:
                     await sio.emit('booking_failed', {'message': result['message']}, to=sid)
 
             except Exception as e:
                 logger.error(f"Socket booking error: {e}")
                 await sio.emit('booking_error', {'message': str(e)}, to=sid)
+
+        if not self.reservation_service:
+            return
+
+        @sio.event
+        async def request_hold(sid, data):
+            """
+            Hold a slot while the renter confirms with the owner.
+            Data: same fields as request_booking.
+            """
+            try:
+                booking_request = BookingRequest(**data)
+                result = await self.reservation_service.hold(booking_request, sid=sid)
+
+                if result['success']:
+                    await sio.emit('hold_placed', {
+                        'message': result['message'],
+                        'equipment_id': data['equipment_id'],
+                        'date': data['date'],
+                        'slot_id': data['slot_id'],
+                        'expires_at': result['expires_at'].isoformat(),
+                        'ttl_seconds': self.reservation_service.hold_ttl_seconds
+                    }, to=sid)
+                    await self.broadcast_slot_update(
+                        data['equipment_id'], data['date'], data['slot_id'], 'held', skip_sid=sid
+                    )
+                else:
+                    await sio.emit('hold_failed', {'message': result['message']}, to=sid)
+
+            except Exception as e:
+                logger.error(f"Socket hold error: {e}")
+                await sio.emit('booking_error', {'message': str(e)}, to=sid)
+
+        @sio.event
+        async def confirm_hold(sid, data):
+            """Confirm a held slot. Data: same fields as request_booking."""
+            try:
+                booking_request = BookingRequest(**data)
+                result = await self.reservation_service.confirm(booking_request)
+
+                if result['success']:
+                    await sio.emit('booking_confirmed', {
+                        'message': 'Booking successful!',
+                        'owner_contact': result['owner_contact'],
+                        'owner_name': result.get('owner_name', 'Owner'),
+                        'equipment_name': result.get('equipment_name', 'Equipment'),
+                        'slot_id': data['slot_id']
+                    }, to=sid)
+                    await self.broadcast_slot_update(
+                        data['equipment_id'], data['date'], data['slot_id'], 'booked', skip_sid=sid
+                    )
+                else:
+                    await sio.emit('booking_failed', {'message': result['message']}, to=sid)
+
+            except Exception as e:
+                logger.error(f"Socket confirm error: {e}")
+                await sio.emit('booking_error', {'message': str(e)}, to=sid)
+
+        @sio.event
+        async def release_hold(sid, data):
+            """Give up a held slot. Data: same fields as request_booking."""
+            try:
+                booking_request = BookingRequest(**data)
+                released = await self.reservation_service.release(booking_request)
+
+                await sio.emit('hold_released', {
+                    'success': released,
+                    'slot_id': data['slot_id']
+                }, to=sid)
+                if released:
+                    await self.broadcast_slot_update(
+                        data['equipment_id'], data['date'], data['slot_id'], 'available', skip_sid=sid
+                    )
+
+            except Exception as e:
+                logger.error(f"Socket release error: {e}")
+                await sio.emit('booking_error', {'message': str(e)}, to=sid)
+
+
+def setup_chat_handlers(chatbot_service):
+    """
+    Streaming chat over Socket.IO, registered independently of the rental
+    services. The client emits `chat_message` {message, language, request_id}
+    and receives `chat_token` / `chat_fallback` / `chat_done` (or `chat_error`)
+    tagged with the same request_id.
+    """
+    @sio.event
+    async def chat_message(sid, data):
+        data = data or {}
+        request_id = data.get('request_id')
+        try:
+            await chat_limiter.check(client_ip_from_environ(sio.get_environ(sid) or {}))
+        except HTTPException as e:
+            await sio.emit('chat_error', {'request_id': request_id, 'message': e.detail}, to=sid)
+            return
+
+        try:
+            async for event in chatbot_service.stream_response(data.get('message', ''), data.get('language', 'english')):
+                await sio.emit(f"chat_{event['type']}", {**event, 'request_id': request_id}, to=sid)
+        except Exception as e:
+            logger.error(f"Error streaming chat to {sid}: {e}")
+            await sio.emit('chat_error', {'request_id': request_id, 'message': str(e)}, to=sid)
+
+
+def plan_job_room(job_id: str) -> str:
+    return f"plan_job_{job_id}"
+
+
+async def emit_plan_job_status(job: dict):
+    """PlanJobQueue status callback: notify everyone subscribed to the job"""
+    await sio.emit('plan_job_status', job, room=plan_job_room(job['job_id']))
+
+
+def setup_plan_job_handlers(job_queue):
+    """
+    The client emits `subscribe_plan_job` {job_id} after submitting a plan
+    job and receives `plan_job_status` on every change (the current status
+    first, in case the job finished before subscribing).
+    """
+    @sio.event
+    async def subscribe_plan_job(sid, data):
+        job_id = (data or {}).get('job_id')
+        job = await job_queue.get(job_id) if job_id else None
+        if not job:
+            await sio.emit('plan_job_error', {'job_id': job_id, 'message': 'Plan job not found'}, to=sid)
+            return
+        await sio.enter_room(sid, plan_job_room(job_id))
+        await sio.emit('plan_job_status', job, to=sid)
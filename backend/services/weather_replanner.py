@@ -0,0 +1,201 @@
+"""
+Weather adjustments for cultivation tasks
+
+adjust_task() holds the rules (skip irrigation before rain, hold sprays and
+fertilizer, warn about harvest in rain, no spraying in strong wind). They run
+when a plan is generated and again from WeatherReplanner, which periodically
+re-checks every active plan. The replanner fetches each location's forecast
+once per run, only looks at tasks inside the forecast horizon and writes
+field-level $set updates for the tasks whose adjustment changed.
+
+Adjustments are appended to the instructions after AUTO_UPDATE_MARKER, so a
+later run can replace them (or remove them when the forecast clears)
+without touching the original text.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from models.smart_cultivation_models import DailyTask
+from services.cultivation_schedule import day_window, parse_date, task_date
+
+logger = logging.getLogger(__name__)
+
+WEATHER_REPLAN_INTERVAL_SECONDS = int(os.getenv("WEATHER_REPLAN_INTERVAL_SECONDS", "21600"))
+WEATHER_REPLAN_HORIZON_DAYS = int(os.getenv("WEATHER_REPLAN_HORIZON_DAYS", "5"))
+
+AUTO_UPDATE_MARKER = " [AUTO-UPDATE] "
+RAIN_WORDS = ("rain", "drizzle", "thunderstorm", "shower")
+# Share of a day's 3-hourly forecasts that must mention rain
+RAIN_SHARE = 0.25
+STRONG_WIND_MS = 10.0
+
+IRRIGATION_NOTE = "Rain predicted. Irrigation may not be needed."
+SPRAY_RAIN_NOTE = "Rain predicted. Delay spraying or fertilizer application until a dry spell so it is not washed off."
+HARVEST_RAIN_NOTE = "Rain predicted. Harvest before the rain or wait for dry weather, and dry the produce well."
+SPRAY_WIND_NOTE = "Strong wind forecast. Avoid spraying to prevent drift."
+
+
+def daily_forecast(weather_res: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    WeatherService forecast (3-hourly entries) summarized per YYYY-MM-DD:
+    {"description", "rain", "wind_speed"}
+    """
+    if not weather_res.get("success"):
+        return {}
+    by_date: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in weather_res.get("data", {}).get("forecast", []):
+        by_date.setdefault(entry["date"].split(" ")[0], []).append(entry)
+
+    days = {}
+    for date_str, entries in by_date.items():
+        descriptions = list(dict.fromkeys(e.get("description", "") for e in entries if e.get("description")))
+        rainy = sum(any(word in e.get("description", "").lower() for word in RAIN_WORDS) for e in entries)
+        days[date_str] = {
+            "description": ", ".join(descriptions),
+            "rain": rainy / len(entries) >= RAIN_SHARE or any(e.get("precipitation_chance", 0) > 50 for e in entries),
+            "wind_speed": max(e.get("wind_speed", 0) or 0 for e in entries)
+        }
+    return days
+
+
+def adjust_task(task: DailyTask, weather: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fields of the task that change under this day's forecast (empty if none)"""
+    if weather is None or task.status == "completed":
+        return {}
+    task_type = (task.task_type or "").lower()
+    base_instructions, auto_updated = task.instructions, False
+    if AUTO_UPDATE_MARKER in base_instructions:
+        base_instructions, auto_updated = base_instructions.split(AUTO_UPDATE_MARKER)[0], True
+
+    notes = []
+    status = task.status
+    if "irrigation" in task_type and weather["rain"]:
+        notes.append(IRRIGATION_NOTE)
+        status = "skipped"
+    elif status == "skipped" and auto_updated:
+        status = "pending"  # skipped by an earlier forecast that no longer holds
+    if weather["rain"] and task_type in ("protection", "fertilization"):
+        notes.append(SPRAY_RAIN_NOTE)
+    if weather["rain"] and "harvest" in task_type:
+        notes.append(HARVEST_RAIN_NOTE)
+    if weather["wind_speed"] >= STRONG_WIND_MS and task_type == "protection":
+        notes.append(SPRAY_WIND_NOTE)
+
+    desired = {
+        "status": status,
+        "instructions": base_instructions + "".join(AUTO_UPDATE_MARKER + note for note in notes),
+        "weather_condition": f"Forecast: {weather['description']}" + (" (Rain expected)" if weather["rain"] else "")
+    }
+    return {field: value for field, value in desired.items() if getattr(task, field) != value}
+
+
+def normalize_location(location: Optional[str]) -> Optional[str]:
+    location = " ".join((location or "").split())
+    return location.title() if location else None
+
+
+class WeatherReplanner:
+    """Periodically re-applies adjust_task to the in-horizon tasks of active plans"""
+
+    def __init__(
+        self,
+        collection,
+        weather_service,
+        interval_seconds: int = WEATHER_REPLAN_INTERVAL_SECONDS,
+        horizon_days: int = WEATHER_REPLAN_HORIZON_DAYS
+    ):
+        self.collection = collection
+        self.weather_service = weather_service
+        self.interval_seconds = interval_seconds
+        self.horizon_days = horizon_days
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self, today: Optional[datetime.date] = None) -> Dict[str, int]:
+        today = today or datetime.date.today()
+        horizon_end = today + datetime.timedelta(days=self.horizon_days - 1)
+        # Only plans running during the horizon; dates are zero-padded strings so they compare in order
+        cursor = self.collection.find(
+            {
+                "status": "active",
+                "start_date": {"$lte": horizon_end.strftime("%Y-%m-%d")},
+                "end_date": {"$gte": today.strftime("%Y-%m-%d")},
+                "input_details.location": {"$nin": [None, ""]}
+            },
+            {"start_date": 1, "input_details.location": 1, "compact_schedule.tasks": 1, "schedule": 1}
+        )
+        by_location: Dict[str, List[Dict[str, Any]]] = {}
+        async for doc in cursor:
+            by_location.setdefault(normalize_location(doc["input_details"]["location"]), []).append(doc)
+
+        stats = {"plans": 0, "locations": len(by_location), "plans_updated": 0, "tasks_updated": 0}
+        for location, docs in by_location.items():
+            # WeatherService is synchronous; keep it off the event loop
+            weather_res = await asyncio.to_thread(
+                self.weather_service.get_weather_forecast, city=location, days=self.horizon_days
+            )
+            forecast = daily_forecast(weather_res)
+            if not forecast:
+                logger.warning(f"No forecast for {location}, leaving {len(docs)} plans unchanged")
+                continue
+            for doc in docs:
+                stats["plans"] += 1
+                query, changes, changed = self._plan_update(doc, forecast, today)
+                if changes:
+                    await self.collection.update_one(query, {"$set": changes})
+                    stats["plans_updated"] += 1
+                    stats["tasks_updated"] += changed
+
+        logger.info(f"Weather re-plan: {stats}")
+        return stats
+
+    def _plan_update(self, doc: Dict[str, Any], forecast: Dict[str, Dict[str, Any]], today: datetime.date):
+        """Filter and $set fields for the changed tasks of one plan, and how many tasks changed"""
+        if doc.get("compact_schedule"):
+            path, tasks = "compact_schedule.tasks", doc["compact_schedule"].get("tasks", [])
+        else:
+            # Plans saved before compaction keep their full schedule
+            path, tasks = "schedule", doc.get("schedule") or []
+        start = parse_date(doc["start_date"])
+        first_day, last_day = day_window(doc["start_date"], today, self.horizon_days)
+
+        query = {"_id": doc["_id"]}
+        changes = {}
+        changed = 0
+        for i, raw in enumerate(tasks):
+            day_number = raw.get("day_number")
+            if day_number is None or not first_day <= day_number <= last_day:
+                continue
+            diff = adjust_task(DailyTask(**raw), forecast.get(task_date(start, day_number)))
+            if diff:
+                # Positional paths only apply if the task is still at that index
+                query[f"{path}.{i}.day_number"] = day_number
+                changes.update({f"{path}.{i}.{field}": value for field, value in diff.items()})
+                changed += 1
+        return query, changes, changed
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Weather re-plan failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Start the periodic re-planner"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Weather re-planner started (every {self.interval_seconds}s, {self.horizon_days}-day horizon)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+from api.agricultural_data import router
+from database.agricultural_data import agricultural_data_manager
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    db = AsyncMongoMockClient()["agri_data_test"]
+    monkeypatch.setattr(agricultural_data_manager, "db", db)
+    agricultural_data_manager.invalidate()
+    yield agricultural_data_manager
+    agricultural_data_manager.invalidate()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_served_from_memory_until_update(manager):
+    await manager.populate_initial_data()
+    first = await manager.get_snapshot("ml")
+    assert set(first.options) >= {"soil_types", "seasons", "states_districts"}
+
+    # Served from memory: the database is not consulted again
+    await manager.db.agricultural_data.delete_many({"type": "seasons"})
+    assert (await manager.get_snapshot("ml")) is first
+
+    await manager.update_data("soil_types", {"data": [{"value": "laterite", "label": "Laterite"}]})
+    refreshed = await manager.get_snapshot("ml")
+    assert refreshed.etag != first.etag
+    assert refreshed.options["soil_types"]["data"] == [{"value": "laterite", "label": "Laterite"}]
+    assert refreshed.options["seasons"] == {}
+
+
+def test_all_endpoint_supports_conditional_get(manager):
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    asyncio.run(manager.populate_initial_data())
+
+    response = client.get("/api/agricultural-data/all", params={"language": "hi"})
+    assert response.status_code == 200
+    assert "soil_types" in response.json()
+    assert "max-age" in response.headers["Cache-Control"]
+
+    etag = response.headers["ETag"]
+    cached = client.get(
+        "/api/agricultural-data/all",
+        params={"language": "hi"},
+        headers={"If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+@pytest.mark.asyncio
+async def test_updates_on_another_worker_reach_this_snapshot(manager):
+    from database.agricultural_data import AgriculturalDataManager
+
+    await manager.populate_initial_data()
+    other_worker = AgriculturalDataManager()
+    other_worker.db = manager.db
+    first = await manager.get_snapshot("en")
+
+    await other_worker.update_data("seasons", {"data": [{"value": "kharif", "label": "Kharif"}]})
+    # Within the check interval the local snapshot is still served
+    assert (await manager.get_snapshot("en")) is first
+
+    manager._version_checked_at = 0.0
+    refreshed = await manager.get_snapshot("en")
+    assert refreshed.etag != first.etag
+    assert refreshed.options["seasons"]["data"] == [{"value": "kharif", "label": "Kharif"}]
+    assert (await manager.get_snapshot("en")) is refreshed
@@ -0,0 +1,71 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.requests import Request
+
+import api.auth as auth
+
+
+def make_request():
+    return Request({"type": "http", "headers": [], "state": {}})
+
+
+@pytest.mark.asyncio
+async def test_verified_farmer_is_cached_until_saved(monkeypatch):
+    farmer = {
+        "farmer_id": "FARMER_CACHE_TEST",
+        "name": "Asha",
+        "phone": "9876500000",
+        "language": "ml"
+    }
+    lookups = []
+
+    async def fake_get_farmer_from_db(farmer_id=None, phone=None, email=None):
+        lookups.append(farmer_id)
+        return dict(farmer)
+
+    monkeypatch.setattr(auth, "get_farmer_from_db", fake_get_farmer_from_db)
+    monkeypatch.setattr(auth, "database", AsyncMongoMockClient()["auth_cache_test"])
+    auth.farmer_identity_cache.clear()
+    token = (await auth.generate_tokens(farmer)).access_token
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    for _ in range(3):
+        request = make_request()
+        result = await auth.verify_jwt_token(request, credentials)
+        assert result == {"farmer_id": farmer["farmer_id"]}
+        assert request.state.farmer["name"] == "Asha"
+        # Handlers can't corrupt the cached document
+        request.state.farmer["name"] = "changed"
+
+    assert lookups == [farmer["farmer_id"]]
+
+    auth.invalidate_farmer_identity(farmer["farmer_id"])
+    await auth.verify_jwt_token(make_request(), credentials)
+    assert len(lookups) == 2
+
+
+@pytest.mark.asyncio
+async def test_profile_and_farm_writes_drop_the_cached_identity():
+    from services.farmer_profile_service import (
+        Address, FarmCreate, FarmUpdate, FarmerProfileService, PersonalDetailsUpdate
+    )
+
+    db = AsyncMongoMockClient()["auth_cache_profile_test"]
+    await db.farmers.insert_one({"farmer_id": "F1", "name": "Asha", "phone": "9876500000"})
+    service = FarmerProfileService(db)
+    farm = FarmCreate(name="North plot", area_acres=2, soil_type="loamy", irrigation_type="drip",
+                      address=Address(district="Thrissur"))
+
+    auth.farmer_identity_cache["F1"] = {"farmer_id": "F1"}
+    farm_id = (await service.create_farm("F1", farm))["farm_id"]
+    assert "F1" not in auth.farmer_identity_cache
+
+    auth.farmer_identity_cache["F1"] = {"farmer_id": "F1"}
+    await service.update_farm("F1", farm_id, FarmUpdate(name="South plot"))
+    assert "F1" not in auth.farmer_identity_cache
+
+    auth.farmer_identity_cache["F1"] = {"farmer_id": "F1"}
+    profile = await service.update_personal_details("F1", PersonalDetailsUpdate(name="Asha K"))
+    assert profile["personal_details"]["name"] == "Asha K"
+    assert "F1" not in auth.farmer_identity_cache
@@ -0,0 +1,86 @@
+import pytest
+
+from utils.availability_utils import day_free_mask, hour_window_mask, mask_to_windows, slot_mask
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from services.rental_service import RentalService
+from models.rental_models import BookingRequest
+
+
+SLOTS = [
+    {"id": "s1", "start_time": "06:00", "end_time": "09:00", "is_booked": False},
+    {"id": "s2", "start_time": "09:00", "end_time": "12:30", "is_booked": False},
+    {"id": "s3", "start_time": "14:00", "end_time": "17:00", "is_booked": True},
+]
+
+
+def test_free_mask_covers_unbooked_hours():
+    mask = day_free_mask(SLOTS)
+
+    assert slot_mask(SLOTS[1]) == hour_window_mask(9, 12)
+    assert mask == hour_window_mask(6, 12)
+    assert mask_to_windows(mask) == [(6, 12)]
+    assert mask & hour_window_mask(6, 10) == hour_window_mask(6, 10)
+    assert not mask & hour_window_mask(14, 17)
+
+
+def test_half_hour_boundary_never_shows_booked_time_as_free():
+    slots = [
+        {"id": "a", "start_time": "09:00", "end_time": "12:30", "is_booked": False},
+        {"id": "b", "start_time": "12:30", "end_time": "14:00", "is_booked": True},
+        {"id": "c", "start_time": "14:30", "end_time": "16:00", "is_booked": False},
+    ]
+    assert mask_to_windows(day_free_mask(slots)) == [(9, 12), (15, 16)]
+
+
+@pytest.mark.asyncio
+async def test_booking_clears_slot_bits():
+    service = RentalService(mongomock_motor.AsyncMongoMockClient()["availability_test"])
+    equipment_id = await service.add_equipment({
+        "name": "Tractor",
+        "availability": [{"date": "2030-01-01", "slots": [dict(s) for s in SLOTS]}]
+    })
+
+    result = await service.book_slot(BookingRequest(
+        equipment_id=equipment_id, date="2030-01-01", slot_id="s1",
+        user_id="farmer_1", user_name="Farmer", user_contact="+919999999999"
+    ))
+
+    equipment = await service.get_equipment_by_id(equipment_id)
+    assert result["success"]
+    assert mask_to_windows(equipment["availability"][0]["free_mask"]) == [(9, 12)]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_bookings_of_sibling_slots_both_succeed():
+    service = RentalService(mongomock_motor.AsyncMongoMockClient()["availability_test"])
+    equipment_id = await service.add_equipment({
+        "name": "Tractor",
+        "availability": [{"date": "2030-01-01", "slots": [dict(s) for s in SLOTS]}]
+    })
+
+    # Another writer changes s2 (and the day's mask) right after every read
+    find_one = service.collection.find_one
+    writes = []
+
+    async def find_one_then_touch_sibling(*args, **kwargs):
+        equipment = await find_one(*args, **kwargs)
+        writes.append(True)
+        await service.collection.update_one(
+            {"_id": equipment["_id"]},
+            {"$set": {"availability.0.slots.1.is_booked": True, "availability.0.free_mask": len(writes)}}
+        )
+        return equipment
+
+    service.collection.find_one = find_one_then_touch_sibling
+    result = await service.book_slot(BookingRequest(
+        equipment_id=equipment_id, date="2030-01-01", slot_id="s1",
+        user_id="farmer_1", user_name="Farmer", user_contact="+919999999999"
+    ))
+    service.collection.find_one = find_one
+
+    equipment = await service.get_equipment_by_id(equipment_id)
+    assert result["success"]
+    assert [slot["is_booked"] for slot in equipment["availability"][0]["slots"]] == [True, True, True]
+    assert equipment["availability"][0]["free_mask"] == 0
@@ -0,0 +1,79 @@
+import pytest
+from datetime import datetime, timedelta
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from models.rental_models import BookingRequest
+from services.rental_service import RentalService
+from services.reservation_service import ReservationService
+
+
+async def make_services(ttl_seconds=60):
+    rental_service = RentalService(mongomock_motor.AsyncMongoMockClient()["holds_test"])
+    equipment_id = await rental_service.add_equipment({
+        "name": "Tractor",
+        "availability": [{"date": "2030-01-01", "slots": [
+            {"id": "s1", "start_time": "06:00", "end_time": "09:00", "is_booked": False}
+        ]}]
+    })
+    return rental_service, ReservationService(rental_service, hold_ttl_seconds=ttl_seconds), equipment_id
+
+
+def request_for(equipment_id, user_id):
+    return BookingRequest(
+        equipment_id=equipment_id, date="2030-01-01", slot_id="s1",
+        user_id=user_id, user_name=user_id, user_contact="+919999999999"
+    )
+
+
+@pytest.mark.asyncio
+async def test_hold_blocks_others_until_confirmed():
+    rental_service, reservations, equipment_id = await make_services()
+    alice, bob = request_for(equipment_id, "alice"), request_for(equipment_id, "bob")
+
+    assert (await reservations.hold(alice))["success"]
+    assert not (await reservations.hold(bob))["success"]
+    assert not (await rental_service.book_slot(bob))["success"]
+    assert not (await reservations.confirm(bob))["success"]
+
+    assert (await reservations.confirm(alice))["success"]
+    assert len(reservations.wheel) == 0
+    slot = (await rental_service.get_equipment_by_id(equipment_id))["availability"][0]["slots"][0]
+    assert slot["is_booked"] and slot["booked_by"] == "alice" and slot["held_by"] is None
+
+
+@pytest.mark.asyncio
+async def test_expired_hold_is_released_and_broadcast():
+    rental_service, reservations, equipment_id = await make_services(ttl_seconds=1)
+    expired = []
+
+    async def on_expire(hold):
+        expired.append(hold)
+
+    reservations.on_expire = on_expire
+    alice, bob = request_for(equipment_id, "alice"), request_for(equipment_id, "bob")
+    assert (await reservations.hold(alice, sid="sid_alice"))["success"]
+    assert (await rental_service.get_equipment_by_id(equipment_id))["availability"][0]["free_mask"] == 0
+
+    await reservations.expire_due(now=datetime.now() + timedelta(seconds=5))
+
+    assert [hold["sid"] for hold in expired] == ["sid_alice"]
+    assert (await rental_service.get_equipment_by_id(equipment_id))["availability"][0]["free_mask"] != 0
+    assert not (await reservations.confirm(alice))["success"]
+    assert (await rental_service.book_slot(bob))["success"]
+
+
+@pytest.mark.asyncio
+async def test_holds_lapsed_elsewhere_are_released_from_the_database():
+    rental_service, reservations, equipment_id = await make_services(ttl_seconds=1)
+    # Placed by another worker (or before a restart): this process's wheel never saw it
+    other_worker = ReservationService(rental_service, hold_ttl_seconds=1)
+    assert (await other_worker.hold(request_for(equipment_id, "alice")))["success"]
+    assert len(reservations.wheel) == 0
+
+    assert await reservations.release_lapsed() == []
+    released = await reservations.release_lapsed(now=datetime.now() + timedelta(seconds=5))
+    assert [hold["request"].user_id for hold in released] == ["alice"]
+    day = (await rental_service.get_equipment_by_id(equipment_id))["availability"][0]
+    assert day["free_mask"] != 0 and day["slots"][0]["held_by"] is None
+    assert await reservations.release_lapsed(now=datetime.now() + timedelta(seconds=5)) == []
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.chatbot as chatbot_api
+from services.chatbot_service import ChatbotService
+from services.llm_client import LLMClient, StubBackend
+from services.socket_service import setup_chat_handlers, sio
+
+REPLY = "Sow paddy in June after the first monsoon showers."
+
+
+def make_service(**backend_kwargs):
+    backend = StubBackend(responder=lambda messages, params: REPLY, **backend_kwargs)
+    return ChatbotService(LLMClient(backend, model="test-model", retry_base_delay=0))
+
+
+async def collect(service, message="When to sow paddy?"):
+    return [event async for event in service.stream_response(message, "english")]
+
+
+@pytest.mark.asyncio
+async def test_tokens_stream_then_done():
+    events = await collect(make_service())
+    tokens = [e["text"] for e in events if e["type"] == "token"]
+    assert len(tokens) == len(REPLY.split(" ")) and "".join(tokens) == REPLY
+    assert events[-1]["type"] == "done" and events[-1]["response"] == REPLY
+
+
+@pytest.mark.asyncio
+async def test_failure_mid_stream_falls_back_to_rules():
+    service = make_service(fail_after_chunks=2)
+    events = await collect(service, "banana price today")
+    assert [e["type"] for e in events] == ["token", "token", "fallback", "done"]
+    assert events[-1]["response"] == service._rule_based_response("banana price today", "english")
+
+    # Failures before the first token are retried instead
+    events = await collect(make_service(fail_times=1))
+    assert "fallback" not in [e["type"] for e in events]
+
+
+def test_sse_endpoint(monkeypatch):
+    monkeypatch.setattr(chatbot_api, "chatbot_service", make_service())
+    app = FastAPI()
+    app.include_router(chatbot_api.router)
+
+    response = TestClient(app).post("/api/chat/stream", json={"message": "When to sow paddy?"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [frame for frame in response.text.split("\n\n") if frame]
+    names = [frame.split("\n")[0] for frame in frames]
+    assert names[0] == "event: token" and names[-1] == "event: done"
+    assert json.loads(frames[-1].split("data: ", 1)[1])["response"] == REPLY
+
+
+@pytest.mark.asyncio
+async def test_socket_chat_message(monkeypatch):
+    emitted = []
+
+    async def fake_emit(event, data=None, to=None, **kwargs):
+        emitted.append((event, data, to))
+
+    monkeypatch.setattr(sio, "emit", fake_emit)
+    monkeypatch.setattr(sio, "get_environ", lambda sid, namespace=None: {"REMOTE_ADDR": "10.0.0.7"})
+    setup_chat_handlers(make_service())
+
+    await sio.handlers["/"]["chat_message"]("sid-1", {"message": "When to sow paddy?", "request_id": "r1"})
+    assert emitted[0][0] == "chat_token" and emitted[-1][0] == "chat_done"
+    assert all(to == "sid-1" and data["request_id"] == "r1" for _, data, to in emitted)
+    assert emitted[-1][1]["response"] == REPLY
+
+
+def test_socket_client_ip_uses_the_shared_proxy_rules(monkeypatch):
+    from services import rate_limiter
+
+    monkeypatch.setattr(rate_limiter, "trusted_proxy_networks", rate_limiter.parse_networks("10.0.0.0/8"))
+    spoofed = {"asgi.scope": {"client": ("203.0.113.9", 5000)}, "HTTP_X_FORWARDED_FOR": "1.2.3.4"}
+    assert rate_limiter.client_ip_from_environ(spoofed) == "203.0.113.9"
+    proxied = {"asgi.scope": {"client": ("10.0.0.2", 5000)}, "HTTP_X_FORWARDED_FOR": "1.2.3.4, 198.51.100.7"}
+    assert rate_limiter.client_ip_from_environ(proxied) == "198.51.100.7"
+    assert rate_limiter.client_ip_from_environ({"REMOTE_ADDR": "10.0.0.7"}) == "10.0.0.7"
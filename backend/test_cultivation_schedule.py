@@ -0,0 +1,78 @@
+import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import services.smart_cultivation_service as smart_cultivation_module
+from models.smart_cultivation_models import SmartCultivationRequest
+from services.cultivation_schedule import (
+    compact_schedule, iter_schedule, schedule_window, with_compact_schedule, with_full_schedule
+)
+from services.smart_cultivation_service import SmartCultivationService
+from utils.json_response import dumps
+
+LLM_TASKS = [
+    {"day_number": day, "task_name": f"Task {day}", "description": "Specific work",
+     "resources_needed": ["Seeds"], "instructions": "Do it", "task_type": "sowing"}
+    for day in (1, 10, 25, 60, 100)
+]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    async def fake_plan(**kwargs):
+        return {"tasks": [dict(task) for task in LLM_TASKS], "analysis": {}, "best_practices": []}
+
+    monkeypatch.setattr(smart_cultivation_module.groq_service, "generate_cultivation_plan", fake_plan)
+    return SmartCultivationService(AsyncMongoMockClient()["test_agri"])
+
+
+def make_request():
+    return SmartCultivationRequest(land_area=2, soil_type="Laterite", sowing_date="2025-06-01", selected_crops=["Rice"])
+
+
+@pytest.mark.asyncio
+async def test_generated_plan_is_compact_and_expands_to_every_day(service):
+    plan = await service.generate_plan(make_request())
+    compact = plan.compact_schedule
+
+    assert plan.schedule == [] and compact.total_days == 120
+    assert [task.day_number for task in compact.tasks] == [1, 10, 25, 60, 100]
+    assert len(compact.ranges) < 12
+
+    full = with_full_schedule(plan).schedule
+    assert [task.day_number for task in full] == list(range(1, 121))
+    assert full[1].task_name == "Seedling Health Check" and full[1].date == "2025-06-02"
+    assert full[-1].task_name == "Pre-Harvest Inspection" and full[-1].deep_link == "market"
+    assert full[9].task_name == "Task 10"
+
+    # Folding the full schedule back gives the same compact form
+    assert compact_schedule(full, plan.start_date) == compact
+    assert len(dumps(with_compact_schedule(plan).model_dump())) * 5 < len(dumps(with_full_schedule(plan).model_dump()))
+
+
+@pytest.mark.asyncio
+async def test_changed_filler_day_is_kept_as_sparse_task(service):
+    full = with_full_schedule(await service.generate_plan(make_request()))
+    full.schedule[4].status = "completed"
+
+    compact = with_compact_schedule(full).compact_schedule
+    assert 5 in [task.day_number for task in compact.tasks]
+    assert list(iter_schedule(compact, full.start_date, 5, 5))[0].status == "completed"
+
+
+@pytest.mark.asyncio
+async def test_saved_plan_is_stored_compact_and_read_by_window(service):
+    plan_id = await service.save_plan(await service.generate_plan(make_request()))
+
+    doc = await service.collection.find_one({})
+    assert "schedule" not in doc and doc["compact_schedule"]["total_days"] == 120
+
+    week = await service.get_schedule_window(plan_id, datetime.date(2025, 6, 8), 7)
+    assert [task.day_number for task in week] == list(range(8, 15))
+    assert week[2].task_name == "Task 10"
+
+    # Windows are clipped to the plan
+    stored = await service.get_plan_by_id(plan_id)
+    assert [t.day_number for t in schedule_window(stored, datetime.date(2025, 5, 30), 4)] == [1, 2]
+    assert schedule_window(stored, datetime.date(2026, 1, 1), 7) == []
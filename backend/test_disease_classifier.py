@@ -0,0 +1,99 @@
+import io
+import json
+
+import pytest
+
+from services.disease_classifier import DiseaseClassifier, parse_label
+from services.disease_detection_service import DiseaseDetectionService
+
+
+class FakeClassifier:
+    available = True
+
+    def __init__(self, predictions):
+        self.predictions = predictions
+        self.calls = []
+
+    async def classify(self, image_bytes, crop=None):
+        self.calls.append((image_bytes, crop))
+        return self.predictions
+
+
+def prediction(label, score):
+    return {**parse_label(label), "score": score}
+
+
+def test_labels_without_a_crop_match_no_crop_filter():
+    assert parse_label("Tomato/tomato_blight")["crop"] == "tomato"
+    bare = parse_label("healthy")
+    assert bare["crop"] is None and bare["disease_id"] == "healthy"
+
+
+@pytest.mark.asyncio
+async def test_predictions_map_to_disease_database():
+    classifier = FakeClassifier([prediction("rice/rice_blast", 0.81), prediction("rice/healthy", 0.12),
+                                 prediction("wheat/wheat_rust", 0.04)])
+    service = DiseaseDetectionService(classifier)
+
+    analysis = (await service.analyze_disease(b"jpeg", crop_type="Rice"))["analysis"]
+    assert classifier.calls == [(b"jpeg", "Rice")]
+    assert analysis["method"] == "model" and analysis["disease"] == "Rice Blast"
+    assert analysis["confidence"] == 0.81 and analysis["treatment_urgency"] == "Immediate"
+    assert [d["id"] for d in analysis["detected_diseases"]] == ["rice_blast", "wheat_rust"]
+    assert analysis["detected_diseases"][0]["confidence"] == 0.81
+    assert "Tricyclazole" in analysis["treatment"] and len(analysis["predictions"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_healthy_unknown_and_low_confidence_predictions():
+    service = DiseaseDetectionService(FakeClassifier([prediction("tomato/healthy", 0.9)]))
+    analysis = (await service.analyze_disease(b"jpeg"))["analysis"]
+    assert analysis["disease"] == "Healthy" and analysis["crop"] == "tomato" and analysis["detected_diseases"] == []
+    assert "Use resistant varieties" in analysis["prevention"]
+
+    service = DiseaseDetectionService(FakeClassifier([prediction("banana/banana_bunchy_top", 0.3)]))
+    analysis = (await service.analyze_disease(b"jpeg"))["analysis"]
+    assert analysis["disease"] == "Banana Bunchy Top"
+    assert analysis["recommendations"][0].startswith("Low confidence")
+
+
+@pytest.mark.asyncio
+async def test_without_a_model_analysis_stays_rule_based():
+    service = DiseaseDetectionService(DiseaseClassifier(model_path="/nonexistent/model.onnx"))
+    assert service.classifier.load() is False
+    analysis = (await service.analyze_disease(b"jpeg", crop_type="tomato"))["analysis"]
+    assert analysis["method"] == "simulated" and analysis["disease"] == "Tomato Blight"
+
+
+@pytest.mark.asyncio
+async def test_onnx_model_end_to_end(tmp_path):
+    np = pytest.importorskip("numpy")
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    Image = pytest.importorskip("PIL.Image")
+    from onnx import TensorProto, helper
+
+    # Mean colour per channel -> 3 logits: a red image is "tomato_blight"
+    labels = ["tomato/tomato_blight", "tomato/healthy", "rice/rice_blast"]
+    weights = helper.make_tensor("w", TensorProto.FLOAT, [3, 3], [20, -20, 0, -20, 20, 0, 0, 0, 1])
+    graph = helper.make_graph(
+        [helper.make_node("GlobalAveragePool", ["input"], ["pooled"]),
+         helper.make_node("Flatten", ["pooled"], ["flat"]),
+         helper.make_node("Gemm", ["flat", "w"], ["logits"], transB=1)],
+        "tiny", [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["N", 3, 224, 224])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["N", 3])], [weights]
+    )
+    model_path = tmp_path / "tiny.onnx"
+    onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)]), str(model_path))
+    (tmp_path / "tiny.labels.json").write_text(json.dumps(labels))
+
+    classifier = DiseaseClassifier(model_path=str(model_path), preprocess_workers=1)
+    assert classifier.load()
+    try:
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480), (220, 30, 30)).save(buffer, format="JPEG")
+        top = await classifier.classify(buffer.getvalue(), crop="tomato")
+        assert top[0]["disease_id"] == "tomato_blight" and [p["crop"] for p in top] == ["tomato", "tomato"]
+        assert np.isclose(sum(p["score"] for p in top), 1.0, atol=1e-3)
+    finally:
+        await classifier.close()
@@ -0,0 +1,120 @@
+import os
+import time
+from datetime import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import api.auth as auth
+from enhanced_storage import FarmerStorage
+
+
+def make_farmer(farmer_id, phone, email=None):
+    return {
+        "farmer_id": farmer_id,
+        "name": f"Farmer {farmer_id}",
+        "phone": phone,
+        "email": email,
+        "registration_date": datetime.now(),
+        "last_active": datetime.now()
+    }
+
+
+def test_phone_and_email_indexes_follow_updates(tmp_path):
+    storage = FarmerStorage(backup_file=str(tmp_path / "farmers_data.json"))
+    storage.save_farmer(make_farmer("F1", "9876543210", "ravi@example.com"))
+    storage.save_farmer(make_farmer("F2", "9123456780"))
+
+    assert storage.get_farmer_by_phone("9876543210")["farmer_id"] == "F1"
+    assert storage.get_farmer_by_email("ravi@example.com")["farmer_id"] == "F1"
+    assert storage.get_farmer_by_phone("9123456780")["farmer_id"] == "F2"
+
+    # Changing the phone and email must drop the old keys
+    storage.save_farmer(make_farmer("F1", "9000000001", "ravi@farm.in"))
+    assert storage.get_farmer_by_phone("9876543210") is None
+    assert storage.get_farmer_by_email("ravi@example.com") is None
+    assert storage.get_farmer_by_email("ravi@farm.in")["farmer_id"] == "F1"
+
+    restored = FarmerStorage(backup_file=str(tmp_path / "farmers_data.json"))
+    assert restored.get_farmer_by_phone("9000000001")["farmer_id"] == "F1"
+
+
+@pytest.mark.asyncio
+async def test_one_failing_index_does_not_skip_the_rest():
+    db = AsyncMongoMockClient()["index_test"]
+    # Legacy data with duplicate farmer_ids: the unique farmer_id index cannot be built
+    await db.farmers.insert_many([{"farmer_id": "dup"}, {"farmer_id": "dup"}])
+    await auth.ensure_auth_indexes(db)
+
+    farmer_keys = [index["key"] for index in (await db.farmers.index_information()).values()]
+    assert [("farmer_id", 1)] not in farmer_keys and [("phone", 1)] in farmer_keys
+    challenge_indexes = (await db.passkey_challenges.index_information()).values()
+    assert any(index.get("expireAfterSeconds") == 0 for index in challenge_indexes)
+    assert "jti_1" in await db.refresh_tokens.index_information()
+
+
+def test_journal_replays_changes_after_crash(tmp_path):
+    backup_file = str(tmp_path / "farmers_data.json")
+    storage = FarmerStorage(backup_file=backup_file, compact_entries=1000)
+    storage.save_farmer(make_farmer("F1", "9876543210"))
+    storage.save_farmer(make_farmer("F2", "9123456780"))
+    storage.update_last_active("F1")
+    last_active = storage.get_farmer_by_id("F1")["last_active"]
+
+    # Nothing has been compacted yet: the snapshot is absent and every
+    # change is a single journal line, the last one torn by a crash
+    assert not (tmp_path / "farmers_data.json").exists()
+    with open(storage.journal_file, "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "data": {"farmer_id": "F3"')
+
+    restored = FarmerStorage(backup_file=backup_file)
+    assert set(restored.farmers) == {"F1", "F2"}
+    assert restored.get_farmer_by_id("F1")["last_active"] == last_active
+    assert restored.get_farmer_by_phone("9123456780")["farmer_id"] == "F2"
+    # Recovery folds the journal into a fresh snapshot
+    assert (tmp_path / "farmers_data.json").exists()
+    assert open(restored.journal_file).read() == ""
+
+
+def test_journal_compacts_into_snapshot(tmp_path):
+    storage = FarmerStorage(backup_file=str(tmp_path / "farmers_data.json"), compact_entries=3)
+    for i in range(4):
+        storage.save_farmer(make_farmer(f"F{i}", f"900000000{i}"))
+
+    assert len(open(storage.journal_file).read().splitlines()) == 1
+    storage.close()
+    restored = FarmerStorage(backup_file=str(tmp_path / "farmers_data.json"))
+    assert len(restored.get_all_farmers()) == 4
+
+
+def test_torn_only_entry_is_cut_before_new_appends(tmp_path):
+    backup_file = str(tmp_path / "farmers_data.json")
+    storage = FarmerStorage(backup_file=backup_file)
+    storage.close()
+    # The only journal entry was torn: nothing is replayed, so no compaction runs
+    with open(storage.journal_file, "w", encoding="utf-8") as f:
+        f.write('{"op": "put", "data": {"farmer_id": "F0"')
+
+    restored = FarmerStorage(backup_file=backup_file)
+    assert restored.farmers == {}
+    assert open(restored.journal_file).read() == ""
+    restored.save_farmer(make_farmer("F1", "9876543210"))
+    restored.close()
+
+    assert set(FarmerStorage(backup_file=backup_file).farmers) == {"F1"}
+
+
+def test_idle_journal_is_synced_after_the_interval(tmp_path, monkeypatch):
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced.append(fd), fsync(fd)))
+    storage = FarmerStorage(
+        backup_file=str(tmp_path / "farmers_data.json"), fsync_every=1000, fsync_interval=0.05
+    )
+    storage.save_farmer(make_farmer("F1", "9876543210"))
+    assert storage._unsynced == 1
+
+    # No further writes arrive, yet the pending entry still reaches the disk
+    time.sleep(0.2)
+    assert storage._unsynced == 0 and storage._journal.fileno() in synced
+    storage.close()
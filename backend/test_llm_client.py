@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+
+from services.chatbot_service import ChatbotService
+from services.groq_service import GroqService
+from services.llm_client import LLMClient, LLMError, StubBackend
+
+MESSAGES = [{"role": "user", "content": "When should I sow paddy?"}]
+
+
+def make_client(backend, **kwargs):
+    kwargs.setdefault("retry_base_delay", 0)
+    return LLMClient(backend, model="test-model", **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_stub_is_deterministic():
+    client = make_client(StubBackend())
+    first = await client.complete(MESSAGES)
+    assert first == await client.complete(MESSAGES)
+    assert first.endswith("When should I sow paddy?")
+    assert await client.complete(MESSAGES, response_format={"type": "json_object"}) == "{}"
+    assert client.backend.calls[0]["model"] == "test-model"
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried():
+    backend = StubBackend(fail_times=2)
+    assert (await make_client(backend, max_retries=2).complete(MESSAGES)).startswith("[stub")
+    assert len(backend.calls) == 3
+
+    with pytest.raises(LLMError):
+        await make_client(StubBackend(fail_times=5), max_retries=1).complete(MESSAGES)
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_fail_fast():
+    def bad_request(messages, params):
+        raise ValueError("bad request")
+
+    backend = StubBackend(responder=bad_request)
+    with pytest.raises(LLMError):
+        await make_client(backend, max_retries=3).complete(MESSAGES)
+    assert len(backend.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_timeout_and_concurrency_limit():
+    with pytest.raises(LLMError):
+        await make_client(StubBackend(delay=0.2), timeout=0.01, max_retries=1).complete(MESSAGES)
+
+    in_flight = peak = 0
+
+    class CountingBackend(StubBackend):
+        async def complete(self, messages, model, **params):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return "ok"
+
+    client = make_client(CountingBackend(), max_concurrency=3)
+    assert await asyncio.gather(*[client.complete(MESSAGES) for _ in range(10)]) == ["ok"] * 10
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_call_sites_use_the_client():
+    plan = {"tasks": [{"day_number": 1, "task_name": "Sow"}], "analysis": {}}
+    backend = StubBackend(responder=lambda messages, params: json.dumps(plan))
+    groq = GroqService(make_client(backend))
+    assert await groq.generate_cultivation_plan(crops=["Rice"], soil_type="Laterite") == plan
+    assert backend.calls[0]["response_format"] == {"type": "json_object"}
+
+    chatbot = ChatbotService(make_client(StubBackend(responder=lambda m, p: "  Sow in June.  ")))
+    assert await chatbot.get_response("When to sow paddy?") == "Sow in June."
+
+    # Upstream failure falls back to the rule-based answers
+    failing = ChatbotService(make_client(StubBackend(fail_times=10), max_retries=0))
+    assert "Market Prices" in await failing.get_response("banana price today")
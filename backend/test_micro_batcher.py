@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from utils.micro_batcher import MicroBatcher
+
+
+def doubler(sizes, delay=0.0):
+    async def process_batch(items):
+        sizes.append(len(items))
+        await asyncio.sleep(delay)
+        return [item * 2 for item in items]
+    return process_batch
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_share_a_batch():
+    sizes = []
+    batcher = MicroBatcher(doubler(sizes), max_batch_size=8, max_wait_ms=20)
+    try:
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(6)))
+        assert results == [0, 2, 4, 6, 8, 10] and sizes == [6]
+
+        metrics = batcher.metrics()
+        assert metrics["batches"] == 1 and metrics["items"] == 6
+        assert metrics["mean_batch_size"] == 6 and metrics["occupancy"] == 0.75
+        assert metrics["batch_size_counts"] == {6: 1} and metrics["queued"] == 0
+    finally:
+        await batcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_batches_are_capped_and_a_lone_item_waits_at_most_max_wait():
+    sizes = []
+    batcher = MicroBatcher(doubler(sizes, delay=0.01), max_batch_size=4, max_wait_ms=10)
+    try:
+        assert await asyncio.gather(*(batcher.submit(i) for i in range(10))) == [i * 2 for i in range(10)]
+        assert sizes == [4, 4, 2]
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await batcher.submit(21) == 42
+        assert loop.time() - started < 0.5 and sizes[-1] == 1
+    finally:
+        await batcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_failures_reach_every_caller_in_the_batch():
+    async def broken(items):
+        raise ValueError("model crashed")
+
+    batcher = MicroBatcher(broken, max_batch_size=4, max_wait_ms=10)
+    try:
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert batcher.metrics()["failed_batches"] == 1
+
+        async def short(items):
+            return items[:-1]
+
+        batcher.process_batch = short
+        with pytest.raises(RuntimeError):
+            await asyncio.gather(batcher.submit(1), batcher.submit(2))
+    finally:
+        await batcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_fails_pending_callers():
+    release = asyncio.Event()
+
+    async def slow(items):
+        await release.wait()
+        return items
+
+    batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=1)
+    first = asyncio.create_task(batcher.submit(1))
+    second = asyncio.create_task(batcher.submit(2))
+    await asyncio.sleep(0.01)
+    await batcher.stop()
+    # Both the running batch and the queued one are failed, not left hanging
+    for task in (first, second):
+        with pytest.raises(RuntimeError):
+            await task
+    assert batcher.metrics()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stop_while_collecting_fails_the_partial_batch():
+    batcher = MicroBatcher(doubler([]), max_batch_size=8, max_wait_ms=5000)
+    lone = asyncio.create_task(batcher.submit(1))
+    await asyncio.sleep(0.01)  # taken off the queue, waiting for more items
+    await batcher.stop()
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(lone, 1)
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from enhanced_storage import PasskeyStorage
+
+
+def test_passkeys_survive_restart_via_log(tmp_path):
+    log_file = str(tmp_path / "passkeys.log")
+    storage = PasskeyStorage(log_file=log_file)
+    storage.save_passkey({"credential_id": "cred_1", "public_key": "pk1", "farmer_id": "farmer_a", "created_at": datetime.now()})
+    storage.save_passkey({"credential_id": "cred_2", "public_key": "pk2", "farmer_id": "farmer_a", "created_at": datetime.now()})
+    storage.delete_passkey("cred_1")
+
+    restored = PasskeyStorage(log_file=log_file)
+
+    assert restored.get_passkey("cred_1") is None
+    assert restored.get_passkey("cred_2")["public_key"] == "pk2"
+    assert [p["credential_id"] for p in restored.get_passkeys_by_farmer("farmer_a")] == ["cred_2"]
+
+
+def test_challenges_are_single_use_and_expire(tmp_path):
+    storage = PasskeyStorage(log_file=str(tmp_path / "passkeys.log"))
+    storage.store_challenge("live", datetime.utcnow() + timedelta(minutes=5))
+    storage.store_challenge("stale", datetime.utcnow() - timedelta(seconds=1))
+
+    assert storage.consume_challenge("live")
+    assert not storage.consume_challenge("live")
+    assert not storage.consume_challenge("stale")
+
+
+def test_torn_tail_is_cut_and_earlier_passkeys_survive(tmp_path):
+    log_file = tmp_path / "passkeys.log"
+    storage = PasskeyStorage(log_file=str(log_file))
+    storage.save_passkey({"credential_id": "cred_1", "public_key": "pk1", "farmer_id": "farmer_a"})
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "data": {"credential_id": "cred_2"')  # crash mid-write
+
+    restored = PasskeyStorage(log_file=str(log_file))
+    assert restored.get_passkey("cred_1")["public_key"] == "pk1"
+    assert restored.get_passkey("cred_2") is None
+
+    restored.save_passkey({"credential_id": "cred_3", "public_key": "pk3", "farmer_id": "farmer_a"})
+    reopened = PasskeyStorage(log_file=str(log_file))
+    assert sorted(reopened.passkeys) == ["cred_1", "cred_3"]
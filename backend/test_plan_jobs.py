@@ -0,0 +1,215 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from models.smart_cultivation_models import CompactSchedule, SmartCultivationPlan, SmartCultivationRequest
+from services.plan_jobs import PlanJobQueue, PlanQueueFull
+from services.socket_service import emit_plan_job_status, setup_plan_job_handlers, sio
+
+
+def make_request(**overrides):
+    fields = dict(land_area=2, soil_type="laterite", sowing_date="2025-06-01", selected_crops=["Rice"])
+    fields.update(overrides)
+    return SmartCultivationRequest(**fields)
+
+
+class FakeGenerator:
+    """Stands in for SmartCultivationService.generate_plan, tracking concurrency"""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, request):
+        self.calls.append(request)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if request.soil_type == "Broken":
+                raise RuntimeError("weather service down")
+            return SmartCultivationPlan(
+                user_id=request.user_id or "temp_user", crop_name=", ".join(request.selected_crops),
+                start_date=request.sowing_date, input_details=request,
+                compact_schedule=CompactSchedule(total_days=120)
+            )
+        finally:
+            self.running -= 1
+
+
+@pytest.fixture
+def collection():
+    return AsyncMongoMockClient()["test_agri"].plan_jobs
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_deduplicated_bounded_and_stored(collection):
+    generate = FakeGenerator()
+    statuses = []
+
+    async def on_status(job):
+        statuses.append((job["job_id"], job["status"]))
+
+    jobs = PlanJobQueue(generate, collection, workers=2, on_status=on_status)
+    await jobs.ensure_indexes()
+    try:
+        first = await jobs.submit(make_request())
+        again = await jobs.submit(make_request())
+        assert again["job_id"] == first["job_id"] and again["deduplicated"] and not first["deduplicated"]
+
+        others = [await jobs.submit(make_request(land_area=area)) for area in (3, 4, 5)]
+        await jobs.drain()
+    finally:
+        await jobs.stop()
+
+    assert len(generate.calls) == 4 and generate.peak == 2
+    assert (await jobs.get(first["job_id"]))["status"] == "done"
+    assert [s for job_id, s in statuses if job_id == first["job_id"]] == ["running", "done"]
+    plan = await jobs.get_result(others[0]["job_id"])
+    assert plan.input_details.land_area == 3 and plan.compact_schedule.total_days == 120
+
+    # Finished jobs no longer absorb new submissions
+    jobs = PlanJobQueue(generate, collection, workers=1)
+    try:
+        assert not (await jobs.submit(make_request()))["deduplicated"]
+    finally:
+        await jobs.stop()
+
+
+@pytest.mark.asyncio
+async def test_failures_and_a_full_queue(collection):
+    jobs = PlanJobQueue(FakeGenerator(), collection, workers=1, queue_size=1)
+    try:
+        job = await jobs.submit(make_request(soil_type="Broken"))
+        with pytest.raises(PlanQueueFull):
+            await jobs.submit(make_request(land_area=9))
+        await jobs.drain()
+    finally:
+        await jobs.stop()
+
+    failed = await jobs.get(job["job_id"])
+    assert failed["status"] == "failed" and "weather service down" in failed["error"]
+    assert await jobs.get_result(job["job_id"]) is None
+
+
+@pytest.mark.asyncio
+async def test_unfinished_jobs_survive_a_restart(collection):
+    # A process stopped with one job running and one still queued
+    stalled = PlanJobQueue(FakeGenerator(delay=10), collection, workers=1, lease_seconds=0.05)
+    running = await stalled.submit(make_request())
+    queued = await stalled.submit(make_request(land_area=3))
+    await asyncio.sleep(0.01)
+    await stalled.stop()
+    assert (await stalled.get(running["job_id"]))["status"] == "running"
+    await asyncio.sleep(0.1)  # its lease lapses
+
+    generate = FakeGenerator()
+    jobs = PlanJobQueue(generate, collection, workers=2)
+    try:
+        assert await jobs.recover() == 2
+        await jobs.drain()
+    finally:
+        await jobs.stop()
+    assert len(generate.calls) == 2
+    for job in (running, queued):
+        assert (await jobs.get(job["job_id"]))["status"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_sweep_picks_up_jobs_queued_by_a_dead_process(collection):
+    # Queued but never started, and its process is gone
+    dead = PlanJobQueue(FakeGenerator(), collection, workers=0)
+    job = await dead.submit(make_request())
+    await dead.stop()
+
+    generate = FakeGenerator()
+    jobs = PlanJobQueue(generate, collection, workers=1, lease_seconds=0.05)
+    jobs.start()
+    try:
+        await asyncio.sleep(0.15)  # a lease sweep, no recover()
+        await jobs.drain()
+    finally:
+        await jobs.stop()
+    assert len(generate.calls) == 1
+    assert (await jobs.get(job["job_id"]))["status"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_identical_submits_from_two_processes_share_a_job(collection):
+    ours = PlanJobQueue(FakeGenerator(), collection, workers=0)
+    other = PlanJobQueue(FakeGenerator(), collection, workers=0)
+    await ours.ensure_indexes()
+
+    # The other process inserts between our lookup and our insert
+    insert_one = collection.insert_one
+    winner = []
+
+    async def insert_after_other(doc):
+        collection.insert_one = insert_one
+        winner.append(await other.submit(make_request()))
+        return await insert_one(doc)
+
+    collection.insert_one = insert_after_other
+    try:
+        job = await ours.submit(make_request())
+    finally:
+        collection.insert_one = insert_one
+        await ours.stop()
+        await other.stop()
+    assert job["deduplicated"] and job["job_id"] == winner[0]["job_id"]
+    assert await collection.count_documents({}) == 1
+
+
+@pytest.mark.asyncio
+async def test_jobs_of_a_live_worker_are_not_taken_over(collection):
+    busy = FakeGenerator(delay=0.3)
+    live = PlanJobQueue(busy, collection, workers=1, lease_seconds=0.06)
+    job = await live.submit(make_request())
+    await asyncio.sleep(0.01)
+
+    # Another process starting up while the first keeps renewing its lease
+    generate = FakeGenerator()
+    other = PlanJobQueue(generate, collection, workers=1, lease_seconds=0.06)
+    try:
+        await asyncio.sleep(0.1)
+        assert await other.recover() == 0
+        await live.drain()
+        await asyncio.sleep(0.1)  # a lease sweep of the other process
+    finally:
+        await live.stop()
+        await other.stop()
+    assert len(busy.calls) == 1 and generate.calls == []
+    assert (await live.get(job["job_id"]))["status"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_socket_subscription(collection, monkeypatch):
+    emitted, rooms = [], []
+
+    async def fake_emit(event, data=None, to=None, room=None, **kwargs):
+        emitted.append((event, data["job_id"], to or room))
+
+    async def fake_enter_room(sid, room, namespace=None):
+        rooms.append((sid, room))
+
+    monkeypatch.setattr(sio, "emit", fake_emit)
+    monkeypatch.setattr(sio, "enter_room", fake_enter_room)
+
+    jobs = PlanJobQueue(FakeGenerator(), collection, workers=1, on_status=emit_plan_job_status)
+    setup_plan_job_handlers(jobs)
+    try:
+        job = await jobs.submit(make_request())
+        await sio.handlers["/"]["subscribe_plan_job"]("sid-1", {"job_id": job["job_id"]})
+        await sio.handlers["/"]["subscribe_plan_job"]("sid-2", {"job_id": "missing"})
+        await jobs.drain()
+    finally:
+        await jobs.stop()
+
+    room = f"plan_job_{job['job_id']}"
+    assert rooms == [("sid-1", room)]
+    assert emitted[0] == ("plan_job_status", job["job_id"], "sid-1")
+    assert emitted[1] == ("plan_job_error", "missing", "sid-2")
+    assert emitted[-1] == ("plan_job_status", job["job_id"], room)
@@ -0,0 +1,92 @@
+import asyncio
+import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from models.smart_cultivation_models import CompactSchedule, DailyTask, ScheduleRange, SmartCultivationPlan, SmartCultivationRequest
+from services.cultivation_schedule import schedule_window, with_full_schedule
+from services.smart_cultivation_service import SmartCultivationService
+
+
+def make_plan(user_id="u1", status="active", crop="Rice"):
+    request = SmartCultivationRequest(land_area=2, soil_type="loam", sowing_date="2025-06-01",
+                                      selected_crops=[crop], location="Thrissur")
+    tasks = [DailyTask(day_number=3, task_name="Sow", description="d", instructions="Sow in rows", task_type="sowing")]
+    ranges = [ScheduleRange(start_day=1, end_day=2, template_id="seedling_check"),
+              ScheduleRange(start_day=4, end_day=120, template_id="weed_pest_patrol")]
+    return SmartCultivationPlan(user_id=user_id, crop_name=crop, start_date="2025-06-01", end_date="2025-09-28",
+                                status=status, input_details=request, analysis={"soil_prep": "Plough twice"},
+                                compact_schedule=CompactSchedule(total_days=120, tasks=tasks, ranges=ranges))
+
+
+async def make_service():
+    service = SmartCultivationService(AsyncMongoMockClient()["test_agri"])
+    await service.initialize_indexes()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_indexes():
+    service = await make_service()
+    keys = [index["key"] for index in (await service.collection.index_information()).values()]
+    assert [("user_id", 1), ("status", 1), ("created_at", -1), ("_id", -1)] in keys
+    assert [("user_id", 1), ("created_at", -1), ("_id", -1)] in keys
+
+
+@pytest.mark.asyncio
+async def test_summaries_page_newest_first():
+    service = await make_service()
+    ids = []
+    for crop, status in [("Rice", "completed"), ("Wheat", "active"), ("Banana", "completed"), ("Maize", "active")]:
+        ids.append(await service.save_plan(make_plan(crop=crop, status=status)))
+        await asyncio.sleep(0.002)  # Mongo keeps milliseconds
+    await service.save_plan(make_plan(user_id="u2"))
+
+    page = await service.list_plan_summaries("u1", limit=3)
+    assert [s.crop_name for s in page] == ["Maize", "Banana", "Wheat"]
+    assert page[0].plan_id == ids[3] and page[0].total_days == 120 and page[0].location == "Thrissur"
+    rest = await service.list_plan_summaries("u1", before=page[-1].created_at, before_id=page[-1].plan_id, limit=3)
+    assert [s.crop_name for s in rest] == ["Rice"]
+
+    active = await service.list_plan_summaries("u1", status="active")
+    assert [s.crop_name for s in active] == ["Maize", "Wheat"]
+
+
+@pytest.mark.asyncio
+async def test_schedule_windows_read_only_the_schedule():
+    service = await make_service()
+    plan = make_plan()
+    plan_id = await service.save_plan(plan)
+    from_date = datetime.date(2025, 6, 2)
+
+    window = await service.get_schedule_window(plan_id, from_date, 3)
+    assert window == schedule_window(plan, from_date, 3)
+    assert [t.day_number for t in window] == [2, 3, 4] and window[1].task_name == "Sow"
+    assert await service.get_upcoming_tasks("u1", from_date, 3) == window
+    assert await service.get_upcoming_tasks("nobody", from_date, 3) == []
+    assert await service.get_schedule_window("not-an-id", from_date, 3) is None
+
+    # Plans saved before compaction keep a full schedule
+    legacy = with_full_schedule(plan).model_dump(exclude={"compact_schedule"})
+    legacy_id = str((await service.collection.insert_one(legacy)).inserted_id)
+    assert await service.get_schedule_window(legacy_id, from_date, 3) == window
+
+
+@pytest.mark.asyncio
+async def test_summary_pages_keep_plans_sharing_a_timestamp():
+    service = await make_service()
+    created_at = datetime.datetime(2025, 1, 1, 8, 0)
+    crops = ["Rice", "Wheat", "Banana", "Maize", "Ginger"]
+    for crop in crops:
+        # Legacy plans migrated in one go share created_at
+        await service.collection.insert_one({**make_plan(crop=crop).model_dump(), "created_at": created_at})
+
+    seen, before, before_id = [], None, None
+    while True:
+        page = await service.list_plan_summaries("u1", before=before, before_id=before_id, limit=2)
+        if not page:
+            break
+        seen += [s.crop_name for s in page]
+        before, before_id = page[-1].created_at, page[-1].plan_id
+    assert sorted(seen) == sorted(crops) and len(seen) == len(crops)
@@ -0,0 +1,116 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import api.smart_cultivation as smart_cultivation_api
+import services.smart_cultivation_service as smart_cultivation_module
+from models.smart_cultivation_models import SmartCultivationRequest
+from services.groq_service import GroqService
+from services.llm_client import LLMClient, StubBackend
+from services.smart_cultivation_service import SmartCultivationService
+from utils.json_stream import IncrementalObjectParser
+
+
+def make_task(day, task_type="monitoring"):
+    return {"day_number": day, "task_name": f"Task {day}", "description": "Check the \"crop\", {rows}",
+            "resources_needed": ["sprayer", "neem oil"], "instructions": "Walk the field", "task_type": task_type}
+
+
+PLAN = {
+    "intercropping_strategy": "2 rows Rice : 1 row Black gram",
+    "yield_estimate": "2000 kg/acre",
+    "best_practices": ["Treat seed", "Keep 2-5 cm water"],
+    "analysis": {"soil_prep": "Plough twice", "water_management": "Flood at tillering"},
+    "tasks": [make_task(1), make_task(2), make_task(5), make_task(9), make_task(16, "harvesting")]
+}
+
+
+def make_request(**overrides):
+    fields = dict(land_area=2, soil_type="laterite", soil_ph=6.4, sowing_date="2025-06-01",
+                  selected_crops=["Rice", "black gram"])
+    fields.update(overrides)
+    return SmartCultivationRequest(**fields)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = StubBackend(responder=lambda messages, params: "```json\n" + json.dumps(PLAN, indent=1) + "\n```")
+    groq = GroqService(LLMClient(backend, model="test-model", retry_base_delay=0))
+    monkeypatch.setattr(smart_cultivation_module, "groq_service", groq)
+    return backend
+
+
+def test_parser_emits_members_as_they_complete():
+    text = "Here is the plan: " + json.dumps(PLAN)
+    parser = IncrementalObjectParser(stream_keys=("analysis", "tasks"))
+    events = []
+    for ch in text:
+        events.extend(parser.feed(ch))
+    assert parser.done
+
+    assert events[0] == ("field", "intercropping_strategy", PLAN["intercropping_strategy"])
+    assert ("field", "best_practices", PLAN["best_practices"]) in events
+    assert ("item", "analysis", "soil_prep", "Plough twice") in events
+    tasks = [event[3] for event in events if event[:2] == ("item", "tasks")]
+    assert tasks == PLAN["tasks"]
+    assert not any(event[0] == "field" and event[1] in ("analysis", "tasks") for event in events)
+
+    # The first task is available before the rest of the array has arrived
+    parser = IncrementalObjectParser(stream_keys=("tasks",))
+    text = json.dumps(PLAN)
+    first = parser.feed(text[:text.index('"day_number": 2')])
+    assert first[-1] == ("item", "tasks", 0, PLAN["tasks"][0])
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_weekly_chunks_then_the_plan(backend):
+    db = AsyncMongoMockClient()["test_agri"]
+    service = SmartCultivationService(db)
+
+    events = [event async for event in service.stream_plan(make_request())]
+    types = [event["type"] for event in events]
+    assert types.index("analysis") < types.index("tasks") and types[-1] == "plan"
+    chunks = [[task.day_number for task in event["tasks"]] for event in events if event["type"] == "tasks"]
+    assert chunks == [[1, 2, 5], [9], [16]]
+    assert chunks[0] and events[types.index("tasks")]["tasks"][0].date == "2025-06-01"
+
+    plan = events[-1]["plan"]
+    expected = await service.generate_plan(make_request())
+    assert plan.compact_schedule == expected.compact_schedule and plan.analysis == PLAN["analysis"]
+    assert len(backend.calls) == 1  # generate_plan reused the streamed template
+
+    # Replays from the template cache follow the same shape without the LLM
+    replay = [event async for event in service.stream_plan(make_request(sowing_date="2025-07-01"))]
+    assert [event["type"] for event in replay] == types
+    assert replay[-1]["plan"].compact_schedule.tasks[0].date == "2025-07-01"
+    assert len(backend.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_truncated_stream_reports_an_error(monkeypatch):
+    truncated = json.dumps(PLAN)[:-40]
+    groq = GroqService(LLMClient(StubBackend(responder=lambda m, p: truncated), retry_base_delay=0))
+    monkeypatch.setattr(smart_cultivation_module, "groq_service", groq)
+    service = SmartCultivationService(AsyncMongoMockClient()["test_agri"])
+
+    events = [event async for event in service.stream_plan(make_request())]
+    assert events[-1]["type"] == "error" and "plan" not in [event["type"] for event in events]
+    assert await service.template_cache.collection.count_documents({}) == 0
+
+
+def test_sse_endpoint(backend):
+    service = SmartCultivationService(AsyncMongoMockClient()["test_agri"])
+    app = FastAPI()
+    app.include_router(smart_cultivation_api.router)
+    app.dependency_overrides[smart_cultivation_api.get_smart_cultivation_service] = lambda: service
+
+    response = TestClient(app).post("/api/smart-cultivation/generate/stream?format=compact",
+                                    json=make_request().model_dump())
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [frame for frame in response.text.split("\n\n") if frame]
+    assert frames[0].startswith("event: field") and frames[-1].startswith("event: plan")
+    plan = json.loads(frames[-1].split("data: ", 1)[1])["plan"]
+    assert plan["schedule"] == [] and len(plan["compact_schedule"]["tasks"]) == 5
@@ -0,0 +1,79 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import services.smart_cultivation_service as smart_cultivation_module
+from models.smart_cultivation_models import SmartCultivationRequest
+from services.plan_template_cache import normalize_plan_inputs, ph_bucket
+from services.smart_cultivation_service import SmartCultivationService
+
+
+@pytest.fixture
+def groq_calls(monkeypatch):
+    calls = []
+
+    async def fake_plan(**inputs):
+        calls.append(inputs)
+        if inputs["soil_type"] == "Broken":
+            return {"tasks": [], "intercropping_strategy": "Error generating plan: boom"}
+        return {
+            "tasks": [{"day_number": 1, "task_name": "Sow", "description": "d", "instructions": "Sow in rows",
+                       "task_type": "irrigation"}],
+            "analysis": {"soil_prep": "Plough twice"}
+        }
+
+    monkeypatch.setattr(smart_cultivation_module.groq_service, "generate_cultivation_plan", fake_plan)
+    return calls
+
+
+def make_request(**overrides):
+    fields = dict(land_area=2, soil_type="laterite", soil_ph=6.4, sowing_date="2025-06-01",
+                  selected_crops=["Rice", "black gram"], location="Thrissur")
+    fields.update(overrides)
+    return SmartCultivationRequest(**fields)
+
+
+def test_inputs_are_normalized():
+    a = normalize_plan_inputs(make_request())
+    b = normalize_plan_inputs(make_request(soil_type=" Laterite ", soil_ph=6.6, selected_crops=["Black Gram", "rice"]))
+    assert a == b
+    assert a["crops"] == ["Black Gram", "Rice"] and a["soil_ph"] == 6.5 and a["water_availability"] == "Moderate"
+    assert ph_bucket(7.3) == 7.5 and ph_bucket(None) is None
+
+
+@pytest.mark.asyncio
+async def test_equivalent_requests_reuse_the_template(groq_calls):
+    db = AsyncMongoMockClient()["test_agri"]
+    service = SmartCultivationService(db)
+    await service.initialize_indexes()
+
+    first = await service.generate_plan(make_request())
+    second = await service.generate_plan(make_request(soil_ph=6.3, sowing_date="2025-07-01", selected_crops=["black gram", "RICE"]))
+    assert len(groq_calls) == 1
+    assert second.compact_schedule.tasks[0].date == "2025-07-01"
+    assert second.analysis == first.analysis
+
+    # A new process reads the template back from Mongo
+    await SmartCultivationService(db).generate_plan(make_request())
+    assert len(groq_calls) == 1
+
+    # A different pH band is a different template
+    await service.generate_plan(make_request(soil_ph=5.2))
+    assert len(groq_calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_per_request_adjustments_do_not_leak_into_cache(groq_calls):
+    service = SmartCultivationService(AsyncMongoMockClient()["test_agri"])
+    template = await service.get_plan_template(make_request())
+    template["tasks"][0]["instructions"] += " [AUTO-UPDATE] Rain predicted."
+
+    cached = await service.get_plan_template(make_request())
+    assert cached["tasks"][0]["instructions"] == "Sow in rows"
+
+
+@pytest.mark.asyncio
+async def test_failed_generation_is_not_cached(groq_calls):
+    service = SmartCultivationService(AsyncMongoMockClient()["test_agri"])
+    await service.get_plan_template(make_request(soil_type="broken"))
+    await service.get_plan_template(make_request(soil_type="broken"))
+    assert len(groq_calls) == 2
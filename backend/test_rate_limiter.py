@@ -0,0 +1,63 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.auth import auth_router
+from services import rate_limiter
+from services.rate_limiter import MemoryBucketStore, RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills_over_time(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("services.rate_limiter.time.monotonic", lambda: clock[0])
+    store = MemoryBucketStore()
+
+    results = [await store.take("k", capacity=2, refill_per_second=0.5) for _ in range(3)]
+    assert [allowed for allowed, _ in results] == [True, True, False]
+    assert results[2][1] == pytest.approx(2.0)
+
+    clock[0] += 2.0
+    assert (await store.take("k", capacity=2, refill_per_second=0.5))[0]
+
+
+def test_send_otp_is_throttled_per_phone_with_retry_after():
+    app = FastAPI()
+    app.include_router(auth_router)
+    client = TestClient(app)
+
+    statuses = [
+        client.post("/api/auth/send-otp", json={"phone": "+919812345670"})
+        for _ in range(4)
+    ]
+    assert [r.status_code for r in statuses] == [200, 200, 200, 429]
+    assert int(statuses[-1].headers["Retry-After"]) > 0
+
+    # Another phone from the same client is still allowed
+    assert client.post("/api/auth/send-otp", json={"phone": "+919812345671"}).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_limiter_fails_open_when_store_breaks():
+    class BrokenStore:
+        async def take(self, *args, **kwargs):
+            raise ConnectionError("redis down")
+
+    await RateLimiter("test", capacity=1, per_seconds=60, store=BrokenStore()).check("key")
+
+
+def test_forwarded_for_is_only_trusted_from_configured_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "trusted_proxy_networks", rate_limiter.parse_networks("10.0.0.0/8, 127.0.0.1"))
+    resolve = rate_limiter.resolve_client_ip
+
+    # A direct client can't pick its own bucket by sending the header
+    assert resolve("203.0.113.9", "1.2.3.4") == "203.0.113.9"
+    # Behind our proxies the right-most untrusted hop is the client; hops left of it are spoofable
+    assert resolve("10.0.0.2", "1.2.3.4, 198.51.100.7, 10.0.0.5") == "198.51.100.7"
+    assert resolve("127.0.0.1", "garbage, 198.51.100.7") == "198.51.100.7"
+    assert resolve("10.0.0.2", "10.0.0.9") == "10.0.0.9"
+    assert resolve("10.0.0.2", None) == "10.0.0.2"
+    assert resolve(None, "1.2.3.4") == "unknown"
+
+    monkeypatch.setattr(rate_limiter, "trusted_proxy_networks", [])
+    assert resolve("10.0.0.2", "1.2.3.4") == "10.0.0.2"
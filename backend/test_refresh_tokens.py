@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+import api.auth as auth
+
+FARMER = {
+    "farmer_id": "FARMER_REFRESH_TEST",
+    "name": "Biju",
+    "phone": "9876511111",
+    "language": "ml"
+}
+
+
+@pytest.fixture(params=["mongo", "memory"])
+def auth_store(request, monkeypatch):
+    if request.param == "mongo":
+        monkeypatch.setattr(auth, "database", AsyncMongoMockClient()["refresh_test"])
+    else:
+        # Recent connection failure: get_database() returns None without retrying
+        monkeypatch.setattr(auth, "database", None)
+        monkeypatch.setattr(auth, "_last_connect_failure", datetime.now())
+    monkeypatch.setattr(auth, "revoked_token_families", set())
+    monkeypatch.setattr(auth, "_revocations_synced_at", None)
+
+    async def fake_get_farmer_from_db(farmer_id=None, phone=None, email=None):
+        return dict(FARMER) if farmer_id == FARMER["farmer_id"] else None
+
+    monkeypatch.setattr(auth, "get_farmer_from_db", fake_get_farmer_from_db)
+    return request.param
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_and_detects_reuse(auth_store):
+    first = await auth.generate_tokens(FARMER)
+    second = await auth.refresh_tokens(auth.RefreshTokenRequest(refresh_token=first.refresh_token))
+    assert second.refresh_token != first.refresh_token
+
+    # Replaying the rotated token revokes the whole session
+    with pytest.raises(HTTPException) as replay:
+        await auth.refresh_tokens(auth.RefreshTokenRequest(refresh_token=first.refresh_token))
+    assert replay.value.status_code == 401
+
+    with pytest.raises(HTTPException) as revoked:
+        await auth.refresh_tokens(auth.RefreshTokenRequest(refresh_token=second.refresh_token))
+    assert revoked.value.detail == "Session revoked"
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_refresh_token(auth_store):
+    tokens = await auth.generate_tokens(FARMER)
+    await auth.logout(auth.RefreshTokenRequest(refresh_token=tokens.refresh_token))
+
+    with pytest.raises(HTTPException):
+        await auth.refresh_tokens(auth.RefreshTokenRequest(refresh_token=tokens.refresh_token))
+
+    # A fresh process learns about the revocation from the database
+    if auth_store == "mongo":
+        auth.revoked_token_families = set()
+        await auth.sync_revoked_families(force=True)
+        claims = auth.jwt.decode(tokens.refresh_token, auth.SECRET_KEY, algorithms=[auth.JWT_ALGORITHM])
+        assert claims["fid"] in auth.revoked_token_families
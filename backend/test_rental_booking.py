@@ -0,0 +1,19 @@
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from benchmark_rental_booking import run_benchmark
+
+
+@pytest.mark.asyncio
+async def test_concurrent_bookings_never_double_book():
+    db = mongomock_motor.AsyncMongoMockClient()["rental_benchmark_test"]
+
+    report = await run_benchmark(db, clients=150, equipment_count=2, slots_per_day=3, hot_ratio=0.7)
+
+    assert report["errors"] == 0
+    assert report["double_bookings"] == 0
+    assert report["lost_confirmations"] == 0
+    # Every targeted slot is won exactly once, everyone else is rejected
+    assert report["confirmed"] == report["targeted_slots"]
+    assert report["confirmed"] + report["failed"] == report["clients"]
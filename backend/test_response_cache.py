@@ -0,0 +1,56 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from utils.response_cache import CacheRule, ResponseCacheMiddleware
+
+
+def make_client():
+    app = FastAPI()
+    calls = []
+
+    @app.get("/api/reference/{name}")
+    async def reference(name: str, lang: str = "en"):
+        calls.append((name, lang))
+        if name == "missing":
+            return JSONResponse({"detail": "nope"}, status_code=404)
+        return {"name": name, "lang": lang}
+
+    @app.get("/api/live")
+    async def live():
+        calls.append(("live", None))
+        return {"ok": True}
+
+    app.add_middleware(ResponseCacheMiddleware, rules=[CacheRule("/api/reference/{name}", max_age=600)])
+    return TestClient(app), calls
+
+
+def test_cached_route_serves_bytes_and_304():
+    client, calls = make_client()
+
+    first = client.get("/api/reference/states?lang=ml&x=1")
+    assert first.status_code == 200
+    assert first.json() == {"name": "states", "lang": "ml"}
+    assert first.headers["Cache-Control"] == "public, max-age=600"
+    etag = first.headers["ETag"]
+
+    # Same route and query (in any order) is served from the cache
+    again = client.get("/api/reference/states?x=1&lang=ml")
+    assert again.content == first.content and again.headers["ETag"] == etag
+    not_modified = client.get("/api/reference/states?lang=ml&x=1", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert calls == [("states", "ml")]
+
+    # A different query is a different cache entry
+    assert client.get("/api/reference/states?lang=hi").headers["ETag"] != etag
+
+
+def test_errors_and_other_routes_are_not_cached():
+    client, calls = make_client()
+
+    assert client.get("/api/reference/missing").status_code == 404
+    assert client.get("/api/reference/missing").status_code == 404
+    client.get("/api/live")
+    response = client.get("/api/live")
+    assert "ETag" not in response.headers
+    assert calls == [("missing", "en"), ("missing", "en"), ("live", None), ("live", None)]
@@ -0,0 +1,121 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from models.smart_cultivation_models import DailyTask
+from utils import compression
+from utils.compression import CompressionMiddleware, choose_encoding
+from utils.json_response import AppJSONResponse, dumps
+from utils.response_cache import CacheRule, ResponseCacheMiddleware
+
+LARGE = {"data": [{"vegetablename": "Tomato", "price": "40", "Date": "01/06/2025"}] * 200}
+
+
+def make_client():
+    app = FastAPI(default_response_class=AppJSONResponse)
+
+    @app.get("/api/large")
+    async def large():
+        return LARGE
+
+    @app.get("/api/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/api/stream")
+    async def stream():
+        async def events():
+            for i in range(3):
+                yield f"data: {'x' * 1000}{i}\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/api/reference")
+    async def reference():
+        return LARGE
+
+    app.add_middleware(ResponseCacheMiddleware, rules=[CacheRule("/api/reference")])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def test_dumps_handles_mongo_and_model_types():
+    oid = ObjectId()
+    body = dumps({
+        "_id": oid,
+        "created_at": datetime(2025, 6, 1, 8, 30),
+        "amount": Decimal("12.5"),
+        "tags": {"rice"},
+        "task": DailyTask(day_number=1, task_name="Sow", description="d", instructions="i"),
+        1: "non-string key"
+    })
+    decoded = json.loads(body)
+    assert decoded["_id"] == str(oid)
+    assert decoded["created_at"] == "2025-06-01T08:30:00"
+    assert decoded["amount"] == 12.5 and decoded["tags"] == ["rice"]
+    assert decoded["task"]["day_number"] == 1 and decoded["1"] == "non-string key"
+
+
+def test_large_json_is_gzipped_and_small_is_not(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    client = make_client()
+
+    response = client.get("/api/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(dumps(LARGE))
+    assert response.json() == LARGE
+
+    small = client.get("/api/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers and small.json() == {"ok": True}
+
+    identity = client.get("/api/large", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers and identity.content == dumps(LARGE)
+
+
+def test_brotli_preferred_when_available():
+    brotli = pytest.importorskip("brotli")
+    client = make_client()
+
+    response = client.get("/api/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert choose_encoding("gzip;q=1.0, br;q=0") == "gzip"
+    assert choose_encoding("identity") is None
+    assert brotli.decompress(compression.compress(b"x" * 2048, "br")) == b"x" * 2048
+
+
+def test_event_stream_is_not_compressed():
+    client = make_client()
+    response = client.get("/api/stream", headers={"Accept-Encoding": "gzip, br"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text.count("data: ") == 3
+
+
+def test_compressed_cached_response_still_revalidates(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    client = make_client()
+
+    first = client.get("/api/reference", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    not_modified = client.get("/api/reference", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert first.content == dumps(LARGE)
+
+
+def test_non_finite_floats_are_null_with_either_serializer(monkeypatch):
+    from utils import json_response
+
+    payload = {"price": float("nan"), "max": [float("inf"), 1.5], "avg": Decimal("NaN")}
+    expected = {"price": None, "max": [None, 1.5], "avg": None}
+    assert json.loads(dumps(payload)) == expected
+    monkeypatch.setattr(json_response, "orjson", None)
+    assert json.loads(dumps(payload)) == expected
@@ -0,0 +1,69 @@
+import pytest
+
+import services.semantic_cache as semantic_cache_module
+from services.chatbot_service import ChatbotService
+from services.llm_client import LLMClient, StubBackend
+from services.semantic_cache import SemanticCache, normalize_text
+
+REPLY = "Sow paddy in June after the first monsoon showers."
+
+
+def test_near_duplicates_hit_and_different_questions_miss():
+    cache = SemanticCache()
+    cache.set("How to control pests in brinjal?", "english", "Use neem oil")
+    cache.set("Fertilizer for 2 acres rice", "english", "2 acre dose")
+    cache.set("Best organic fertilizer schedule for coconut", "english", "Coconut schedule")
+
+    assert cache.get("brinjal pest control", "english") == "Use neem oil"
+    assert cache.get("fertiliser for 2 acres rice", "english") == "2 acre dose"
+    assert cache.get("fertilizer for 20 acres rice", "english") is None
+    assert cache.get("best organic fertilizer schedule for banana", "english") is None
+    assert cache.get("brinjal pest control", "hindi") is None
+
+    metrics = cache.metrics()
+    assert metrics["semantic_hits"] == 2 and metrics["misses"] == 3 and metrics["hit_rate"] == 0.4
+
+
+def test_normalization_keeps_indic_words_intact():
+    assert normalize_text("നെല്ല് എപ്പോൾ വിതയ്ക്കണം?") == "നെല്ല് എപ്പോൾ വിതയ്ക്കണം"
+    assert normalize_text("धान की बुवाई कब करें?") == "धान बुवाई कब करें"
+
+    cache = SemanticCache()
+    cache.set("നെല്ല് എപ്പോൾ വിതയ്ക്കണം?", "malayalam", "ജൂൺ")
+    assert cache.get("നെല്ല് എപ്പോൾ വിതയ്ക്കണം", "malayalam") == "ജൂൺ"
+
+
+def test_ttl_and_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache_module.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(ttl_seconds=60, max_entries=2)
+
+    cache.set("when to sow paddy", "english", "June")
+    now[0] += 61
+    assert cache.get("when to sow paddy", "english") is None
+
+    for question in ("sow paddy", "banana price", "coconut fertilizer"):
+        cache.set(question, "english", question)
+    assert cache.get("sow paddy", "english") is None
+    assert cache.metrics()["evictions"] == 1 and cache.metrics()["entries"] == {"english": 2}
+    assert not any("sow paddy" in members for members in cache.buckets["english"].values())
+
+
+@pytest.mark.asyncio
+async def test_chatbot_hits_skip_the_llm():
+    backend = StubBackend(responder=lambda messages, params: REPLY)
+    service = ChatbotService(LLMClient(backend, model="test-model", retry_base_delay=0))
+
+    assert await service.get_response("When should I sow paddy?") == REPLY
+    assert await service.get_response("when to sow paddy") == REPLY
+    await service.get_response("When to harvest paddy?")
+    assert len(backend.calls) == 2
+
+    events = [event async for event in service.stream_response("when should i sow the paddy", "english")]
+    assert events[0]["cached"] is True and events[-1]["response"] == REPLY
+    assert len(backend.calls) == 2
+
+    # Fallback answers are never cached
+    failing = ChatbotService(LLMClient(StubBackend(fail_times=1), max_retries=0))
+    await failing.get_response("banana price today")
+    assert failing.cache.metrics()["stores"] == 0
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from services import sms_service
+from services.auth_service import AuthenticationService
+from services.sms_service import ConsoleSMSProvider, FakeSMSProvider, SMSDispatcher
+
+
+@pytest.mark.asyncio
+async def test_send_otp_returns_before_delivery_and_records_status():
+    primary = FakeSMSProvider("primary", fail_times=1)
+    backup = FakeSMSProvider("backup")
+    dispatcher = SMSDispatcher([primary, backup], workers=1, retry_base_delay=0)
+    db = mongomock_motor.AsyncMongoMockClient()["sms_test"]
+    service = AuthenticationService(db, sms=dispatcher)
+
+    result = await service.send_otp("+919800000001")
+    assert result["success"]
+    record = await db.otp_verifications.find_one({"phone": "+919800000001"})
+    assert record["delivery_status"] == "queued"
+
+    await dispatcher.drain()
+    await dispatcher.stop()
+
+    # Primary failed once, so the backup provider delivered it
+    assert backup.sent and backup.sent[0]["phone"] == "+919800000001"
+    record = await db.otp_verifications.find_one({"phone": "+919800000001"})
+    assert record["delivery_status"] == "delivered"
+    assert record["delivery_provider"] == "backup"
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_retries_then_gives_up():
+    flaky = FakeSMSProvider("flaky", fail_times=2)
+    dispatcher = SMSDispatcher([flaky], workers=1, max_attempts=3, retry_base_delay=0)
+    statuses = []
+
+    async def on_status(job):
+        statuses.append(job["status"])
+
+    await dispatcher.enqueue("+919800000002", "hello", on_status=on_status)
+    await dispatcher.drain()
+
+    dispatcher.providers = [FakeSMSProvider("down", fail_times=10)]
+    failed = await dispatcher.enqueue("+919800000003", "hello")
+    await dispatcher.drain()
+    await dispatcher.stop()
+
+    assert statuses == ["retrying", "retrying", "delivered"]
+    assert failed["status"] == "failed" and failed["attempts"] == 3
+
+
+@pytest.mark.asyncio
+async def test_backoff_does_not_hold_up_other_messages():
+    provider = FakeSMSProvider("flaky", fail_times=1)
+    dispatcher = SMSDispatcher([provider], workers=1, max_attempts=2, retry_base_delay=60)
+
+    first = await dispatcher.enqueue("+919800000006", "first")
+    await dispatcher.enqueue("+919800000007", "second")
+    # The only worker is free again while the first message waits out its backoff
+    for _ in range(100):
+        if provider.sent:
+            break
+        await asyncio.sleep(0.001)
+    await dispatcher.stop()
+
+    assert [m["phone"] for m in provider.sent] == ["+919800000007"]
+    assert first["status"] == "retrying" and first["attempts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_a_retryable_503():
+    # No workers, so the first message stays queued
+    dispatcher = SMSDispatcher([FakeSMSProvider()], workers=0, queue_size=1)
+    service = AuthenticationService(mongomock_motor.AsyncMongoMockClient()["sms_full_test"], sms=dispatcher)
+
+    await service.send_otp("+919800000004")
+    with pytest.raises(HTTPException) as full:
+        await service.send_otp("+919800000005")
+    assert full.value.status_code == 503 and full.value.headers["Retry-After"]
+
+
+def test_console_provider_is_not_a_production_failover(monkeypatch):
+    class FakeTwilio(FakeSMSProvider):
+        def __init__(self, *args):
+            super().__init__("twilio")
+
+    monkeypatch.setattr(sms_service, "TwilioSMSProvider", FakeTwilio)
+    monkeypatch.setattr(sms_service, "TWILIO_SID", "sid")
+    monkeypatch.setattr(sms_service, "TWILIO_TOKEN", "token")
+    assert [p.name for p in sms_service.create_default_providers(console_fallback=False)] == ["twilio"]
+    assert [p.name for p in sms_service.create_default_providers(console_fallback=True)] == ["twilio", "console"]
+
+    monkeypatch.setattr(sms_service, "TWILIO_SID", None)
+    assert [type(p) for p in sms_service.create_default_providers(console_fallback=False)] == [ConsoleSMSProvider]
@@ -0,0 +1,102 @@
+import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from models.smart_cultivation_models import CompactSchedule, DailyTask, SmartCultivationPlan, SmartCultivationRequest
+from services.smart_cultivation_service import SmartCultivationService
+from services.weather_replanner import AUTO_UPDATE_MARKER, IRRIGATION_NOTE, WeatherReplanner, adjust_task, daily_forecast
+
+TODAY = datetime.date(2025, 6, 10)
+
+
+class FakeWeatherService:
+    def __init__(self, descriptions):
+        self.descriptions = descriptions  # YYYY-MM-DD -> description for every slot of the day
+        self.calls = []
+
+    def get_weather_forecast(self, city=None, days=5, **kwargs):
+        self.calls.append(city)
+        forecast = [
+            {"date": f"{date_str} {hour:02d}:00:00", "description": description, "wind_speed": 3}
+            for date_str, description in self.descriptions.items() for hour in range(0, 24, 3)
+        ]
+        return {"success": True, "data": {"forecast": forecast}}
+
+
+def make_task(day, task_type, status="pending"):
+    return DailyTask(day_number=day, task_name=f"Task {day}", description="d", instructions="Water the beds",
+                     task_type=task_type, status=status)
+
+
+def make_plan(location, tasks, status="active", start_date="2025-06-01"):
+    request = SmartCultivationRequest(land_area=1, soil_type="loam", sowing_date=start_date,
+                                      selected_crops=["Rice"], location=location)
+    end_date = (datetime.date.fromisoformat(start_date) + datetime.timedelta(days=119)).isoformat()
+    return SmartCultivationPlan(user_id="u1", crop_name="Rice", start_date=start_date, end_date=end_date,
+                                status=status, input_details=request,
+                                compact_schedule=CompactSchedule(total_days=120, tasks=tasks))
+
+
+def test_adjust_task_rules():
+    rain = {"description": "light rain", "rain": True, "wind_speed": 12}
+    diff = adjust_task(make_task(1, "irrigation"), rain)
+    assert diff["status"] == "skipped" and diff["instructions"].endswith(AUTO_UPDATE_MARKER + IRRIGATION_NOTE)
+    assert "(Rain expected)" in diff["weather_condition"]
+
+    spray = adjust_task(make_task(1, "protection"), rain)
+    assert "status" not in spray and spray["instructions"].count(AUTO_UPDATE_MARKER) == 2
+    assert adjust_task(make_task(1, "irrigation", status="completed"), rain) == {}
+    assert adjust_task(make_task(1, "irrigation"), None) == {}
+
+    slots = [{"date": "2025-06-10 00:00:00", "description": "light rain"}] + \
+            [{"date": f"2025-06-10 0{h}:00:00", "description": "clear sky"} for h in range(3, 10, 3)]
+    assert daily_forecast({"success": True, "data": {"forecast": slots}})["2025-06-10"]["rain"] is True
+
+
+@pytest.mark.asyncio
+async def test_replanner_updates_in_horizon_tasks_with_field_diffs():
+    db = AsyncMongoMockClient()["test_agri"]
+    service = SmartCultivationService(db)
+    # Day 10 is 2025-06-10 (today), day 12 rains, day 30 is outside the 5-day horizon
+    tasks = [make_task(10, "irrigation"), make_task(12, "irrigation"), make_task(13, "irrigation", status="completed"),
+             make_task(30, "irrigation")]
+    first = await service.save_plan(make_plan("Thrissur", tasks))
+    second = await service.save_plan(make_plan(" thrissur ", tasks))
+    await service.save_plan(make_plan("Kochi", tasks))
+    await service.save_plan(make_plan("Kochi", tasks, status="completed"))
+    await service.save_plan(make_plan("Kochi", tasks, start_date="2024-01-01"))
+
+    weather = FakeWeatherService({"2025-06-10": "clear sky", "2025-06-12": "moderate rain", "2025-06-13": "heavy rain"})
+    replanner = WeatherReplanner(db.smart_cultivations, weather)
+    writes = []
+    update_one = db.smart_cultivations.update_one
+
+    async def recording_update_one(query, update, **kwargs):
+        writes.append(update)
+        return await update_one(query, update, **kwargs)
+
+    replanner.collection.update_one = recording_update_one
+
+    stats = await replanner.run_once(TODAY)
+    assert sorted(weather.calls) == ["Kochi", "Thrissur"]
+    assert stats == {"plans": 3, "locations": 2, "plans_updated": 3, "tasks_updated": 6}
+    for update in writes:
+        assert list(update) == ["$set"] and all(key.startswith("compact_schedule.tasks.") for key in update["$set"])
+
+    plan = await service.get_plan_by_id(first)
+    by_day = {task.day_number: task for task in plan.compact_schedule.tasks}
+    assert by_day[10].status == "pending" and by_day[10].weather_condition == "Forecast: clear sky"
+    assert by_day[12].status == "skipped" and by_day[12].instructions.endswith(IRRIGATION_NOTE)
+    assert by_day[13] == tasks[2] and by_day[30] == tasks[3]
+    assert (await service.get_plan_by_id(second)).compact_schedule == plan.compact_schedule
+
+    # Unchanged forecast: nothing to write
+    writes.clear()
+    assert (await replanner.run_once(TODAY))["tasks_updated"] == 0 and writes == []
+
+    # The rain moved away: the skip is undone and the note removed
+    weather.descriptions["2025-06-12"] = "clear sky"
+    await replanner.run_once(TODAY)
+    task = {t.day_number: t for t in (await service.get_plan_by_id(first)).compact_schedule.tasks}[12]
+    assert task.status == "pending" and task.instructions == "Water the beds"
@@ -0,0 +1,82 @@
+"""Free-slot bitmap utilities for equipment availability
+
+Each equipment day keeps an integer `free_mask` where bit h is set when the
+hour [h:00, h+1:00) is covered by a slot that is neither booked nor held. Calendar queries combine
+these masks instead of loading and scanning every slot.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+HOURS_PER_DAY = 24
+FULL_DAY_MASK = (1 << HOURS_PER_DAY) - 1
+
+def parse_hour(time_str: str, round_up: bool = False) -> int:
+    """Convert 'HH:MM' to an hour index, rounding partial hours down (or up)"""
+    hours, _, minutes = time_str.strip().partition(":")
+    hour = int(hours)
+    if round_up and minutes and int(minutes) > 0:
+        hour += 1
+    return max(0, min(HOURS_PER_DAY, hour))
+
+def hour_window_mask(start_hour: int, end_hour: int) -> int:
+    """Bitmap with bits set for hours in [start_hour, end_hour)"""
+    start_hour = max(0, min(HOURS_PER_DAY, start_hour))
+    end_hour = max(0, min(HOURS_PER_DAY, end_hour))
+    if end_hour <= start_hour:
+        return 0
+    return ((1 << (end_hour - start_hour)) - 1) << start_hour
+
+def slot_mask(slot: Dict) -> int:
+    """
+    Bitmap of the whole hours inside a single slot. Partial hours are left
+    out (start rounds up, end rounds down): a free 09:00-12:30 slot must not
+    advertise 12:00-13:00 when 12:30-14:00 is booked.
+    """
+    return hour_window_mask(
+        parse_hour(slot["start_time"], round_up=True),
+        parse_hour(slot["end_time"])
+    )
+
+def is_slot_free(slot: Dict, now: Optional[datetime] = None) -> bool:
+    """A slot is free when it is neither booked nor under a live hold"""
+    if slot.get("is_booked"):
+        return False
+    held_until = slot.get("hold_expires_at")
+    if slot.get("held_by") and held_until is not None:
+        return held_until <= (now or datetime.now())
+    return True
+
+def day_free_mask(slots: Iterable[Dict], now: Optional[datetime] = None) -> int:
+    """Bitmap of all hours covered by free slots of a day"""
+    now = now or datetime.now()
+    mask = 0
+    for slot in slots:
+        if is_slot_free(slot, now):
+            mask |= slot_mask(slot)
+    return mask
+
+def with_free_masks(availability: List[Dict]) -> List[Dict]:
+    """Return availability days annotated with their free_mask"""
+    return [
+        {**day, "free_mask": day_free_mask(day.get("slots", []))}
+        for day in availability
+    ]
+
+def mask_to_windows(mask: int) -> List[Tuple[int, int]]:
+    """Split a bitmap into contiguous (start_hour, end_hour) free windows"""
+    windows = []
+    hour = 0
+    while hour < HOURS_PER_DAY:
+        if mask & (1 << hour):
+            start = hour
+            while hour < HOURS_PER_DAY and mask & (1 << hour):
+                hour += 1
+            windows.append((start, hour))
+        else:
+            hour += 1
+    return windows
+
+def format_window(window: Tuple[int, int]) -> Dict[str, str]:
+    """Format an hour window as start/end time strings"""
+    return {"start_time": f"{window[0]:02d}:00", "end_time": f"{window[1]:02d}:00"}
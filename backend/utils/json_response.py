@@ -0,0 +1,88 @@
+"""Fast JSON serialization for API responses (orjson with a stdlib fallback)"""
+
+import json
+import math
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+
+from bson import ObjectId
+from fastapi.encoders import ENCODERS_BY_TYPE
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Let FastAPI's jsonable_encoder handle raw Mongo ids as well
+ENCODERS_BY_TYPE[ObjectId] = str
+
+
+def _encode(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "item"):
+        # numpy / pandas scalars coming out of DataFrame.to_dict()
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_default(obj: Any) -> Any:
+    """Encode the types our payloads carry that JSON has no native form for"""
+    return _null_non_finite(_encode(obj))
+
+
+def _null_non_finite(value: Any) -> Any:
+    """Replace NaN/Infinity with None, as orjson serializes them"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _null_non_finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_null_non_finite(item) for item in value]
+    return value
+
+
+def _stdlib_dumps(content: Any) -> bytes:
+    return json.dumps(
+        content,
+        default=json_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes (non-finite floats become null)"""
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    try:
+        return _stdlib_dumps(content)
+    except ValueError:
+        # Rare (e.g. NaN in market data): only then pay for a cleaning pass
+        return _stdlib_dumps(_null_non_finite(content))
+
+
+class AppJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson. Endpoints returning large dicts can
+    return it directly to skip FastAPI's jsonable_encoder pass as well.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,120 @@
+"""Incremental parsing of a JSON object that arrives in chunks (e.g. from an LLM stream)"""
+
+import json
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+
+class _Frame:
+    __slots__ = ("kind", "key", "expect_key", "value_start", "index")
+
+    def __init__(self, kind: str):
+        self.kind = kind  # "obj" or "arr"
+        self.key: Optional[str] = None
+        self.expect_key = kind == "obj"
+        self.value_start: Optional[int] = None
+        self.index = 0
+
+
+class IncrementalObjectParser:
+    """
+    Feed text chunks of one top-level JSON object and get events as soon as
+    values complete:
+
+      ("field", key, value)         a top-level member finished
+      ("item", key, member, value)  a member of one of `stream_keys` finished
+                                    (member is the index for arrays, the key
+                                    for objects); the container itself is
+                                    not reported again as a field
+
+    Text before the opening brace (e.g. a markdown fence) and after the
+    closing one is ignored. Each character is scanned once; values are only
+    decoded with json.loads when they complete.
+    """
+
+    def __init__(self, stream_keys: Iterable[str] = ()):
+        self.stream_keys: Set[str] = set(stream_keys)
+        self.buffer = ""
+        self.pos = 0
+        self.stack: List[_Frame] = []
+        self.in_string = False
+        self.escape = False
+        self.string_is_key = False
+        self.string_start = 0
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple]:
+        self.buffer += chunk
+        return list(self._scan())
+
+    def _scan(self) -> Iterator[Tuple]:
+        buf = self.buffer
+        while self.pos < len(buf) and not self.done:
+            i = self.pos
+            c = buf[i]
+            self.pos += 1
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.string_is_key:
+                        self.stack[-1].key = json.loads(buf[self.string_start:i + 1])
+                continue
+
+            if not self.stack:
+                if c == "{":
+                    self.stack.append(_Frame("obj"))
+                continue
+
+            top = self.stack[-1]
+            if c in _WHITESPACE:
+                continue
+            if c == '"':
+                self.in_string = True
+                self.string_start = i
+                self.string_is_key = top.kind == "obj" and top.expect_key
+                if not self.string_is_key and top.value_start is None:
+                    top.value_start = i
+            elif c == ":":
+                top.expect_key = False
+            elif c in "{[":
+                if top.value_start is None:
+                    top.value_start = i
+                self.stack.append(_Frame("obj" if c == "{" else "arr"))
+            elif c in "}]":
+                if top.value_start is not None:
+                    # A pending scalar or string is the last member
+                    yield from self._complete(top.value_start, i)
+                self.stack.pop()
+                if not self.stack:
+                    self.done = True
+                    return
+                yield from self._complete(self.stack[-1].value_start, i + 1)
+            elif c == ",":
+                if top.value_start is not None:
+                    yield from self._complete(top.value_start, i)
+                if top.kind == "obj":
+                    top.expect_key = True
+            elif top.value_start is None:
+                top.value_start = i  # number, true, false, null
+
+    def _complete(self, start: int, end: int) -> Iterator[Tuple]:
+        """The value of the current top frame spanning buffer[start:end] is complete"""
+        frame = self.stack[-1]
+        depth = len(self.stack)
+        raw = self.buffer[start:end]
+        member = frame.key if frame.kind == "obj" else frame.index
+        frame.value_start = None
+        if frame.kind == "arr":
+            frame.index += 1
+
+        if depth == 1:
+            if frame.key not in self.stream_keys:
+                yield ("field", frame.key, json.loads(raw))
+        elif depth == 2 and self.stack[0].key in self.stream_keys:
+            yield ("item", self.stack[0].key, member, json.loads(raw))
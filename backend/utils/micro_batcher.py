@@ -0,0 +1,137 @@
+"""
+Dynamic micro-batching for model inference
+
+Callers submit one item and await its result. A collector task takes the
+first waiting item, keeps gathering until max_batch_size items are in hand
+or max_wait_ms has passed since that first item, runs one batched call and
+resolves every caller's future. While a batch runs, new requests queue up
+and form the next one, so batches grow with load and a lone request waits
+at most max_wait_ms.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+BatchFunction = Callable[[List[Any]], Awaitable[Sequence[Any]]]
+
+
+class MicroBatcher:
+    def __init__(self, process_batch: BatchFunction, max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Entries taken off the queue but not yet resolved, failed by stop()
+        self._batch: List[tuple] = []
+        self.stats = {"batches": 0, "items": 0, "failed_batches": 0, "queue_wait_seconds": 0.0, "batch_seconds": 0.0}
+        self.size_counts: Dict[int, int] = {}
+
+    async def submit(self, item: Any) -> Any:
+        """Result of `item` once its batch has run"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[tuple]:
+        # Kept on self so a stop() while collecting fails these callers too
+        self._batch = batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without yielding first
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    @staticmethod
+    def _fail(batch: List[tuple], error: Exception):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _run_batch(self, batch: List[tuple]):
+        started = time.perf_counter()
+        # Callers that gave up (cancelled) don't need a slot
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        self.stats["queue_wait_seconds"] += sum(started - queued_at for _, _, queued_at in batch)
+        try:
+            results = await self.process_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+        except asyncio.CancelledError:
+            self._fail(batch, RuntimeError("Micro-batcher stopped"))
+            raise
+        except Exception as e:
+            self.stats["failed_batches"] += 1
+            self._fail(batch, e)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            self.stats["batch_seconds"] += time.perf_counter() - started
+            self.size_counts[len(batch)] = self.size_counts.get(len(batch), 0) + 1
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._run_batch(batch)
+            except Exception as e:
+                logger.error(f"Micro-batch crashed: {e}")
+            finally:
+                self._batch = []
+
+    def start(self):
+        """Start the collector task (idempotent)"""
+        if self._task is None:
+            self.queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Fail anything still waiting instead of leaving callers hanging
+        self._fail(self._batch, RuntimeError("Micro-batcher stopped"))
+        self._batch = []
+        while self.queue is not None and not self.queue.empty():
+            self._fail([self.queue.get_nowait()], RuntimeError("Micro-batcher stopped"))
+        self.queue = None
+
+    def metrics(self) -> Dict[str, Any]:
+        batches, items = self.stats["batches"], self.stats["items"]
+        return {
+            **self.stats,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "mean_batch_size": round(items / batches, 3) if batches else 0.0,
+            # Share of the batch capacity actually used
+            "occupancy": round(items / (batches * self.max_batch_size), 4) if batches else 0.0,
+            "mean_queue_wait_ms": round(self.stats["queue_wait_seconds"] / items * 1000, 3) if items else 0.0,
+            "batch_size_counts": dict(sorted(self.size_counts.items())),
+            "queued": self.queue.qsize() if self.queue is not None else 0
+        }
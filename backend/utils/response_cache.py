@@ -0,0 +1,130 @@
+"""Conditional GET caching for rarely-changing GET endpoints
+
+ResponseCacheMiddleware keeps the serialized body of configured routes per
+path and query string, tags it with a strong ETag and answers matching
+If-None-Match requests with 304, so clients on slow links don't download
+unchanged payloads again.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from cachetools import TLRUCache
+from starlette.datastructures import Headers
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.response_utils import compute_etag, if_none_match_covers
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+STATIC_DATA_MAX_AGE = int(os.getenv("STATIC_DATA_MAX_AGE", "86400"))
+
+
+class CacheRule:
+    """A route template (e.g. /api/auth/districts/{state_name}) to cache"""
+
+    def __init__(self, path: str, max_age: int = STATIC_DATA_MAX_AGE, ttl_seconds: Optional[int] = None):
+        self.path = path
+        self.regex: re.Pattern = compile_path(path)[0]
+        self.max_age = max_age
+        # How long the server keeps the bytes; defaults to the client max-age
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else max_age
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving cached bytes with ETag / 304 for matching GETs"""
+
+    def __init__(self, app: ASGIApp, rules: List[CacheRule], maxsize: int = RESPONSE_CACHE_SIZE):
+        self.app = app
+        self.rules = rules
+        # Entries expire after their rule's ttl_seconds (the last tuple item)
+        self.cache = TLRUCache(maxsize=maxsize, ttu=lambda _key, cached, now: now + cached[3])
+
+    def _match(self, path: str) -> Optional[CacheRule]:
+        for rule in self.rules:
+            if rule.regex.match(path):
+                return rule
+        return None
+
+    @staticmethod
+    def _cache_key(scope: Scope) -> str:
+        query = sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True))
+        return f"{scope['path']}?{urlencode(query)}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        rule = self._match(scope["path"])
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        key = self._cache_key(scope)
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = await self._render(scope, receive, send, rule, key)
+            if cached is None:
+                return  # Not cacheable; already sent as-is
+        await self._send_cached(scope, send, rule, cached)
+
+    async def _render(self, scope: Scope, receive: Receive, send: Send, rule: CacheRule, key: str):
+        """Run the endpoint and keep its body if it was a plain 200"""
+        start: Dict = {}
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def capture(message: Message):
+            nonlocal passthrough
+            if message["type"] == "http.response.start":
+                start.update(message)
+                if message["status"] != 200:
+                    passthrough = True
+                    await send(message)
+            elif passthrough:
+                await send(message)
+            else:
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        if passthrough or not start:
+            return None
+
+        body = b"".join(chunks)
+        headers = [
+            (name, value) for name, value in start.get("headers", [])
+            if name.lower() not in (b"content-length", b"etag", b"cache-control")
+        ]
+        cached: Tuple[List, bytes, str, int] = (headers, body, compute_etag(body), rule.ttl_seconds)
+        self.cache[key] = cached
+        return cached
+
+    async def _send_cached(self, scope: Scope, send: Send, rule: CacheRule, cached: Tuple[List, bytes, str, int]):
+        headers, body, etag, _ = cached
+        cache_headers = [
+            (b"etag", etag.encode("latin-1")),
+            (b"cache-control", f"public, max-age={rule.max_age}".encode("latin-1"))
+        ]
+
+        if if_none_match_covers(Headers(scope=scope).get("if-none-match"), etag):
+            await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": headers + cache_headers + [(b"content-length", str(len(body)).encode("latin-1"))]
+        })
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+
+# Reference endpoints whose payload only changes with a deploy or data import
+STATIC_CACHE_RULES = [
+    CacheRule("/api/auth/states"),
+    CacheRule("/api/auth/districts/{state_name}"),
+    CacheRule("/api/auth/locations"),
+    CacheRule("/api/soil-data/districts"),
+    CacheRule("/api/schemes/", max_age=3600),
+    CacheRule("/api/crop-prediction/crop/{crop_key}"),
+]
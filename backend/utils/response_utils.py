@@ -1,8 +1,12 @@
 """Response formatting utilities"""
 
+import hashlib
+import json
 from typing import Any, Dict, Optional
 from datetime import datetime
 
+from fastapi import Request, Response
+
 def create_success_response(
     data: Any = None, 
     message: str = "Success", 
@@ -60,4 +64,40 @@ def create_paginated_response(
             "per_page": per_page,
             "pages": (total + per_page - 1) // per_page
         }
-    )
\ No newline at end of file
+    )
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag for a serialized response body"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+def if_none_match_covers(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value already covers this ETag"""
+    if not if_none_match:
+        return False
+    # Weak comparison (RFC 7232): compression turns our tags into W/"..."
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match already covers this ETag"""
+    return if_none_match_covers(request.headers.get("if-none-match"), etag)
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    max_age: int,
+    media_type: str = "application/json"
+) -> Response:
+    """Serve pre-serialized bytes, or 304 when the client has them already"""
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def sse_event(event: str, data: Any) -> str:
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+# Keep proxies (nginx) from buffering event streams
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}